@@ -10,9 +10,165 @@ FRAMEWORK = "pt"  # Use PyTorch
 
 # Speech-to-text model config
 SPEECH_MODEL = "openai/whisper-small"
-MAX_AUDIO_LENGTH = 30  # Maximum audio length in seconds
+MAX_AUDIO_LENGTH = 30  # Maximum audio length in seconds (base64 /transcribe)
+# Uploads and jobs may be longer: VAD packs their speech into 30 s windows, so
+# only the speech, not the recording's length, decides how many Whisper runs
+MAX_UPLOAD_AUDIO_LENGTH = 600
 SUPPORTED_FORMATS = ["wav", "mp3", "ogg", "flac"]
 MAX_FILE_SIZE = 10 * 1024 * 1024  # 10 MB
 
+# Upload handling config
+MAX_REQUEST_BYTES = MAX_FILE_SIZE * 4 // 3 + (1 << 20)  # Any body, base64 JSON included
+UPLOAD_CHUNK_BYTES = 64 * 1024  # Bytes read from an upload at a time
+UPLOAD_QUEUE_CHUNKS = 16  # Chunks buffered between the request and the decoder
+UPLOAD_STALL_TIMEOUT_S = 30  # A decoder gives up on an upload idle for this long
+
 # Image processing config
 THRESHOLD = 200
+
+# Multi-digit canvas config (/predict-multi)
+DIGIT_MULTI_MAX_DIGITS = 16  # Digits classified per canvas
+DIGIT_NOISE_FRACTION = 0.05  # Blobs under this share of the largest one are noise
+DIGIT_MERGE_OVERLAP = 0.5  # Column overlap (of the narrower blob) that joins two blobs
+DIGIT_MULTI_MAX_PIXELS = 2_000_000  # Larger canvases are shrunk before segmenting
+DIGIT_MULTI_MAX_RUNS = 20000  # Ink runs (row segments) beyond this are rejected
+
+# Digit micro-batching config
+DIGIT_BATCH_MAX_SIZE = 32  # Close a batch once this many requests are waiting
+DIGIT_BATCH_MAX_WAIT_MS = 5  # ...or once the oldest request has waited this long
+
+# Inference pool config (threads per model, and how many more calls may wait)
+DIGIT_POOL_WORKERS = 1
+DIGIT_POOL_QUEUE = 256  # Counted in requests waiting for the batcher
+EMOJI_POOL_WORKERS = 2
+EMOJI_POOL_QUEUE = 32
+SPEECH_POOL_WORKERS = 1
+SPEECH_POOL_QUEUE = 4
+DECODE_POOL_WORKERS = 4  # Uploads decoded (one ffmpeg process each) at once
+DECODE_POOL_QUEUE = 8
+
+# Runtime thread config, per process (python -m app.serve divides it by workers).
+# None keeps the framework default of one thread per core, which oversubscribes
+# the CPU once TensorFlow and PyTorch both run.
+CPU_COUNT = os.cpu_count() or 1
+TF_INTRA_OP_THREADS = 1  # The digit CNN is tiny; more threads mostly add overhead
+TF_INTER_OP_THREADS = 1
+# Split between the emoji and speech calls that may run at the same time
+TORCH_INTRA_OP_THREADS = max(1, CPU_COUNT // (EMOJI_POOL_WORKERS + SPEECH_POOL_WORKERS))
+TORCH_INTER_OP_THREADS = 1
+# CPUs each inference pool's threads may run on, e.g. {"digit": [0],
+# "emoji": [1, 2], "speech": [3, 4, 5, 6, 7]}; None lets the OS decide
+MODEL_CPU_SETS = {"digit": None, "emoji": None, "speech": None}
+
+# Emoji batching config
+EMOJI_BATCH_SIZE = 16  # Texts per DistilBERT forward pass
+EMOJI_BATCH_MAX_WAIT_MS = 5  # How long a single /predict-emoji call waits for company
+EMOJI_MAX_TEXTS = 256  # Maximum texts accepted by /predict-emoji/batch
+EMOJI_TOP_K = 5  # Emotions per text from /predict-emoji/top-k unless asked otherwise
+
+# Emoji result cache config
+EMOJI_CACHE_SIZE = 4096  # Entries kept in each worker's memory
+EMOJI_CACHE_TTL = 3600  # Seconds before a cached prediction is recomputed
+EMOJI_CACHE_BACKEND = None  # None or "sqlite" to share hits between uvicorn workers
+EMOJI_CACHE_PATH = "./cache/emoji_cache.sqlite3"
+
+# Emoji typing session config (/predict-emoji/session)
+EMOJI_SESSION_DEBOUNCE_MS = 150  # Quiet time before a session's latest text is run
+EMOJI_SESSION_MAX = 10000  # Sessions remembered per worker (least recent dropped)
+EMOJI_TOKEN_CACHE_SIZE = 4096  # Tokenized prefixes shared by every session
+
+# Audio decoding config
+FFMPEG_BINARY = "ffmpeg"  # Used through stdin/stdout pipes, never temp files
+BASE64_CHUNK_CHARS = 1 << 20  # Base64 characters decoded per slice (multiple of 4)
+
+# Streaming transcription config
+STREAM_WINDOW_S = 10  # Audio per Whisper call while streaming
+STREAM_OVERLAP_S = 2  # Tail of each window that is re-decoded by the next one
+STREAM_MAX_SECONDS = 3600  # Longest accepted stream
+STREAM_ENCODINGS = ["pcm_s16le", "pcm_f32le"]
+
+# Voice activity detection config
+VAD_ENABLED = True  # Only send detected speech to Whisper
+VAD_TOP_DB = 30  # Frames quieter than the loudest frame by this much are silence
+VAD_MIN_SILENCE_S = 0.5  # Shorter pauses are kept inside the speech region
+VAD_PAD_S = 0.2  # Context kept around each speech region
+VAD_GAP_S = 0.3  # Silence inserted between regions packed into one input
+VAD_MAX_PACK_S = 30  # Whisper's fixed input window
+
+# Model lifecycle config
+MODEL_WARMUP = []  # Models loaded at startup, e.g. ["digit_recognizer", "emoji_predictor"]
+MODEL_IDLE_TIMEOUT_S = 1800  # Unload models unused for this long (None = never)
+MODEL_IDLE_CHECK_S = 60  # How often idle models are looked for
+MODEL_RETRY_COOLDOWN_S = 30  # After a failed load, requests fail fast this long
+
+# Inference backend config
+DIGIT_BACKEND = "savedmodel"  # "savedmodel" or "tflite"
+DIGIT_TFLITE_FILE = "./ai_models/digit_model.tflite"  # Converted once, then reused
+EMOTION_BACKEND = "torch"  # "torch", "torch-int8" or "onnx"
+SPEECH_BACKEND = "torch"  # "torch", "torch-int8" or "onnx"
+BACKEND_PARITY_CHECK = True  # Compare non-reference backends with float32 at load
+DIGIT_PARITY_TOLERANCE = 1e-3  # Relative error of the class probabilities
+EMOTION_PARITY_TOLERANCE = 0.05
+SPEECH_PARITY_TOLERANCE = 0.05  # Relative error of the encoder hidden states
+
+# Pre-fork serving config (python -m app.serve)
+SERVE_HOST = "0.0.0.0"
+SERVE_PORT = 8000
+SERVE_WORKERS = 4
+# Loaded once in the parent and shared copy-on-write with every worker.
+# TensorFlow is not fork-safe once initialized; the digit model loads per worker.
+SERVE_PRELOAD = ["emoji_predictor", "speech_recognizer"]
+SERVE_RESTART_DELAY_S = 0.5  # First restart delay after a worker crashes early
+SERVE_RESTART_MAX_DELAY_S = 30  # Doubling stops here
+SERVE_HEALTHY_AFTER_S = 10  # A worker that ran this long resets the delay
+
+# Metrics config (GET /metrics, Prometheus text format)
+METRICS_ENABLED = True  # When False, timers are shared no-ops and /metrics is off
+METRICS_PREFIX = "ai_playground"
+# Latency histogram bucket bounds, in seconds
+METRICS_BUCKETS = [0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30]
+
+# Transcription cache config (keyed on the decoded PCM, so re-uploads hit)
+TRANSCRIPT_CACHE_SIZE = 256  # Transcripts kept in memory per worker
+TRANSCRIPT_CACHE_TTL = 7 * 24 * 3600  # Seconds
+TRANSCRIPT_CACHE_BACKEND = "sqlite"  # None = memory only, "sqlite" = disk tier
+TRANSCRIPT_CACHE_PATH = "./cache/transcripts.sqlite3"
+TRANSCRIPT_CACHE_MAX_BYTES = 256 * 1024 * 1024  # Disk tier size budget
+
+# Transcription job config (POST /speech/jobs)
+SPEECH_JOB_DB_PATH = "./cache/speech_jobs.sqlite3"
+SPEECH_JOB_BATCH_SIZE = 8  # Chunks per Whisper call, matching the pipe's batch_size
+SPEECH_JOB_BATCH_WAIT_MS = 100  # How long a partial batch waits for more chunks
+SPEECH_JOB_MAX_ACTIVE = 16  # Jobs decoded and held in memory at once
+SPEECH_JOB_MAX_QUEUED = 200  # Further submissions get 503
+SPEECH_JOB_MAX_WAIT_S = 60  # Longest allowed long-poll (?wait=)
+SPEECH_JOB_POLL_S = 1  # Store re-check interval while long-polling
+SPEECH_JOB_TTL_S = 24 * 3600  # Finished jobs are deleted after this long
+SPEECH_JOB_MAX_PRIORITY = 9  # Priorities run from 0 (default) to this, highest first
+
+# Speech decoding profiles, chosen per request with "profile"
+SPEECH_FAST_MODEL = "openai/whisper-tiny"  # Also the fallback if SPEECH_MODEL fails
+SPEECH_DEFAULT_PROFILE = "balanced"  # "fast", "balanced", "accurate" or "auto"
+SPEECH_PROFILES = {
+    # model is the registry entry: the SPEECH_MODEL or SPEECH_FAST_MODEL recognizer
+    "fast": {"model": "speech_recognizer_fast", "timestamps": False, "num_beams": 1},
+    "balanced": {"model": "speech_recognizer", "timestamps": True, "num_beams": 1},
+    "accurate": {"model": "speech_recognizer", "timestamps": True, "num_beams": 5},
+}
+SPEECH_AUTO_FAST_MAX_S = 5  # "auto" sends clips this short (or low priority) to fast
+SPEECH_TOKENS_PER_SECOND = 6  # max_new_tokens per second of the longest input
+SPEECH_MIN_NEW_TOKENS = 16
+SPEECH_MAX_NEW_TOKENS = 128
+SPEECH_LANGUAGE = None  # e.g. "en" pins the language and skips detection
+
+# Model artifact store config (python -m app.models.artifacts prefetch)
+MODEL_STORE_DIR = "./ai_models/hub"  # Pinned hub snapshots, weights as safetensors
+# Set MODEL_STORE_OFFLINE=1 (e.g. in production images) to load only from the
+# store and fail fast on missing models; otherwise they come from the hub
+MODEL_STORE_OFFLINE = os.environ.get("MODEL_STORE_OFFLINE", "0") == "1"
+# Branch, tag or commit per hub model; the manifest records the commit it resolved to
+MODEL_REVISIONS = {
+    EMOTION_MODEL: "main",
+    SPEECH_MODEL: "main",
+    SPEECH_FAST_MODEL: "main",
+}
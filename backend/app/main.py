@@ -1,10 +1,32 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 # Change from absolute to relative imports
-from .routes import digits, emoji, health, speech
+from .config import METRICS_ENABLED, MODEL_WARMUP
+from .models.registry import model_registry
+from .models.speech_jobs import speech_jobs
+from .routes import digits, emoji, health, metrics, speech
+from .utils.metrics import MetricsMiddleware
+from .utils.uploads import BodyLimitMiddleware
 
-app = FastAPI()
+
+@asynccontextmanager
+async def lifespan(app):
+    # Models load on first use; only the warmup list is loaded eagerly, in
+    # the background so the server accepts requests right away
+    model_registry.warmup(MODEL_WARMUP)
+    model_registry.start()
+    speech_jobs.start()
+    yield
+    speech_jobs.stop()
+    model_registry.stop()
+
+
+app = FastAPI(lifespan=lifespan)
+
+# Innermost, so CORS headers and metrics still apply to its 413 responses
+app.add_middleware(BodyLimitMiddleware)
 
 app.add_middleware(
     CORSMiddleware,
@@ -14,8 +36,12 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+if METRICS_ENABLED:
+    app.add_middleware(MetricsMiddleware)
+
 # Include routers
 app.include_router(health.router)
 app.include_router(digits.router)
 app.include_router(emoji.router)
 app.include_router(speech.router, prefix="/speech")
+app.include_router(metrics.router)
@@ -0,0 +1,211 @@
+"""Local store of pinned hub model snapshots, so models load without the network.
+
+Fill it once, on a machine with hub access, from the backend directory:
+
+    python -m app.models.artifacts prefetch
+    python -m app.models.artifacts list
+
+Each model in MODEL_REVISIONS is saved under MODEL_STORE_DIR at the commit
+its revision resolves to, with weights as safetensors (which
+from_pretrained memory-maps instead of unpickling). Copy the directory to
+air-gapped nodes as is and start them with MODEL_STORE_OFFLINE=1.
+"""
+
+import argparse
+import json
+import os
+import shutil
+import threading
+import time
+from ..config import MODEL_REVISIONS, MODEL_STORE_DIR, MODEL_STORE_OFFLINE
+
+MANIFEST = "manifest.json"
+# Everything from_pretrained needs for PyTorch; other frameworks' weights are skipped
+CONFIG_PATTERNS = ["*.json", "*.txt", "*.model", "*.tiktoken"]
+
+
+class ModelNotStoredError(FileNotFoundError):
+    """Raised offline for a model that has not been prefetched"""
+
+
+def safetensors_name(name):
+    return name.replace("pytorch_model", "model").replace(".bin", ".safetensors")
+
+
+def convert_to_safetensors(directory):
+    """Rewrite pickled PyTorch weights in ``directory`` as safetensors files"""
+    import torch
+    from safetensors.torch import save_file
+
+    for name in os.listdir(directory):
+        if not (name.startswith("pytorch_model") and name.endswith(".bin")):
+            continue
+        path = os.path.join(directory, name)
+        state_dict = torch.load(path, map_location="cpu", weights_only=True)
+        # safetensors refuses tensors sharing memory (tied embeddings)
+        tensors = {key: value.contiguous().clone() for key, value in state_dict.items()}
+        save_file(
+            tensors,
+            os.path.join(directory, safetensors_name(name)),
+            metadata={"format": "pt"},
+        )
+        os.remove(path)
+
+    index = os.path.join(directory, "pytorch_model.bin.index.json")
+    if os.path.exists(index):
+        with open(index) as f:
+            data = json.load(f)
+        data["weight_map"] = {
+            key: safetensors_name(name) for key, name in data["weight_map"].items()
+        }
+        with open(os.path.join(directory, "model.safetensors.index.json"), "w") as f:
+            json.dump(data, f, indent=2)
+        os.remove(index)
+
+
+class ModelStore:
+    """Pinned, safetensors-only snapshots of hub models in one local directory"""
+
+    def __init__(self, directory, revisions, offline=False):
+        self.directory = directory
+        self.revisions = revisions
+        self.offline = offline
+        self._manifest = None
+        self._lock = threading.Lock()
+
+    @property
+    def manifest_path(self):
+        return os.path.join(self.directory, MANIFEST)
+
+    @property
+    def manifest(self):
+        with self._lock:
+            if self._manifest is None:
+                self._manifest = {}
+                if os.path.exists(self.manifest_path):
+                    with open(self.manifest_path) as f:
+                        self._manifest = json.load(f)
+            return self._manifest
+
+    def _save_manifest(self):
+        temporary = self.manifest_path + ".tmp"
+        with open(temporary, "w") as f:
+            json.dump(self.manifest, f, indent=2, sort_keys=True)
+        os.replace(temporary, self.manifest_path)
+
+    def _missing_files(self, entry):
+        directory = os.path.join(self.directory, entry["path"])
+        return [
+            name
+            for name, size in entry["files"].items()
+            if not os.path.isfile(os.path.join(directory, name))
+            or os.path.getsize(os.path.join(directory, name)) != size
+        ]
+
+    def path(self, model_id):
+        """Local snapshot directory of ``model_id`` to pass to from_pretrained.
+
+        Online, a model missing from the store falls back to the hub id;
+        offline that raises ModelNotStoredError instead of downloading.
+        """
+        entry = self.manifest.get(model_id)
+        if entry is not None and not self._missing_files(entry):
+            return os.path.join(self.directory, entry["path"])
+        if not self.offline:
+            return model_id
+        raise ModelNotStoredError(
+            f"Model {model_id} không có trong {self.directory}. "
+            "Chạy: python -m app.models.artifacts prefetch"
+        )
+
+    def prefetch(self, model_id, revision=None):
+        """Download one model at its pinned revision and record it in the manifest"""
+        from huggingface_hub import HfApi, snapshot_download
+
+        revision = revision or self.revisions.get(model_id, "main")
+        info = HfApi().model_info(model_id, revision=revision)
+        files = [sibling.rfilename for sibling in info.siblings]
+        has_safetensors = any(name.endswith(".safetensors") for name in files)
+        weights = "*.safetensors" if has_safetensors else "pytorch_model*.bin"
+
+        relative = os.path.join(model_id.replace("/", "--"), info.sha)
+        target = os.path.join(self.directory, relative)
+        snapshot_download(
+            model_id,
+            revision=info.sha,
+            local_dir=target,
+            allow_patterns=CONFIG_PATTERNS + [weights],
+        )
+        if not has_safetensors:
+            convert_to_safetensors(target)
+        # snapshot_download keeps its own bookkeeping next to the files
+        shutil.rmtree(os.path.join(target, ".cache"), ignore_errors=True)
+
+        files = {}
+        for root, _, names in os.walk(target):
+            for name in names:
+                path = os.path.join(root, name)
+                files[os.path.relpath(path, target)] = os.path.getsize(path)
+
+        previous = self.manifest.get(model_id)
+        self.manifest[model_id] = {
+            "revision": revision,
+            "commit": info.sha,
+            "path": relative,
+            "files": files,
+            "prefetched": time.strftime("%Y-%m-%dT%H:%M:%S"),
+        }
+        self._save_manifest()
+
+        # Drop the snapshot this one replaces
+        if previous is not None and previous["path"] != relative:
+            shutil.rmtree(
+                os.path.join(self.directory, previous["path"]), ignore_errors=True
+            )
+        return self.manifest[model_id]
+
+    def stats(self):
+        return {
+            "directory": self.directory,
+            "offline": self.offline,
+            "models": {
+                model_id: {
+                    "commit": entry["commit"],
+                    "complete": not self._missing_files(entry),
+                }
+                for model_id, entry in self.manifest.items()
+            },
+        }
+
+
+model_store = ModelStore(MODEL_STORE_DIR, MODEL_REVISIONS, MODEL_STORE_OFFLINE)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    commands = parser.add_subparsers(dest="command", required=True)
+    prefetch = commands.add_parser("prefetch", help="Download models into the store")
+    prefetch.add_argument(
+        "models", nargs="*", help="Hub ids (default: every MODEL_REVISIONS entry)"
+    )
+    commands.add_parser("list", help="Show stored models and whether they are complete")
+    args = parser.parse_args()
+
+    if args.command == "prefetch":
+        os.makedirs(MODEL_STORE_DIR, exist_ok=True)
+        for model_id in args.models or list(MODEL_REVISIONS):
+            start = time.perf_counter()
+            entry = model_store.prefetch(model_id)
+            size = sum(entry["files"].values()) / 2**20
+            print(
+                f"{model_id}@{entry['commit'][:12]}: {size:.0f} MB "
+                f"in {time.perf_counter() - start:.0f}s"
+            )
+    else:
+        for model_id, entry in model_store.stats()["models"].items():
+            state = "ok" if entry["complete"] else "INCOMPLETE"
+            print(f"{model_id}@{entry['commit'][:12]} {state}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,107 @@
+import os
+import threading
+import numpy as np
+
+TORCH = "torch"
+TORCH_INT8 = "torch-int8"
+ONNX = "onnx"
+SAVEDMODEL = "savedmodel"
+TFLITE = "tflite"
+
+TORCH_BACKENDS = [TORCH, TORCH_INT8, ONNX]
+DIGIT_BACKENDS = [SAVEDMODEL, TFLITE]
+
+
+def relative_error(reference, candidate):
+    reference = np.asarray(reference, dtype=np.float64)
+    candidate = np.asarray(candidate, dtype=np.float64)
+    scale = np.linalg.norm(reference) or 1.0
+    return float(np.linalg.norm(reference - candidate) / scale)
+
+
+def check_parity(name, backend, reference, candidate, tolerance):
+    """Compare a backend's outputs with the float32 reference on the same inputs"""
+    error = relative_error(reference, candidate)
+    if error <= tolerance:
+        print(f"{name} {backend} backend matches reference (error {error:.4f})")
+        return True
+    print(
+        f"{name} {backend} backend differs from reference "
+        f"(error {error:.4f} > {tolerance}); falling back to the reference backend"
+    )
+    return False
+
+
+def quantize_dynamic_int8(model):
+    """Dynamic int8 quantization of every Linear layer (weights int8, activations float)"""
+    import torch
+
+    return torch.quantization.quantize_dynamic(
+        model.to("cpu").eval(), {torch.nn.Linear}, dtype=torch.qint8
+    )
+
+
+def load_onnx_model(kind, model_id):
+    """Export (or reuse an exported copy of) a hub model for ONNX Runtime via optimum"""
+    try:
+        from optimum.onnxruntime import (
+            ORTModelForSequenceClassification,
+            ORTModelForSpeechSeq2Seq,
+        )
+    except ImportError:
+        raise ImportError(
+            "The onnx backend needs 'optimum[onnxruntime]'. Please install it."
+        )
+
+    model_class = {
+        "text-classification": ORTModelForSequenceClassification,
+        "automatic-speech-recognition": ORTModelForSpeechSeq2Seq,
+    }[kind]
+    return model_class.from_pretrained(model_id, export=True)
+
+
+class TFLitePredictor:
+    """Callable wrapper around a TFLite interpreter with a resizable batch dimension"""
+
+    def __init__(self, model_content, num_threads=None):
+        import tensorflow as tf
+
+        self.interpreter = tf.lite.Interpreter(
+            model_content=model_content, num_threads=num_threads
+        )
+        self.input_index = self.interpreter.get_input_details()[0]["index"]
+        self.output_index = self.interpreter.get_output_details()[0]["index"]
+        self.batch_size = None
+        # Interpreters hold mutable tensor buffers and are not thread safe
+        self._lock = threading.Lock()
+
+    def __call__(self, images):
+        images = np.ascontiguousarray(images, dtype=np.float32)
+        with self._lock:
+            if images.shape[0] != self.batch_size:
+                self.interpreter.resize_tensor_input(self.input_index, images.shape)
+                self.interpreter.allocate_tensors()
+                self.batch_size = images.shape[0]
+            self.interpreter.set_tensor(self.input_index, images)
+            self.interpreter.invoke()
+            return self.interpreter.get_tensor(self.output_index).copy()
+
+
+def load_tflite_predictor(saved_model_dir, saved_model_file, cache_file):
+    """Convert the SavedModel to TFLite once and reuse the converted file afterwards"""
+    source = os.path.join(saved_model_dir, saved_model_file)
+    if os.path.exists(cache_file) and os.path.getmtime(cache_file) >= os.path.getmtime(
+        source
+    ):
+        with open(cache_file, "rb") as f:
+            return TFLitePredictor(f.read())
+
+    import tensorflow as tf
+
+    model_content = tf.lite.TFLiteConverter.from_saved_model(saved_model_dir).convert()
+    try:
+        with open(cache_file, "wb") as f:
+            f.write(model_content)
+    except OSError as e:
+        print(f"Could not cache TFLite model: {e}")
+    return TFLitePredictor(model_content)
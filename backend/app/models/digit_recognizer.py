@@ -1,75 +1,147 @@
 import os
 import numpy as np
 import tensorflow as tf
-from ..config import MODEL_PATH, DIGIT_MODEL_FILE
+from ..config import (
+    MODEL_PATH,
+    DIGIT_MODEL_FILE,
+    DIGIT_BACKEND,
+    DIGIT_TFLITE_FILE,
+    BACKEND_PARITY_CHECK,
+    DIGIT_PARITY_TOLERANCE,
+)
+from ..utils.metrics import timed
+from ..utils.runtime import configure_tensorflow
+from .backends import SAVEDMODEL, TFLITE, check_parity, load_tflite_predictor
 
 
 class DigitRecognizer:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.model = None
         self.predict_fn = None
+        self.backend = backend or DIGIT_BACKEND
+        self.tflite_predictor = None
+        self.trace_count = 0
         self.load_model()
 
     def load_model(self):
+        configure_tensorflow()
         if not os.path.exists(os.path.join(MODEL_PATH, DIGIT_MODEL_FILE)):
             raise FileNotFoundError(
                 f"Model không tìm thấy tại {MODEL_PATH}. Vui lòng copy model SavedModel vào thư mục này."
             )
 
         self.model = tf.saved_model.load(MODEL_PATH)
+        self.predict_fn = self._build_serving_fn()
 
+        if self.backend == TFLITE:
+            self.load_tflite()
+
+    def load_tflite(self):
+        try:
+            predictor = load_tflite_predictor(
+                MODEL_PATH, DIGIT_MODEL_FILE, DIGIT_TFLITE_FILE
+            )
+
+            if BACKEND_PARITY_CHECK:
+                sample = np.random.default_rng(0).random((8, 28, 28, 1), "float32")
+                reference = self._run_model(sample)
+                if not check_parity(
+                    "digit", TFLITE, reference, predictor(sample), DIGIT_PARITY_TOLERANCE
+                ):
+                    self.backend = SAVEDMODEL
+                    return
+
+            self.tflite_predictor = predictor
+        except Exception as e:
+            print(f"Không thể tải TFLite backend, dùng SavedModel: {e}")
+            self.backend = SAVEDMODEL
+
+    def _serving_candidates(self):
+        # Same preference order as before, but resolved once at load time
         if hasattr(self.model, "predict"):
-            self.predict_fn = self.model.predict
-        elif hasattr(self.model, "__call__"):
-            self.predict_fn = self.model
-        else:
-            self.predict_fn = self.model.signatures["serving_default"]
+            yield self.model.predict
+        if hasattr(self.model, "__call__"):
+            yield self.model
+        signatures = getattr(self.model, "signatures", {})
+        if "serving_default" in signatures:
+            yield signatures["serving_default"]
+
+    def _pin(self, candidate):
+        @tf.function(input_signature=[tf.TensorSpec([None, 28, 28, 1], tf.float32)])
+        def serve(images):
+            # Python in here only runs while tracing, never per request
+            self.trace_count += 1
+            outputs = candidate(images)
+            if isinstance(outputs, dict):
+                # For SavedModel signatures
+                outputs = outputs[next(iter(outputs))]
+            return outputs
+
+        return serve
+
+    def _build_serving_fn(self):
+        """Wrap the first working serving entry point in a tf.function with a fixed spec.
+
+        The batch dimension is left open, so one trace serves every batch
+        size; trace_count only grows past 1 if something forces a retrace.
+        """
+        errors = []
+        for candidate in self._serving_candidates():
+            serve = self._pin(candidate)
+            try:
+                # Warm up: trace and run once before the first request
+                serve(tf.zeros([1, 28, 28, 1], tf.float32))
+                return serve
+            except Exception as e:
+                errors.append(str(e))
+                self.trace_count = 0
+
+        raise RuntimeError(f"No usable serving function in digit model: {errors}")
+
+    def _run_model(self, images):
+        return self.predict_fn(tf.convert_to_tensor(images, tf.float32)).numpy()
+
+    @property
+    def retrace_count(self):
+        return max(self.trace_count - 1, 0)
+
+    def stats(self):
+        return {"backend": self.backend, "retraces": self.retrace_count}
 
     def predict(self, image_array):
+        return self.predict_batch(image_array)[0]
+
+    def predict_batch(self, images):
+        """Predict a list of (1, 28, 28, 1) arrays or an (N, 28, 28, 1) batch with one model call"""
+        if isinstance(images, (list, tuple)):
+            images = np.concatenate(images, axis=0)
+
+        results = [{"prediction": "?", "confidence": 0} for _ in range(len(images))]
+
+        # Blank canvases never reach the model
+        drawn = np.flatnonzero(images.reshape(len(images), -1).sum(axis=1) != 0)
+        if len(drawn) == 0:
+            return results
+
         try:
-            # Check if image is valid
-            if np.sum(image_array) == 0:
-                return {"prediction": "?", "confidence": 0}
+            with timed("predict", "digit_recognizer"):
+                if self.tflite_predictor is not None:
+                    prediction_values = self.tflite_predictor(images[drawn])
+                else:
+                    prediction_values = self._run_model(images[drawn])
+        except Exception as e:
+            print(f"Prediction error: {e}")
+            for i in drawn:
+                results[i] = {"prediction": "Error", "confidence": 0, "error": str(e)}
+            return results
 
-            # Try standard SavedModel interface
-            input_tensor = tf.constant(image_array, dtype=tf.float32)
-            predictions = self.predict_fn(input_tensor)
+        predicted_classes = np.argmax(prediction_values, axis=1)
+        confidences = prediction_values[np.arange(len(drawn)), predicted_classes]
 
-            # Extract prediction from result - handling different model output formats
-            if isinstance(predictions, dict):
-                # For SavedModel signatures
-                output_key = list(predictions.keys())[0]
-                prediction_tensor = predictions[output_key]
-            else:
-                # For regular model outputs
-                prediction_tensor = predictions
-
-            # Convert tensor to numpy array
-            prediction_values = prediction_tensor.numpy()[0]
-            predicted_class = np.argmax(prediction_values)
-            confidence = float(prediction_values[predicted_class])
-
-            return {
+        for i, predicted_class, confidence in zip(drawn, predicted_classes, confidences):
+            results[i] = {
                 "prediction": str(predicted_class),
-                "confidence": round(confidence * 100, 2),
+                "confidence": round(float(confidence) * 100, 2),
             }
-        except Exception as e:
-            print(f"Prediction error: {e}")
-            # Fallback approach for other model formats
-            try:
-                predictions = self.model(tf.constant(image_array))
-                prediction_values = predictions.numpy()[0]
-                predicted_class = np.argmax(prediction_values)
-                confidence = float(prediction_values[predicted_class])
-
-                return {
-                    "prediction": str(predicted_class),
-                    "confidence": round(confidence * 100, 2),
-                }
-            except Exception as e2:
-                print(f"Fallback prediction error: {e2}")
-                return {"prediction": "Error", "confidence": 0, "error": str(e2)}
-
-
-# Create a singleton instance
-digit_recognizer = DigitRecognizer()
+        return results
+
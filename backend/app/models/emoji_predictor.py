@@ -1,11 +1,60 @@
-from transformers import pipeline
-from ..config import EMOTION_MODEL, FRAMEWORK
+import numpy as np
+from ..config import (
+    EMOTION_MODEL,
+    FRAMEWORK,
+    EMOJI_BATCH_SIZE,
+    EMOJI_CACHE_SIZE,
+    EMOJI_CACHE_TTL,
+    EMOJI_CACHE_BACKEND,
+    EMOJI_CACHE_PATH,
+    EMOJI_TOKEN_CACHE_SIZE,
+    EMOTION_BACKEND,
+    BACKEND_PARITY_CHECK,
+    EMOTION_PARITY_TOLERANCE,
+)
+from ..utils.metrics import count_error, timed
+from ..utils.result_cache import ResultCache, SQLiteCacheBackend
+from ..utils.runtime import configure_torch
+from ..utils.token_cache import PrefixTokenCache
+from .artifacts import model_store
+from .backends import (
+    TORCH,
+    TORCH_INT8,
+    check_parity,
+    load_onnx_model,
+    quantize_dynamic_int8,
+)
+
+# Inputs used to compare a quantized/ONNX backend with the float32 model
+PARITY_TEXTS = [
+    "I love this so much!",
+    "This is terrible and I'm angry.",
+    "ok",
+    "Thank you for your help",
+    "I'm not sure what you mean",
+]
+
+
+def create_cache():
+    backend = None
+    if EMOJI_CACHE_BACKEND == "sqlite":
+        backend = SQLiteCacheBackend(EMOJI_CACHE_PATH)
+    return ResultCache(EMOJI_CACHE_SIZE, EMOJI_CACHE_TTL, backend)
+
+
+# Shared by every EmojiPredictor so hits survive idle unloading
+emoji_cache = create_cache()
 
 
 class EmojiPredictor:
-    def __init__(self):
+    def __init__(self, backend=None):
         self.emoji_classifier = None
         self.emoji_model_loaded = False
+        self.labels = None  # Class names in logit order
+        self.emojis = None  # Emoji for each class, same order
+        self.token_cache = None
+        self.backend = backend or EMOTION_BACKEND
+        self.cache = emoji_cache
         self.emoji_map = {
             "admiration": "👏",
             "amusement": "😂",
@@ -40,34 +89,289 @@ class EmojiPredictor:
 
     def load_model(self):
         try:
+            configure_torch()
+            from transformers import pipeline
+
             self.emoji_classifier = pipeline(
                 "text-classification",
-                model=EMOTION_MODEL,
+                model=model_store.path(EMOTION_MODEL),
                 framework=FRAMEWORK,
             )
+            if self.backend != TORCH:
+                self.load_backend(pipeline)
+            self.load_labels()
+            self.token_cache = PrefixTokenCache(
+                self.emoji_classifier.tokenizer, EMOJI_TOKEN_CACHE_SIZE, PARITY_TEXTS
+            )
             self.emoji_model_loaded = True
         except Exception as e:
             print(f"Không thể tải model emoji: {e}")
             self.emoji_model_loaded = False
 
+    def load_backend(self, pipeline):
+        """Swap the float32 pipeline for a quantized or ONNX one if it matches it"""
+        reference = self.emoji_classifier
+        try:
+            if self.backend == TORCH_INT8:
+                model = quantize_dynamic_int8(reference.model)
+            else:
+                model = load_onnx_model(
+                    "text-classification", model_store.path(EMOTION_MODEL)
+                )
+
+            candidate = pipeline(
+                "text-classification",
+                model=model,
+                tokenizer=reference.tokenizer,
+                framework=FRAMEWORK,
+            )
+            if BACKEND_PARITY_CHECK and not check_parity(
+                "emoji",
+                self.backend,
+                self._label_scores(reference),
+                self._label_scores(candidate),
+                EMOTION_PARITY_TOLERANCE,
+            ):
+                self.backend = TORCH
+                return
+
+            self.emoji_classifier = candidate
+        except Exception as e:
+            print(f"Không thể tải backend {self.backend} cho model emoji: {e}")
+            self.backend = TORCH
+
+    def load_labels(self):
+        # Arrays, so a whole matrix of class indices maps to names in one step
+        id2label = self.emoji_classifier.model.config.id2label
+        self.labels = np.array([id2label[i] for i in range(len(id2label))])
+        self.emojis = np.array([self.emoji_map.get(l, "❓") for l in self.labels])
+
+    def _label_scores(self, classifier):
+        outputs = classifier(PARITY_TEXTS, top_k=None)
+        return [
+            [item["score"] for item in sorted(output, key=lambda item: item["label"])]
+            for output in outputs
+        ]
+
+    def _format_result(self, result):
+        emotion = result["label"]
+        confidence = result["score"]
+
+        return {
+            "emotion": emotion,
+            "emoji": self.emoji_map.get(emotion, "❓"),
+            "confidence": round(confidence * 100, 2),
+        }
+
+    def cache_key(self, text):
+        # The model is uncased, so case and spacing never change its answer
+        return f"{EMOTION_MODEL}:{self.backend}:{' '.join(text.lower().split())}"
+
     def predict(self, text):
         if not self.emoji_model_loaded:
             return {"error": "Model emoji chưa được tải. Vui lòng kiểm tra logs."}
 
+        with timed("predict", "emoji_predictor"):
+            key = self.cache_key(text)
+            cached = self.cache.get(key)
+            if cached is not None:
+                return cached
+
+            try:
+                output = self.emoji_classifier(text, truncation=True)[0]
+                result = self._format_result(output)
+                self.cache.set(key, result)
+                return result
+            except Exception as e:
+                print(f"Error predicting emoji: {e}")
+                count_error("predict", "emoji_predictor")
+                return {"error": str(e)}
+
+    def predict_batch(self, texts):
+        """Predict many texts, batching texts of similar token length together"""
+        if not self.emoji_model_loaded:
+            return [
+                {"error": "Model emoji chưa được tải. Vui lòng kiểm tra logs."}
+                for _ in texts
+            ]
+
+        with timed("predict_batch", "emoji_predictor"):
+            return self._predict_batch(list(texts))
+
+    def _length_buckets(self, texts, indices):
+        """Split ``indices`` into batches of texts with similar token lengths"""
+        # Sort by tokenized length so each forward pass pads very little
+        input_ids = self.emoji_classifier.tokenizer(
+            [texts[i] for i in indices], truncation=True
+        )["input_ids"]
+        lengths = dict(zip(indices, map(len, input_ids)))
+        order = sorted(indices, key=lengths.get)
+        return [
+            order[start : start + EMOJI_BATCH_SIZE]
+            for start in range(0, len(order), EMOJI_BATCH_SIZE)
+        ]
+
+    def _classify(self, texts):
+        """Pipeline outputs for ``texts``, retried one text at a time on failure.
+
+        Batches mix texts from different requests, so an input that breaks
+        the pipeline only gets an {"error"} of its own.
+        """
+        try:
+            return self.emoji_classifier(texts, batch_size=len(texts), truncation=True)
+        except Exception as e:
+            print(f"Error predicting emoji batch, retrying one by one: {e}")
+
+        outputs = []
+        for text in texts:
+            try:
+                outputs.append(self.emoji_classifier(text, truncation=True)[0])
+            except Exception as e:
+                print(f"Error predicting emoji: {e}")
+                count_error("predict_batch", "emoji_predictor")
+                outputs.append({"error": str(e)})
+        return outputs
+
+    def _predict_batch(self, texts):
+        try:
+            keys = [self.cache_key(text) for text in texts]
+            results = [self.cache.get(key) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                return results
+
+            for bucket in self._length_buckets(texts, missing):
+                outputs = self._classify([texts[i] for i in bucket])
+                for i, output in zip(bucket, outputs):
+                    if "error" in output:
+                        results[i] = output
+                        continue
+                    results[i] = self._format_result(output)
+                    self.cache.set(keys[i], results[i])
+
+            return results
+        except Exception as e:
+            print(f"Error predicting emoji batch: {e}")
+            count_error("predict_batch", "emoji_predictor")
+            return [{"error": str(e)} for _ in texts]
+
+    def predict_typing(self, texts):
+        """predict_batch for text typed a keystroke at a time.
+
+        Results share the cache with predict_batch; misses are tokenized
+        through the prefix token cache, so only the word being typed is
+        tokenized again.
+        """
+        if not self.emoji_model_loaded:
+            return [
+                {"error": "Model emoji chưa được tải. Vui lòng kiểm tra logs."}
+                for _ in texts
+            ]
+
+        with timed("predict_typing", "emoji_predictor"):
+            return self._predict_typing(list(texts))
+
+    def _predict_typing(self, texts):
+        try:
+            keys = [self.cache_key(text) for text in texts]
+            results = [self.cache.get(key) for key in keys]
+            missing = [i for i, result in enumerate(results) if result is None]
+            if not missing:
+                return results
+
+            input_ids = [self.token_cache.encode(texts[i]) for i in missing]
+            probabilities = self.probabilities(
+                [texts[i] for i in missing], input_ids
+            )
+            best = probabilities.argmax(axis=1)
+            scores = probabilities[np.arange(len(best)), best]
+            for i, label, score in zip(missing, self.labels[best], scores):
+                results[i] = self._format_result(
+                    {"label": str(label), "score": float(score)}
+                )
+                self.cache.set(keys[i], results[i])
+            return results
+        except Exception as e:
+            print(f"Error predicting emoji while typing: {e}")
+            count_error("predict_typing", "emoji_predictor")
+            return [{"error": str(e)} for _ in texts]
+
+    def distribution_key(self, text):
+        return f"distribution:{self.cache_key(text)}"
+
+    def probabilities(self, texts, input_ids=None):
+        """Class probabilities for every text as an (n, classes) float32 matrix.
+
+        Pass ``input_ids`` (with special tokens) to skip tokenizing the texts.
+        """
+        import torch
+
+        tokenizer = self.emoji_classifier.tokenizer
+        model = self.emoji_classifier.model
+        if input_ids is None:
+            input_ids = tokenizer(texts, truncation=True)["input_ids"]
+
+        # Sort by token count so each forward pass pads very little
+        order = sorted(range(len(texts)), key=lambda i: len(input_ids[i]))
+        logits = np.empty((len(texts), len(self.labels)), dtype=np.float32)
+        for start in range(0, len(order), EMOJI_BATCH_SIZE):
+            bucket = order[start : start + EMOJI_BATCH_SIZE]
+            inputs = tokenizer.pad(
+                {"input_ids": [input_ids[i] for i in bucket]},
+                return_tensors=FRAMEWORK,
+            )
+            with torch.inference_mode():
+                logits[bucket] = np.asarray(model(**inputs).logits, dtype=np.float32)
+
+        # Softmax over the whole matrix, as the pipeline does row by row
+        logits -= logits.max(axis=1, keepdims=True)
+        np.exp(logits, out=logits)
+        logits /= logits.sum(axis=1, keepdims=True)
+        return logits
+
+    def predict_distribution(self, texts, top_k=None):
+        """Ranked emotions for many texts as parallel arrays; top_k=None keeps all"""
+        if not self.emoji_model_loaded:
+            return {"error": "Model emoji chưa được tải. Vui lòng kiểm tra logs."}
+
+        with timed("predict_distribution", "emoji_predictor"):
+            return self._predict_distribution(list(texts), top_k)
+
+    def _predict_distribution(self, texts, top_k):
         try:
-            result = self.emoji_classifier(text)[0]
-            emotion = result["label"]
-            confidence = result["score"]
+            # The full distribution is cached, so any top_k can be served from it
+            keys = [self.distribution_key(text) for text in texts]
+            probabilities = np.empty((len(texts), len(self.labels)), dtype=np.float32)
+            missing = []
+            for i, key in enumerate(keys):
+                cached = self.cache.get(key)
+                if cached is None:
+                    missing.append(i)
+                else:
+                    probabilities[i] = cached
+            if missing:
+                computed = self.probabilities([texts[i] for i in missing])
+                probabilities[missing] = computed
+                for i, row in zip(missing, computed):
+                    self.cache.set(keys[i], row.tolist())
+
+            # Rank all texts at once; with a top_k only k columns get sorted
+            classes = len(self.labels)
+            k = min(top_k or classes, classes)
+            if k < classes:
+                top = np.argpartition(-probabilities, k - 1, axis=1)[:, :k]
+                scores = np.take_along_axis(probabilities, top, axis=1)
+                top = np.take_along_axis(top, np.argsort(-scores, axis=1), axis=1)
+            else:
+                top = np.argsort(-probabilities, axis=1)
+            scores = np.take_along_axis(probabilities, top, axis=1)
 
             return {
-                "emotion": emotion,
-                "emoji": self.emoji_map.get(emotion, "❓"),
-                "confidence": round(confidence * 100, 2),
+                "emotions": self.labels[top].tolist(),
+                "emojis": self.emojis[top].tolist(),
+                "confidences": np.round(scores.astype(np.float64) * 100, 2).tolist(),
             }
         except Exception as e:
-            print(f"Error predicting emoji: {e}")
+            print(f"Error predicting emoji distribution: {e}")
+            count_error("predict_distribution", "emoji_predictor")
             return {"error": str(e)}
-
-
-# Create a singleton instance
-emoji_predictor = EmojiPredictor()
@@ -0,0 +1,205 @@
+import gc
+import importlib
+import threading
+import time
+from ..config import MODEL_IDLE_TIMEOUT_S, MODEL_IDLE_CHECK_S, MODEL_RETRY_COOLDOWN_S
+
+UNLOADED = "unloaded"
+LOADING = "loading"
+READY = "ready"
+FAILED = "failed"
+
+
+class LazyModel:
+    """A model that is imported and constructed the first time it is used.
+
+    ``factory`` is a "module:Class" path relative to app.models, so heavy
+    frameworks (tensorflow, torch, transformers) are only imported when
+    the model is actually needed. ``ready_attr`` names the flag that the
+    model sets when its own loading failed without raising. After a load
+    that raised, get() fails fast for ``retry_cooldown`` seconds instead of
+    paying for another attempt on every request.
+    """
+
+    def __init__(self, name, factory, ready_attr=None, retry_cooldown=None):
+        self.name = name
+        self.factory = factory
+        self.ready_attr = ready_attr
+        self.retry_cooldown = (
+            MODEL_RETRY_COOLDOWN_S if retry_cooldown is None else retry_cooldown
+        )
+        self.state = UNLOADED
+        self.instance = None
+        self.error = None
+        self.failed_at = None  # time.monotonic() of the last load that raised
+        self.loaded_at = None
+        self.load_seconds = None
+        self.last_used = None
+        self.pinned = False  # Pinned models are never unloaded for being idle
+        self._lock = threading.Lock()
+
+    def _construct(self):
+        module_name, class_name = self.factory.split(":")
+        module = importlib.import_module(module_name, package=__package__)
+        return getattr(module, class_name)()
+
+    def get(self):
+        self.last_used = time.monotonic()
+        instance = self.instance
+        if instance is not None:
+            return instance
+
+        with self._lock:
+            if self.instance is None:
+                if self.failed_at is not None:
+                    retry_in = self.failed_at + self.retry_cooldown - time.monotonic()
+                    if retry_in > 0:
+                        raise RuntimeError(
+                            f"Model {self.name} failed to load ({self.error}); "
+                            f"retrying in {retry_in:.0f}s"
+                        )
+
+                self.state = LOADING
+                start = time.perf_counter()
+                try:
+                    instance = self._construct()
+                except Exception as e:
+                    print(f"Không thể tải model {self.name}: {e}")
+                    self.state = FAILED
+                    self.error = str(e)
+                    self.failed_at = time.monotonic()
+                    raise
+
+                self.failed_at = None
+                self.load_seconds = round(time.perf_counter() - start, 2)
+                self.loaded_at = time.time()
+                if self.ready_attr and not getattr(instance, self.ready_attr, False):
+                    self.state = FAILED
+                    self.error = "Model reported that it could not be loaded"
+                else:
+                    self.state = READY
+                    self.error = None
+                self.instance = instance
+            return self.instance
+
+    def unload(self):
+        with self._lock:
+            if self.instance is None:
+                return False
+            # Requests still holding a reference finish normally
+            self.instance = None
+            self.state = UNLOADED
+            self.loaded_at = None
+        gc.collect()
+        return True
+
+    def idle_seconds(self):
+        if self.last_used is None:
+            return None
+        return time.monotonic() - self.last_used
+
+    def stats(self):
+        idle = self.idle_seconds()
+        stats = {
+            "state": self.state,
+            "load_seconds": self.load_seconds,
+            "idle_seconds": round(idle, 1) if idle is not None else None,
+            "error": self.error,
+        }
+        # Models may report their own counters once they are loaded
+        instance = self.instance
+        if instance is not None and hasattr(instance, "stats"):
+            stats["details"] = instance.stats()
+        return stats
+
+
+class ModelRegistry:
+    """Owns every LazyModel and unloads the ones that sit idle too long"""
+
+    def __init__(
+        self, idle_timeout=MODEL_IDLE_TIMEOUT_S, check_interval=MODEL_IDLE_CHECK_S
+    ):
+        self.models = {}
+        self.idle_timeout = idle_timeout
+        self.check_interval = check_interval
+        self._reaper = None
+        self._stop = threading.Event()
+
+    def register(self, name, factory, ready_attr=None):
+        self.models[name] = LazyModel(name, factory, ready_attr)
+
+    def get(self, name):
+        return self.models[name].get()
+
+    def state(self, name):
+        return self.models[name].state
+
+    def pin(self, name):
+        self.models[name].pinned = True
+
+    def stats(self):
+        """Model states, without loading anything"""
+        return {name: model.stats() for name, model in self.models.items()}
+
+    def warmup(self, names):
+        """Load the given models in background threads"""
+        threads = []
+        for name in names:
+            thread = threading.Thread(
+                target=self._warm_one, args=(name,), name=f"warmup-{name}"
+            )
+            thread.daemon = True
+            thread.start()
+            threads.append(thread)
+        return threads
+
+    def _warm_one(self, name):
+        try:
+            self.get(name)
+        except Exception:
+            pass  # Already recorded as FAILED
+
+    def unload_idle(self):
+        unloaded = []
+        if self.idle_timeout is None:
+            return unloaded
+        for name, model in self.models.items():
+            idle = model.idle_seconds()
+            if model.pinned or idle is None:
+                continue
+            if model.state in (READY, FAILED):
+                if idle > self.idle_timeout and model.unload():
+                    print(f"Unloaded idle model {name} after {idle:.0f}s")
+                    unloaded.append(name)
+        return unloaded
+
+    def _reap(self):
+        while not self._stop.wait(self.check_interval):
+            self.unload_idle()
+
+    def start(self):
+        if self.idle_timeout is None or self._reaper is not None:
+            return
+        self._stop.clear()
+        self._reaper = threading.Thread(
+            target=self._reap, name="model-reaper", daemon=True
+        )
+        self._reaper.start()
+
+    def stop(self):
+        self._stop.set()
+        self._reaper = None
+
+
+# Create a singleton instance
+model_registry = ModelRegistry()
+model_registry.register("digit_recognizer", ".digit_recognizer:DigitRecognizer")
+model_registry.register(
+    "emoji_predictor", ".emoji_predictor:EmojiPredictor", "emoji_model_loaded"
+)
+model_registry.register(
+    "speech_recognizer", ".speech_recognizer:SpeechRecognizer", "model_loaded"
+)
+model_registry.register(
+    "speech_recognizer_fast", ".speech_recognizer:FastSpeechRecognizer", "model_loaded"
+)
@@ -0,0 +1,306 @@
+import asyncio
+import threading
+import time
+from ..config import (
+    SPEECH_JOB_DB_PATH,
+    SPEECH_JOB_BATCH_SIZE,
+    SPEECH_JOB_BATCH_WAIT_MS,
+    SPEECH_JOB_MAX_ACTIVE,
+    SPEECH_JOB_POLL_S,
+    SPEECH_JOB_TTL_S,
+    SPEECH_PROFILES,
+    MAX_UPLOAD_AUDIO_LENGTH,
+)
+from ..utils.executors import PoolSaturatedError, speech_pool
+from ..utils.job_store import QUEUED, JobStore
+from ..utils.result_cache import CACHE_STATUS
+from .registry import model_registry
+from .speech_profiles import resolve_profile
+
+# Jobs share batches, so they all decode with the default long-audio profile
+JOB_PROFILE = resolve_profile(None, float("inf"))
+JOB_MODEL = SPEECH_PROFILES[JOB_PROFILE]["model"]
+
+
+class ActiveJob:
+    """A claimed job whose audio is decoded and split into pipe inputs"""
+
+    def __init__(self, job, cache_key, packs, inputs):
+        self.id = job["id"]
+        self.client = job["client"]
+        self.priority = job["priority"]
+        self.created = job["created"]
+        self.cache_key = cache_key
+        self.packs = packs
+        self.inputs = inputs
+        self.results = [None] * len(inputs)
+        self.next_chunk = 0
+        self.remaining = len(inputs)
+
+    def has_chunks(self):
+        return self.next_chunk < len(self.inputs)
+
+
+class TranscriptionScheduler:
+    """Run queued transcription jobs, packing chunks of many jobs into each pipe call.
+
+    Each job's speech is split into <=30 s chunks (SpeechRecognizer.split_audio).
+    Batches take chunks from the highest priority first and, within a
+    priority, one chunk per client in turn, least recently served client
+    first, so one client's long upload cannot starve everyone else.
+    """
+
+    def __init__(
+        self,
+        store,
+        batch_size=SPEECH_JOB_BATCH_SIZE,
+        batch_wait_ms=SPEECH_JOB_BATCH_WAIT_MS,
+        max_active=SPEECH_JOB_MAX_ACTIVE,
+    ):
+        self.store = store
+        self.batch_size = batch_size
+        self.batch_wait = batch_wait_ms / 1000.0
+        self.max_active = max_active
+        self.active = {}  # job id -> ActiveJob, changed by the scheduler thread only
+        self._active_lock = threading.Lock()  # Held to change or read it elsewhere
+        self.served = {}  # client -> chunks run so far, for fairness
+        self.queued = 0  # Store count as of the scheduler's last pass, for stats()
+        self.batches = 0
+        self.chunks = 0
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        self._thread = None
+        self._waiters = {}  # job id -> [(loop, future)]
+        self._waiters_lock = threading.Lock()
+
+    def submit(self, audio, format_type, client, priority=0):
+        job = self.store.create(audio, format_type, client, priority)
+        self._wake.set()
+        return job
+
+    def _notify(self, job_id):
+        with self._waiters_lock:
+            waiters = self._waiters.pop(job_id, [])
+        for loop, future in waiters:
+            loop.call_soon_threadsafe(
+                lambda future=future: future.done() or future.set_result(None)
+            )
+
+    async def wait(self, job_id, timeout):
+        """Sleep until this worker finishes the job or ``timeout`` seconds pass"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        with self._waiters_lock:
+            self._waiters.setdefault(job_id, []).append((loop, future))
+        try:
+            await asyncio.wait_for(future, timeout)
+        except asyncio.TimeoutError:
+            pass
+        finally:
+            with self._waiters_lock:
+                waiters = self._waiters.get(job_id, [])
+                if (loop, future) in waiters:
+                    waiters.remove((loop, future))
+                if not waiters:
+                    self._waiters.pop(job_id, None)
+
+    def _complete(self, job_id, result):
+        self.store.complete(job_id, result)
+        self._notify(job_id)
+
+    def _fail(self, job_id, error):
+        print(f"Transcription job {job_id} failed: {error}")
+        self.store.fail(job_id, error)
+        self._notify(job_id)
+
+    def _activate(self):
+        """Claim queued jobs up to max_active and prepare their chunks"""
+        with self._active_lock:
+            room = self.max_active - len(self.active)
+        if room > 0:
+            for job in self.store.claim(room):
+                try:
+                    self._prepare(job)
+                except Exception as e:
+                    self._fail(job["id"], str(e))
+        self.queued = self.store.count(QUEUED)
+
+    def _prepare(self, job):
+        recognizer = model_registry.get(JOB_MODEL)
+        if not recognizer.model_loaded:
+            self._fail(job["id"], "Model speech-to-text chưa được tải.")
+            return
+
+        audio = recognizer.process_audio_data(
+            job["audio"], job["format"], MAX_UPLOAD_AUDIO_LENGTH
+        )
+        if audio is None:
+            self._fail(job["id"], "Không thể xử lý file audio. Vui lòng thử lại.")
+            return
+
+        key = recognizer.cache_key(audio, JOB_PROFILE)
+        cached, tier = recognizer.cache.lookup(key)
+        if cached is not None:
+            self._complete(job["id"], {**cached, "cache": CACHE_STATUS[tier]})
+            return
+
+        packs, inputs = recognizer.split_audio(audio)
+        if not inputs:
+            result = {**recognizer.assemble([], []), "profile": JOB_PROFILE}
+            self._complete(job["id"], {**result, "cache": CACHE_STATUS[None]})
+            return
+        with self._active_lock:
+            self.active[job["id"]] = ActiveJob(job, key, packs, inputs)
+
+    def _pending_chunks(self):
+        with self._active_lock:
+            jobs = list(self.active.values())
+        return sum(len(job.inputs) - job.next_chunk for job in jobs)
+
+    def _next_batch(self):
+        """Pick up to batch_size (job, chunk) pairs: by priority, then client turns"""
+        batch = []
+        jobs = [job for job in self.active.values() if job.has_chunks()]
+        for priority in sorted({job.priority for job in jobs}, reverse=True):
+            by_client = {}
+            for job in sorted(jobs, key=lambda job: job.created):
+                if job.priority == priority:
+                    by_client.setdefault(job.client, []).append(job)
+            clients = sorted(by_client, key=lambda client: self.served.get(client, 0))
+
+            while len(batch) < self.batch_size and clients:
+                for client in list(clients):
+                    client_jobs = [job for job in by_client[client] if job.has_chunks()]
+                    if not client_jobs:
+                        clients.remove(client)
+                        continue
+                    job = client_jobs[0]
+                    batch.append((job, job.next_chunk))
+                    job.next_chunk += 1
+                    self.served[client] = self.served.get(client, 0) + 1
+                    if len(batch) == self.batch_size:
+                        break
+            if len(batch) == self.batch_size:
+                break
+        return batch
+
+    def _run_pipe(self, recognizer, inputs):
+        # Share the speech pool with the synchronous routes so Whisper never
+        # runs more calls at once than SPEECH_POOL_WORKERS
+        while True:
+            try:
+                future = speech_pool.submit(
+                    recognizer.pipe,
+                    inputs,
+                    batch_size=len(inputs),
+                    **recognizer.decode_kwargs(inputs, JOB_PROFILE),
+                )
+                return future.result()
+            except PoolSaturatedError:
+                if self._stop.wait(0.1):
+                    raise
+
+    def _run_batch(self, batch):
+        recognizer = model_registry.get(JOB_MODEL)
+        inputs = [job.inputs[index] for job, index in batch]
+        try:
+            outputs = self._run_pipe(recognizer, inputs)
+        except Exception as e:
+            if self._stop.is_set():
+                return  # Stopped while waiting for the pool; _run releases them
+            for job_id in {job.id for job, _ in batch}:
+                with self._active_lock:
+                    self.active.pop(job_id, None)
+                self._fail(job_id, str(e))
+            return
+
+        self.batches += 1
+        self.chunks += len(batch)
+        for (job, index), output in zip(batch, outputs):
+            job.results[index] = output
+            job.remaining -= 1
+            if job.remaining == 0:
+                with self._active_lock:
+                    self.active.pop(job.id, None)
+                result = recognizer.assemble(job.packs, job.results)
+                result["profile"] = JOB_PROFILE
+                recognizer.cache.set(job.cache_key, result)
+                self._complete(job.id, {**result, "cache": CACHE_STATUS[None]})
+
+        # Forget clients with nothing left so the counters stay small
+        clients = {job.client for job in self.active.values()}
+        self.served = {c: n for c, n in self.served.items() if c in clients}
+
+    def _run(self):
+        try:
+            while not self._stop.is_set():
+                try:
+                    self._activate()
+                    if not self._pending_chunks():
+                        # Other workers may queue jobs in the shared store too
+                        self._wake.wait(SPEECH_JOB_POLL_S)
+                        self._wake.clear()
+                        continue
+
+                    if self._pending_chunks() < self.batch_size:
+                        # Give concurrent submissions a moment to fill the batch
+                        self._wake.wait(self.batch_wait)
+                        self._wake.clear()
+                        self._activate()
+
+                    self._run_batch(self._next_batch())
+                except Exception as e:
+                    print(f"Transcription scheduler error: {e}")
+                    time.sleep(SPEECH_JOB_POLL_S)
+        finally:
+            # Released only here, once no batch can still be running them, so
+            # the next worker to pick them up never transcribes them twice
+            self._release_active()
+
+    def _release_active(self):
+        with self._active_lock:
+            job_ids = list(self.active)
+            self.active.clear()
+        if job_ids:
+            self.store.release(job_ids)
+
+    def start(self):
+        if self._thread is not None:
+            return
+        requeued = self.store.requeue_orphans()
+        if requeued:
+            print(f"Requeued {requeued} interrupted transcription jobs")
+        self.store.purge(SPEECH_JOB_TTL_S)
+        self._stop.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="speech-job-scheduler", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        if self._thread is None:
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout=5)
+        if self._thread.is_alive():
+            # Still inside a Whisper call: it puts its unfinished jobs back in
+            # the queue when that returns. If the process exits first, the
+            # next worker's requeue_orphans() does.
+            print("Transcription scheduler still running a batch; not waiting")
+            return
+        self._thread = None
+
+    def stats(self):
+        return {
+            "queued_jobs": self.queued,
+            "active_jobs": len(self.active),  # len() is atomic
+            "pending_chunks": self._pending_chunks(),
+            "batches": self.batches,
+            "average_batch": (
+                round(self.chunks / self.batches, 2) if self.batches else 0
+            ),
+        }
+
+
+speech_jobs = TranscriptionScheduler(JobStore(SPEECH_JOB_DB_PATH))
@@ -0,0 +1,54 @@
+import math
+from ..config import (
+    SPEECH_DEFAULT_PROFILE,
+    SPEECH_PROFILES,
+    SPEECH_AUTO_FAST_MAX_S,
+    SPEECH_TOKENS_PER_SECOND,
+    SPEECH_MIN_NEW_TOKENS,
+    SPEECH_MAX_NEW_TOKENS,
+    SPEECH_LANGUAGE,
+)
+
+AUTO = "auto"
+FAST = "fast"
+BALANCED = "balanced"
+
+
+def check_profile(name):
+    """Raise ValueError for a profile name that is neither configured nor "auto" """
+    if name is not None and name != AUTO and name not in SPEECH_PROFILES:
+        choices = ", ".join([*SPEECH_PROFILES, AUTO])
+        raise ValueError(f"Unknown profile '{name}'. Choose one of: {choices}")
+
+
+def resolve_profile(name, duration, low_priority=False):
+    """Concrete profile for a request; "auto" picks fast for short/low-priority clips"""
+    check_profile(name)
+    name = name or SPEECH_DEFAULT_PROFILE
+    if name != AUTO:
+        return name
+    if low_priority or duration <= SPEECH_AUTO_FAST_MAX_S:
+        return FAST
+    return BALANCED
+
+
+def decode_kwargs(name, durations, language=None):
+    """Pipe call arguments for a profile and the durations (s) of the call's inputs"""
+    profile = SPEECH_PROFILES[name]
+    # Decoding stops at the end-of-text token anyway; the budget only cuts
+    # off runaway (repeating) generations, scaled to the longest input
+    tokens = SPEECH_MIN_NEW_TOKENS + math.ceil(
+        max(durations, default=0) * SPEECH_TOKENS_PER_SECOND
+    )
+
+    generate_kwargs = {"num_beams": profile["num_beams"]}
+    language = language or SPEECH_LANGUAGE
+    if language:
+        # A pinned language skips Whisper's detection pass
+        generate_kwargs.update(language=language, task="transcribe")
+
+    return {
+        "return_timestamps": profile["timestamps"],
+        "max_new_tokens": min(tokens, SPEECH_MAX_NEW_TOKENS),
+        "generate_kwargs": generate_kwargs,
+    }
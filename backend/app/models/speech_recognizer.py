@@ -1,27 +1,77 @@
+import hashlib
 import torch
 from transformers import AutoModelForSpeechSeq2Seq, AutoProcessor, pipeline
-import base64
-import io
-import os
-import tempfile
-import librosa
+import time
 import numpy as np
-from pydub import AudioSegment
-from ..config import SPEECH_MODEL, MAX_AUDIO_LENGTH, SUPPORTED_FORMATS
+from ..config import (
+    SPEECH_MODEL,
+    SPEECH_FAST_MODEL,
+    MAX_AUDIO_LENGTH,
+    SUPPORTED_FORMATS,
+    VAD_ENABLED,
+    SPEECH_BACKEND,
+    BACKEND_PARITY_CHECK,
+    SPEECH_PARITY_TOLERANCE,
+    TRANSCRIPT_CACHE_SIZE,
+    TRANSCRIPT_CACHE_TTL,
+    TRANSCRIPT_CACHE_BACKEND,
+    TRANSCRIPT_CACHE_PATH,
+    TRANSCRIPT_CACHE_MAX_BYTES,
+)
+from .artifacts import model_store
+from .speech_profiles import decode_kwargs, resolve_profile
+from .backends import (
+    TORCH,
+    TORCH_INT8,
+    check_parity,
+    load_onnx_model,
+    quantize_dynamic_int8,
+)
+from ..utils.audio_processing import DecodedAudio, load_audio
+from ..utils.metrics import count_error, observe, timed
+from ..utils.result_cache import CACHE_STATUS, ResultCache, SQLiteCacheBackend
+from ..utils.runtime import configure_torch
+from ..utils.vad import detect_speech_regions, pack_speech_regions
+
+
+def create_transcript_cache():
+    backend = None
+    if TRANSCRIPT_CACHE_BACKEND == "sqlite":
+        backend = SQLiteCacheBackend(
+            TRANSCRIPT_CACHE_PATH, max_bytes=TRANSCRIPT_CACHE_MAX_BYTES
+        )
+    return ResultCache(TRANSCRIPT_CACHE_SIZE, TRANSCRIPT_CACHE_TTL, backend)
+
+
+# Module level so cached transcripts survive idle unloading of the model
+transcript_cache = create_transcript_cache()
+
+
+def parity_audio(seconds=3, sample_rate=16000):
+    """Deterministic chirp plus noise used to compare backends"""
+    t = np.arange(seconds * sample_rate) / sample_rate
+    chirp = 0.4 * np.sin(2 * np.pi * (200 + 300 * t) * t)
+    noise = 0.05 * np.random.default_rng(0).standard_normal(len(t))
+    return (chirp + noise).astype(np.float32)
 
 
 class SpeechRecognizer:
-    def __init__(self):
+    def __init__(self, backend=None, model_name=None):
         self.speech_model = None
         self.processor = None
         self.pipe = None
         self.model_loaded = False
+        self.backend = backend or SPEECH_BACKEND
+        self.model_name = model_name or SPEECH_MODEL
+        self.cache = transcript_cache
         self.device = "cuda:0" if torch.cuda.is_available() else "cpu"
         self.torch_dtype = torch.float16 if torch.cuda.is_available() else torch.float32
         self.load_model()
 
     def load_model(self):
         try:
+            configure_torch()
+
             # Check if we can import accelerate
             try:
                 import accelerate
@@ -31,38 +81,32 @@ class SpeechRecognizer:
                 has_accelerate = False
                 print("Accelerate not found. Loading model in compatibility mode.")
 
+            # The hub id stays the model's name; files come from the local store
+            model_path = model_store.path(self.model_name)
+
             # Load the model with different settings based on environment
             if has_accelerate:
                 # Use accelerate for efficient loading
                 model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                    SPEECH_MODEL,
+                    model_path,
                     torch_dtype=self.torch_dtype,
                     low_cpu_mem_usage=True,
                 )
             else:
                 # Fallback to standard loading without accelerate-specific params
                 model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                    SPEECH_MODEL,
+                    model_path,
                     torch_dtype=self.torch_dtype,
                 )
 
             model.to(self.device)
 
-            self.processor = AutoProcessor.from_pretrained(SPEECH_MODEL)
+            self.processor = AutoProcessor.from_pretrained(model_path)
 
             # Create inference pipeline
-            self.pipe = pipeline(
-                "automatic-speech-recognition",
-                model=model,
-                tokenizer=self.processor.tokenizer,
-                feature_extractor=self.processor.feature_extractor,
-                max_new_tokens=128,
-                chunk_length_s=30,
-                batch_size=8,  # Reduced batch size for lower memory usage
-                return_timestamps=True,
-                torch_dtype=self.torch_dtype,
-                device=self.device,
-            )
+            self.pipe = self._pipeline(model)
+            if self.backend != TORCH:
+                self.load_backend(model)
             self.model_loaded = True
             print("Speech-to-text model loaded successfully!")
         except Exception as e:
@@ -73,14 +117,16 @@ class SpeechRecognizer:
             try:
                 print("Attempting to load smaller model as fallback...")
                 # Use Whisper tiny instead
-                smaller_model = "openai/whisper-tiny"
+                smaller_model = SPEECH_FAST_MODEL
+                # Also from the store, so a failure never turns into a download
+                smaller_path = model_store.path(smaller_model)
                 model = AutoModelForSpeechSeq2Seq.from_pretrained(
-                    smaller_model,
+                    smaller_path,
                     torch_dtype=self.torch_dtype,
                 )
                 model.to(self.device)
 
-                self.processor = AutoProcessor.from_pretrained(smaller_model)
+                self.processor = AutoProcessor.from_pretrained(smaller_path)
 
                 self.pipe = pipeline(
                     "automatic-speech-recognition",
@@ -91,128 +137,212 @@ class SpeechRecognizer:
                     torch_dtype=self.torch_dtype,
                     device=self.device,
                 )
+                self.model_name = smaller_model
+                self.backend = TORCH
                 self.model_loaded = True
                 print("Fallback to whisper-tiny model succeeded!")
             except Exception as e2:
                 print(f"Fallback model loading also failed: {e2}")
 
-    def process_audio_data(self, audio_data, format_type):
-        """Process audio data from base64 or file using pydub for better format support"""
+    def _pipeline(self, model):
+        return pipeline(
+            "automatic-speech-recognition",
+            model=model,
+            tokenizer=self.processor.tokenizer,
+            feature_extractor=self.processor.feature_extractor,
+            max_new_tokens=128,
+            chunk_length_s=30,
+            batch_size=8,  # Reduced batch size for lower memory usage
+            return_timestamps=True,
+            torch_dtype=self.torch_dtype,
+            device=self.device,
+        )
+
+    def load_backend(self, reference):
+        """Swap the float32 pipeline for a quantized or ONNX one if it matches it"""
         try:
-            # Create a temporary file to handle the audio properly
-            with tempfile.NamedTemporaryFile(
-                delete=False, suffix=f".{format_type}"
-            ) as temp_file:
-                temp_path = temp_file.name
-
-                # Handle base64 data
-                if isinstance(audio_data, str) and "base64" in audio_data:
-                    # Extract the base64 content
-                    if "," in audio_data:
-                        content_type, base64_data = audio_data.split(",", 1)
-                    else:
-                        base64_data = audio_data
-
-                    # Try to detect format from content type
-                    if "audio/wav" in content_type:
-                        format_type = "wav"
-                    elif "audio/mp3" in content_type or "audio/mpeg" in content_type:
-                        format_type = "mp3"
-                    elif "audio/ogg" in content_type:
-                        format_type = "ogg"
-                    elif "audio/webm" in content_type:
-                        format_type = "webm"
-
-                    # Write decoded data to temp file
-                    audio_bytes = base64.b64decode(base64_data)
-                    temp_file.write(audio_bytes)
-                    temp_file.flush()
-
-                # Handle direct file upload
-                else:
-                    temp_file.write(audio_data)
-                    temp_file.flush()
-
-            try:
-                # Use pydub to load the audio and convert to WAV for librosa
-                audio_segment = AudioSegment.from_file(temp_path, format=format_type)
-
-                # Convert to WAV in memory
-                wav_io = io.BytesIO()
-                audio_segment.export(wav_io, format="wav")
-                wav_io.seek(0)
-
-                # Load with librosa (now from a WAV file which is well-supported)
-                audio_array, sample_rate = librosa.load(wav_io, sr=16000, mono=True)
-
-                # Ensure audio is not too long
-                if len(audio_array) > MAX_AUDIO_LENGTH * sample_rate:
-                    audio_array = audio_array[: int(MAX_AUDIO_LENGTH * sample_rate)]
-
-                # Clean up the temporary file
-                os.unlink(temp_path)
-
-                return audio_array
-
-            except Exception as e:
-                print(f"Error with pydub/librosa: {e}")
-                # Direct approach with transformers' processor
-                audio_array = self.processor.feature_extractor(
-                    raw_speech=temp_path, sampling_rate=16000, return_tensors="pt"
+            if self.backend == TORCH_INT8:
+                if self.device != "cpu":
+                    raise ValueError("int8 dynamic quantization only runs on CPU")
+                model = quantize_dynamic_int8(reference)
+            else:
+                model = load_onnx_model(
+                    "automatic-speech-recognition", model_store.path(self.model_name)
                 )
-                os.unlink(temp_path)
-                return audio_array
 
+            candidate = self._pipeline(model)
+            if BACKEND_PARITY_CHECK and not check_parity(
+                "speech",
+                self.backend,
+                self._encoder_states(reference),
+                self._encoder_states(model),
+                SPEECH_PARITY_TOLERANCE,
+            ):
+                self.backend = TORCH
+                return
+
+            self.pipe = candidate
         except Exception as e:
-            print(f"Error processing audio: {e}")
-            return None
-
-    def transcribe(self, audio_data, format_type="wav"):
-        """Transcribe speech from audio data"""
+            # The float32 pipeline stays in place, never the fallback model
+            print(f"Không thể tải backend {self.backend} cho speech-to-text: {e}")
+            self.backend = TORCH
+
+    def cache_key(self, audio, profile=None, language=None):
+        # Hash the samples in place; tobytes() would copy the whole clip first.
+        # The digest is the same either way, so existing keys still match
+        digest = hashlib.blake2b(np.ascontiguousarray(audio.samples), digest_size=16)
+        digest.update(str(audio.sample_rate).encode())
+        settings = f"{resolve_profile(profile, audio.duration)}:{language}"
+        return f"{self.model_name}:{self.backend}:{settings}:{digest.hexdigest()}"
+
+    def decode_kwargs(self, inputs, profile, language=None):
+        """Pipe arguments for one call on these 16 kHz inputs under a given profile"""
+        durations = [len(samples) / 16000 for samples in inputs]
+        return decode_kwargs(profile, durations, language)
+
+    def _response(self, result, timings, cache_status):
+        # Break the request down into decode, cache, VAD and Whisper time
+        for stage, milliseconds in timings.items():
+            observe(stage, "speech_recognizer", milliseconds / 1000)
+
+        return {
+            **result,
+            "model": self.model_name,
+            "timings_ms": timings,
+            "cache": cache_status,
+            "success": True,
+        }
+
+    def stats(self):
+        return {
+            "model": self.model_name,
+            "backend": self.backend,
+            "cache": self.cache.stats(),
+        }
+
+    def _encoder_states(self, model):
+        features = self.processor.feature_extractor(
+            parity_audio(), sampling_rate=16000, return_tensors="pt"
+        ).input_features.to(self.device, self.torch_dtype)
+        with torch.no_grad():
+            states = model.get_encoder()(input_features=features).last_hidden_state
+        return states.float().cpu().numpy()
+
+    def process_audio_data(self, audio_data, format_type, max_seconds=MAX_AUDIO_LENGTH):
+        """Decode base64 or uploaded audio to DecodedAudio, entirely in memory"""
+        return load_audio(audio_data, format_type, max_seconds)
+
+    def transcribe(self, audio_data, format_type="wav", profile=None, language=None):
+        """Transcribe speech from DecodedAudio, base64 audio or raw file bytes"""
         if not self.model_loaded:
             return {
                 "error": "Model speech-to-text chưa được tải. Vui lòng cài đặt thư viện 'accelerate>=0.26.0' hoặc kiểm tra logs."
             }
 
+        with timed("transcribe", "speech_recognizer"):
+            return self._transcribe(audio_data, format_type, profile, language)
+
+    def _transcribe(self, audio_data, format_type, profile, language):
         try:
-            # Process the audio data
-            processed_audio = self.process_audio_data(audio_data, format_type)
-            if processed_audio is None:
+            # Process the audio data unless the caller already decoded it
+            if isinstance(audio_data, DecodedAudio):
+                audio = audio_data
+            else:
+                audio = self.process_audio_data(audio_data, format_type)
+            if audio is None:
                 return {"error": "Không thể xử lý file audio. Vui lòng thử lại."}
 
+            timings = dict(audio.timings)
+            profile = resolve_profile(profile, audio.duration)
+
+            # The same PCM always gives the same transcript, whatever container
+            # or encoding it arrived in
+            start = time.perf_counter()
+            key = self.cache_key(audio, profile, language)
+            cached, tier = self.cache.lookup(key)
+            timings["cache_lookup"] = round((time.perf_counter() - start) * 1000, 2)
+            if cached is not None:
+                return self._response(cached, timings, CACHE_STATUS[tier])
+
+            start = time.perf_counter()
+            packs, inputs = self.split_audio(audio)
+            if VAD_ENABLED:
+                timings["vad"] = round((time.perf_counter() - start) * 1000, 2)
+
             # Transcribe the audio
-            result = self.pipe(processed_audio)
+            start = time.perf_counter()
+            results = []
+            if inputs:
+                results = self.pipe(
+                    inputs, **self.decode_kwargs(inputs, profile, language)
+                )
+            timings["inference"] = round((time.perf_counter() - start) * 1000, 2)
 
-            # Extract full transcription
-            transcription = result["text"]
+            result = {**self.assemble(packs, results), "profile": profile}
+            self.cache.set(key, result)
+            return self._response(result, timings, CACHE_STATUS[None])
 
-            # Get timing info if available
-            timestamps = []
-            if "chunks" in result:
-                timestamps = result["chunks"]
+        except Exception as e:
+            print(f"Error transcribing audio: {e}")
+            count_error("transcribe", "speech_recognizer")
+            return {"error": str(e), "success": False}
+
+    def split_audio(self, audio):
+        """Pack detected speech into 30-second windows; returns (packs, pipe inputs)"""
+        if not VAD_ENABLED:
+            return [None], [audio.samples]
+        regions = detect_speech_regions(audio.samples)
+        packs = pack_speech_regions(audio.samples, regions)
+        return packs, [pack.samples for pack in packs]
 
-            timing_info = []
+    def assemble(self, packs, results):
+        """Join the pipe outputs for one recording into its transcript and timestamps"""
+        # Extract full transcription
+        transcription = " ".join(
+            result["text"].strip() for result in results if result["text"].strip()
+        )
 
-            for chunk in timestamps:
+        timing_info = []
+
+        for pack, result in zip(packs, results):
+            # Get timing info if available
+            for chunk in result.get("chunks", []):
                 if isinstance(chunk, dict) and "timestamp" in chunk:
+                    chunk_start, chunk_end = chunk.get("timestamp", [0, 0])
+                    if pack is not None:
+                        # Map back from the packed input to the recording
+                        chunk_start = pack.to_original(chunk_start)
+                        chunk_end = pack.to_original(chunk_end)
                     timing_info.append(
                         {
                             "text": chunk.get("text", ""),
-                            "start": chunk.get("timestamp", [0, 0])[0],
-                            "end": chunk.get("timestamp", [0, 0])[1],
+                            "start": chunk_start,
+                            "end": chunk_end,
                         }
                     )
 
-            return {
-                "transcription": transcription.strip(),
-                "timestamps": timing_info if timing_info else None,
-                "success": True,
-            }
+        return {
+            "transcription": transcription.strip(),
+            "timestamps": timing_info if timing_info else None,
+        }
+
+    def transcribe_window(self, samples):
+        """Run one window of 16 kHz samples and return its segments with relative timestamps"""
+        result = self.pipe(samples, return_timestamps=True)
+
+        segments = []
+        for chunk in result.get("chunks", []):
+            start, end = chunk.get("timestamp", (0, None))
+            segments.append({"text": chunk.get("text", ""), "start": start, "end": end})
+
+        # Models without timestamp support still return the full text
+        if not segments and result.get("text", "").strip():
+            segments.append({"text": result["text"], "start": 0.0, "end": None})
+        return segments
 
-        except Exception as e:
-            print(f"Error transcribing audio: {e}")
-            return {"error": str(e), "success": False}
 
+class FastSpeechRecognizer(SpeechRecognizer):
+    """The small SPEECH_FAST_MODEL, used by the "fast" profile"""
 
-# Create a singleton instance
-speech_recognizer = SpeechRecognizer()
+    def __init__(self, backend=None):
+        super().__init__(backend, model_name=SPEECH_FAST_MODEL)
@@ -0,0 +1,126 @@
+import numpy as np
+import soxr
+from ..config import STREAM_WINDOW_S, STREAM_OVERLAP_S, STREAM_MAX_SECONDS
+from ..utils.audio_processing import PCM_SAMPLE_BYTES, pcm_to_float32
+
+
+class TranscriptionStream:
+    """Incremental transcription over overlapping windows of a growing audio buffer.
+
+    Audio is appended with add_pcm. Each step() decodes one window starting
+    at the committed cursor. Segments that end inside the window's trailing
+    overlap are held back, because the next window, which starts where the
+    last emitted segment ended, will see them with full context; only when
+    the first segment already runs into the overlap is it committed. Audio
+    before the cursor is dropped, so memory stays at about one window no
+    matter how long the stream runs.
+    """
+
+    def __init__(
+        self,
+        recognizer,
+        sample_rate=16000,
+        encoding="pcm_s16le",
+        window_s=STREAM_WINDOW_S,
+        overlap_s=STREAM_OVERLAP_S,
+    ):
+        self.recognizer = recognizer
+        self.encoding = encoding
+        self.sample_bytes = PCM_SAMPLE_BYTES[encoding]
+        self.partial = b""  # Bytes of a sample split across frames
+        self.window = int(window_s * 16000)
+        self.overlap = int(overlap_s * 16000)
+        self.resampler = (
+            soxr.ResampleStream(sample_rate, 16000, 1, dtype="float32")
+            if sample_rate != 16000
+            else None
+        )
+        self.buffer = np.zeros(0, dtype=np.float32)
+        self.buffer_start = 0  # Absolute sample index of buffer[0]
+        self.cursor = 0  # Absolute sample index up to which text was emitted
+        self.received = 0  # Absolute samples received so far
+        self.segments = []
+
+    @property
+    def text(self):
+        return "".join(segment["text"] for segment in self.segments).strip()
+
+    def add_pcm(self, pcm_data, last=False):
+        # Clients may split frames anywhere; carry an incomplete trailing
+        # sample over to the next frame (and drop it at the end)
+        if self.partial:
+            pcm_data = self.partial + pcm_data
+        complete = len(pcm_data) - len(pcm_data) % self.sample_bytes
+        self.partial = b"" if last else bytes(pcm_data[complete:])
+        samples = pcm_to_float32(memoryview(pcm_data)[:complete], self.encoding)
+        if self.resampler is not None:
+            samples = self.resampler.resample_chunk(samples, last=last)
+
+        if self.received + len(samples) > STREAM_MAX_SECONDS * 16000:
+            raise ValueError(f"Stream longer than {STREAM_MAX_SECONDS} seconds")
+
+        self.buffer = np.concatenate([self.buffer, samples])
+        self.received += len(samples)
+
+    def pending(self):
+        """Samples received but not yet covered by emitted text"""
+        return self.received - self.cursor
+
+    def ready(self):
+        return self.pending() >= self.window
+
+    def step(self, final=False):
+        """Decode the next window and return the segments it committed"""
+        # Only the last window of a finished stream may commit its tail
+        final = final and self.pending() <= self.window
+
+        start = self.cursor - self.buffer_start
+        window = self.buffer[start : start + self.window]
+        offset = self.cursor / 16000
+        window_end = offset + len(window) / 16000
+        hold_back_from = window_end - self.overlap / 16000
+
+        segments = []
+        for segment in self.recognizer.transcribe_window(window):
+            seg_end = window_end
+            if segment["end"] is not None:
+                seg_end = min(offset + segment["end"], window_end)
+            segments.append((offset + (segment["start"] or 0.0), seg_end, segment))
+
+        count = len(segments)
+        if not final:
+            count = 0
+            while count < len(segments) and segments[count][1] <= hold_back_from:
+                count += 1
+            if count == 0 and segments:
+                # The first segment already runs into the overlap: commit it
+                # now, since skipping ahead would drop its text
+                count = 1
+
+        committed = [
+            {
+                "text": segment["text"],
+                "start": round(seg_start, 2),
+                "end": round(seg_end, 2),
+            }
+            for seg_start, seg_end, segment in segments[:count]
+        ]
+        new_cursor = int(segments[count - 1][1] * 16000) if count else self.cursor
+
+        if final:
+            new_cursor = self.received
+        elif new_cursor <= self.cursor:
+            # Nothing but silence (or a segment ending where the window
+            # starts); move on anyway so every window makes progress
+            new_cursor = self.cursor + self.window - self.overlap
+
+        self.cursor = new_cursor
+        self.segments.extend(committed)
+
+        # Forget audio that no future window will look at
+        drop = self.cursor - self.buffer_start
+        if drop > 0:
+            self.buffer = self.buffer[drop:]
+            self.buffer_start = self.cursor
+
+        return committed
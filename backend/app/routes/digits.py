@@ -1,24 +1,109 @@
-from fastapi import APIRouter
+import base64
+from fastapi import APIRouter, File, Request, UploadFile
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from ..models.digit_recognizer import digit_recognizer
-from ..utils.image_processing import process_image
+from ..config import (
+    DIGIT_BATCH_MAX_SIZE,
+    DIGIT_BATCH_MAX_WAIT_MS,
+    DIGIT_MULTI_MAX_DIGITS,
+    DIGIT_POOL_QUEUE,
+)
+from ..models.registry import model_registry
+from ..utils.batching import MicroBatcher
+from ..utils.executors import PoolSaturatedError, digit_pool
+from ..utils.image_processing import (
+    process_image,
+    process_image_bytes,
+    process_multi_digit,
+)
 
 router = APIRouter()
 
 
+def predict_digits(images):
+    # Runs on the digit pool, so a first-use model load never blocks the loop
+    return model_registry.get("digit_recognizer").predict_batch(images)
+
+
+# Concurrent /predict calls share one TensorFlow call
+digit_batcher = MicroBatcher(
+    predict_digits,
+    max_batch_size=DIGIT_BATCH_MAX_SIZE,
+    max_wait_ms=DIGIT_BATCH_MAX_WAIT_MS,
+    pool=digit_pool,
+    max_queue=DIGIT_POOL_QUEUE,
+)
+
+
 class ImageData(BaseModel):
     image: str
 
 
-@router.post("/predict")
-async def predict(data: ImageData):
+async def predict_array(image_array):
     try:
-        # Process the image
-        image_array = process_image(data.image)
-
         # Make prediction
-        result = digit_recognizer.predict(image_array)
+        result = await digit_batcher.submit(image_array)
         return result
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         print(f"Error during prediction: {e}")
         return {"prediction": "Error", "confidence": 0, "error": str(e)}
+
+
+@router.post("/predict")
+async def predict(data: ImageData):
+    # Process the image
+    return await predict_array(process_image(data.image))
+
+
+@router.post("/predict/raw")
+async def predict_raw(request: Request):
+    """Predict from a raw image body (application/octet-stream or image/*)"""
+    return await predict_array(process_image_bytes(await request.body()))
+
+
+@router.post("/predict/upload")
+async def predict_upload(file: UploadFile = File(...)):
+    """Predict from a multipart image upload"""
+    return await predict_array(process_image_bytes(await file.read()))
+
+
+def predict_multi_digits(image_data):
+    """Segment a multi-digit canvas and classify every digit in one model call"""
+    batch, boxes = process_multi_digit(image_data)
+    if len(boxes) > DIGIT_MULTI_MAX_DIGITS:
+        raise ValueError(f"Too many digits. Maximum is {DIGIT_MULTI_MAX_DIGITS}.")
+
+    results = predict_digits(batch) if len(boxes) else []
+    for result in results:
+        if "error" in result:
+            raise RuntimeError(result["error"])
+
+    return {
+        "prediction": "".join(result["prediction"] for result in results),
+        "digits": [result["prediction"] for result in results],
+        "confidences": [result["confidence"] for result in results],
+        "boxes": boxes,  # [x0, y0, x1, y1] per digit, in canvas pixels
+    }
+
+
+@router.post("/predict-multi")
+async def predict_multi(data: ImageData):
+    """Recognize a number of several digits drawn on one canvas, left to right"""
+    try:
+        image_data = base64.b64decode(data.image.split(",")[1])
+    except Exception:
+        return JSONResponse(
+            status_code=400, content={"error": "Image must be a base64 data URL."}
+        )
+
+    try:
+        return await digit_pool.run(predict_multi_digits, image_data)
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error during multi-digit prediction: {e}")
+        return JSONResponse(status_code=500, content={"error": str(e)})
@@ -1,24 +1,171 @@
 from fastapi import APIRouter
+from fastapi.responses import JSONResponse
 from pydantic import BaseModel
-from ..models.emoji_predictor import emoji_predictor
+from typing import List, Optional
+from ..config import (
+    EMOJI_BATCH_SIZE,
+    EMOJI_BATCH_MAX_WAIT_MS,
+    EMOJI_MAX_TEXTS,
+    EMOJI_POOL_QUEUE,
+    EMOJI_SESSION_DEBOUNCE_MS,
+    EMOJI_SESSION_MAX,
+    EMOJI_TOP_K,
+)
+from ..models.registry import model_registry
+from ..utils.batching import MicroBatcher
+from ..utils.executors import PoolSaturatedError, emoji_pool
+from ..utils.sessions import SessionDebouncer, SupersededError
 
 router = APIRouter()
 
 
+def predict_emojis(texts):
+    return model_registry.get("emoji_predictor").predict_batch(texts)
+
+
+# Concurrent single-text calls share one DistilBERT forward pass
+emoji_batcher = MicroBatcher(
+    predict_emojis,
+    max_batch_size=EMOJI_BATCH_SIZE,
+    max_wait_ms=EMOJI_BATCH_MAX_WAIT_MS,
+    pool=emoji_pool,
+    max_queue=EMOJI_POOL_QUEUE,
+)
+
+
+def predict_typing(texts):
+    return model_registry.get("emoji_predictor").predict_typing(texts)
+
+
+# Typing sessions get their own batcher so they reuse prefix tokenizations
+typing_batcher = MicroBatcher(
+    predict_typing,
+    max_batch_size=EMOJI_BATCH_SIZE,
+    max_wait_ms=EMOJI_BATCH_MAX_WAIT_MS,
+    pool=emoji_pool,
+    max_queue=EMOJI_POOL_QUEUE,
+)
+emoji_sessions = SessionDebouncer(
+    typing_batcher.submit, EMOJI_SESSION_DEBOUNCE_MS, EMOJI_SESSION_MAX
+)
+
+
 class TextData(BaseModel):
     text: str
 
 
-@router.post("/predict-emoji")
-async def get_emoji(data: TextData):
-    result = emoji_predictor.predict(data.text)
+class TextBatchData(BaseModel):
+    texts: List[str]
 
+
+class SessionTextData(BaseModel):
+    session_id: str
+    text: str
+    seq: Optional[int] = None  # Increasing per session; stale requests are dropped
+
+
+class TopKData(BaseModel):
+    texts: List[str]
+    top_k: Optional[int] = EMOJI_TOP_K  # None or 0 returns all 28 emotions
+
+
+def format_response(text, result):
     if "error" in result:
         return result
 
     return {
-        "text": data.text,
+        "text": text,
         "emotion": result["emotion"],
         "emoji": result["emoji"],
         "confidence": result["confidence"],
     }
+
+
+@router.post("/predict-emoji")
+async def get_emoji(data: TextData):
+    try:
+        result = await emoji_batcher.submit(data.text)
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error predicting emoji: {e}")
+        return {"error": str(e)}
+
+    return format_response(data.text, result)
+
+
+@router.post("/predict-emoji/session")
+async def get_emoji_session(data: SessionTextData):
+    """/predict-emoji for clients that send the text on every keystroke.
+
+    Only the latest text of each session_id is predicted; earlier requests
+    that have not been answered yet return {"superseded": true} instead.
+    """
+    try:
+        result = await emoji_sessions.run(data.session_id, data.text, data.seq)
+    except SupersededError:
+        return {"text": data.text, "superseded": True}
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error predicting emoji: {e}")
+        return {"error": str(e)}
+
+    return format_response(data.text, result)
+
+
+@router.post("/predict-emoji/batch")
+async def get_emoji_batch(data: TextBatchData):
+    if len(data.texts) > EMOJI_MAX_TEXTS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Too many texts. Maximum is {EMOJI_MAX_TEXTS}."},
+        )
+
+    try:
+        results = await emoji_pool.run(predict_emojis, data.texts)
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error predicting emoji batch: {e}")
+        return {"error": str(e)}
+
+    return {
+        "results": [
+            format_response(text, result) for text, result in zip(data.texts, results)
+        ]
+    }
+
+
+def predict_distribution(texts, top_k):
+    return model_registry.get("emoji_predictor").predict_distribution(texts, top_k)
+
+
+@router.post("/predict-emoji/top-k")
+async def get_emoji_top_k(data: TopKData):
+    """Ranked emotions for each text from a single forward pass.
+
+    Answers with parallel arrays, one row per text, best emotion first:
+    {"texts", "emotions", "emojis", "confidences"}.
+    """
+    if len(data.texts) > EMOJI_MAX_TEXTS:
+        return JSONResponse(
+            status_code=400,
+            content={"error": f"Too many texts. Maximum is {EMOJI_MAX_TEXTS}."},
+        )
+    if data.top_k is not None and data.top_k < 0:
+        return JSONResponse(
+            status_code=400, content={"error": "top_k must not be negative."}
+        )
+
+    try:
+        result = await emoji_pool.run(predict_distribution, data.texts, data.top_k)
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        print(f"Error predicting emoji distribution: {e}")
+        return {"error": str(e)}
+
+    if "error" in result:
+        return result
+    return {"texts": data.texts, **result}
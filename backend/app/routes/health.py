@@ -1,18 +1,34 @@
 from fastapi import APIRouter
-from ..models.emoji_predictor import emoji_predictor
-from ..models.speech_recognizer import speech_recognizer
+from ..models.artifacts import model_store
+from ..models.emoji_predictor import emoji_cache
+from ..models.registry import READY, model_registry
+from ..models.speech_jobs import speech_jobs
+from ..utils import runtime
+from ..utils.executors import decode_pool, digit_pool, emoji_pool, speech_pool
+from .emoji import emoji_sessions
 
 router = APIRouter()
 
 
 @router.get("/")
 async def root():
+    # Reports model states only; never triggers a load
     models_available = {
-        "digit_recognition": True,
-        "emoji_prediction": emoji_predictor.emoji_model_loaded,
-        "speech_to_text": speech_recognizer.model_loaded,
+        "digit_recognition": model_registry.state("digit_recognizer") == READY,
+        "emoji_prediction": model_registry.state("emoji_predictor") == READY,
+        "speech_to_text": model_registry.state("speech_recognizer") == READY,
     }
     return {
         "message": "AI Playground API is running",
         "available_models": models_available,
+        "models": model_registry.stats(),
+        "model_store": model_store.stats(),
+        "inference_pools": {
+            pool.name: pool.stats()
+            for pool in (digit_pool, emoji_pool, speech_pool, decode_pool)
+        },
+        "caches": {"emoji": emoji_cache.stats()},
+        "runtime": runtime.stats(),
+        "speech_jobs": speech_jobs.stats(),
+        "emoji_sessions": emoji_sessions.stats(),
     }
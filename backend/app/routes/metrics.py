@@ -0,0 +1,61 @@
+from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse, Response
+from prometheus_client import CONTENT_TYPE_LATEST
+from ..config import METRICS_ENABLED
+from ..models.registry import READY, model_registry
+from ..utils.executors import decode_pool, digit_pool, emoji_pool, speech_pool
+from ..utils.metrics import register_gauges, render
+from .digits import digit_batcher
+from .emoji import emoji_batcher, typing_batcher
+
+router = APIRouter()
+
+POOLS = (digit_pool, emoji_pool, speech_pool, decode_pool)
+BATCHERS = {
+    "digit": digit_batcher,
+    "emoji": emoji_batcher,
+    "emoji_typing": typing_batcher,
+}
+
+
+def gauges():
+    """Point-in-time values, read only when /metrics is scraped"""
+    return [
+        (
+            "inference_pool_pending",
+            "Calls running or waiting on each inference pool",
+            ("pool",),
+            {(pool.name,): pool.pending for pool in POOLS},
+        ),
+        (
+            "inference_pool_capacity",
+            "Calls each inference pool accepts before answering 503",
+            ("pool",),
+            {(pool.name,): pool.capacity for pool in POOLS},
+        ),
+        (
+            "batch_queue_depth",
+            "Requests waiting to be collected into a batch",
+            ("batcher",),
+            {(name,): batcher.queue_depth for name, batcher in BATCHERS.items()},
+        ),
+        (
+            "model_ready",
+            "1 if the model is loaded and ready",
+            ("model",),
+            {
+                (name,): int(model_registry.state(name) == READY)
+                for name in model_registry.models
+            },
+        ),
+    ]
+
+
+register_gauges(gauges)
+
+
+@router.get("/metrics")
+async def metrics():
+    if not METRICS_ENABLED:
+        return PlainTextResponse("Metrics are disabled\n", status_code=404)
+    return Response(render(), media_type=CONTENT_TYPE_LATEST)
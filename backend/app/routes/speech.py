@@ -1,33 +1,133 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException, Form, Body
+from fastapi import (
+    APIRouter,
+    UploadFile,
+    File,
+    HTTPException,
+    Form,
+    Body,
+    Header,
+    Request,
+    WebSocket,
+    WebSocketDisconnect,
+)
 from fastapi.responses import JSONResponse
 from pydantic import BaseModel
 from typing import Optional
-from ..models.speech_recognizer import speech_recognizer
-from ..utils.audio_processing import validate_audio_file, process_base64_audio
+from ..config import (
+    STREAM_ENCODINGS,
+    SPEECH_PROFILES,
+    SPEECH_JOB_MAX_QUEUED,
+    SPEECH_JOB_MAX_PRIORITY,
+    SPEECH_JOB_MAX_WAIT_S,
+    SPEECH_JOB_POLL_S,
+)
+from ..models.registry import model_registry
+from ..models.speech_jobs import speech_jobs
+from ..models.speech_profiles import check_profile, resolve_profile
+from ..models.speech_stream import TranscriptionStream
+from ..utils.audio_processing import (
+    DecodedAudio,
+    load_audio,
+    process_base64_audio,
+)
+from ..utils.executors import PoolSaturatedError, decode_pool, speech_pool
+from ..utils.job_store import DONE, FAILED, FINISHED, QUEUED
+from ..utils.uploads import UploadError, iter_upload, read_upload, receive_audio
+import asyncio
 import io
 
 router = APIRouter()
 
 
+def transcribe(
+    audio_data, format_type="wav", profile=None, language=None, low_priority=False
+):
+    # Decode first: the "auto" profile picks the model from the clip's length
+    audio = audio_data
+    if not isinstance(audio, DecodedAudio):
+        audio = load_audio(audio_data, format_type)
+        if audio is None:
+            return {"error": "Không thể xử lý file audio. Vui lòng thử lại."}
+
+    profile = resolve_profile(profile, audio.duration, low_priority)
+    speech_recognizer = model_registry.get(SPEECH_PROFILES[profile]["model"])
+    return speech_recognizer.transcribe(audio, format_type, profile, language)
+
+
 class AudioData(BaseModel):
     audio: str
     format: Optional[str] = "wav"
+    profile: Optional[str] = None  # "fast", "balanced", "accurate" or "auto"
+    language: Optional[str] = None  # e.g. "en"; skips language detection
+    low_priority: bool = False  # Lets "auto" use the fast model
 
 
 @router.post("/transcribe")
 async def transcribe_audio(data: AudioData):
     """Transcribe speech from base64 encoded audio"""
     try:
-        # Process the base64 audio data
-        audio_data, format_type, error = process_base64_audio(data.audio)
+        check_profile(data.profile)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        # Decode and resample the base64 audio data exactly once, on the
+        # decode pool so it never holds a Whisper slot
+        audio, format_type, error = await decode_pool.run(
+            process_base64_audio, data.audio
+        )
 
         if error:
             return JSONResponse(status_code=400, content={"error": error})
 
-        # Transcribe the audio
-        result = speech_recognizer.transcribe(data.audio, format_type or data.format)
+        # Transcribe the already decoded audio
+        result = await speech_pool.run(
+            transcribe,
+            audio,
+            format_type,
+            data.profile,
+            data.language,
+            data.low_priority,
+        )
+        return result
+
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(
+            status_code=500, content={"error": f"Error processing request: {str(e)}"}
+        )
+
+
+@router.post("/transcribe/raw")
+async def transcribe_raw(
+    request: Request,
+    profile: Optional[str] = None,
+    language: Optional[str] = None,
+    low_priority: bool = False,
+):
+    """Transcribe a raw audio body (audio/* or application/octet-stream).
+
+    Skips the base64 and JSON layers of /transcribe; options go in the query
+    string and the format is sniffed from the first bytes. The body is
+    decoded while it is still being received.
+    """
+    try:
+        check_profile(profile)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
+
+    try:
+        audio = await receive_audio(request.stream())
+        result = await speech_pool.run(
+            transcribe, audio, audio.source_format, profile, language, low_priority
+        )
         return result
 
+    except UploadError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(
             status_code=500, content={"error": f"Error processing request: {str(e)}"}
@@ -35,25 +135,185 @@ async def transcribe_audio(data: AudioData):
 
 
 @router.post("/upload-audio")
-async def upload_audio(file: UploadFile = File(...)):
+async def upload_audio(
+    file: UploadFile = File(...),
+    profile: Optional[str] = Form(None),
+    language: Optional[str] = Form(None),
+    low_priority: bool = Form(False),
+):
     """Transcribe speech from uploaded audio file"""
     try:
-        # Read file content
-        file_content = await file.read()
+        check_profile(profile)
+    except ValueError as e:
+        return JSONResponse(status_code=400, content={"error": str(e)})
 
-        # Validate file
-        valid, message = validate_audio_file(file_content, file.filename)
-        if not valid:
-            return JSONResponse(status_code=400, content={"error": message})
-
-        # Get file format
-        format_type = file.filename.split(".")[-1].lower()
+    try:
+        # Read the file in chunks, checking its format from the first bytes
+        # and decoding it as it is read
+        audio = await receive_audio(iter_upload(file))
 
         # Transcribe the audio
-        result = speech_recognizer.transcribe(file_content, format_type)
+        result = await speech_pool.run(
+            transcribe, audio, audio.source_format, profile, language, low_priority
+        )
         return result
 
+    except UploadError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except PoolSaturatedError as e:
+        return JSONResponse(status_code=503, content={"error": str(e)})
     except Exception as e:
         return JSONResponse(
             status_code=500, content={"error": f"Error processing upload: {str(e)}"}
         )
+
+
+def job_response(job):
+    response = {
+        "job_id": job["id"],
+        "status": job["status"],
+        "priority": job["priority"],
+        "created": job["created"],
+        "updated": job["updated"],
+    }
+    if job["status"] == DONE:
+        response["result"] = job["result"]
+    elif job["status"] == FAILED:
+        response["error"] = job["error"]
+    return response
+
+
+@router.post("/jobs")
+async def create_job(
+    request: Request,
+    file: UploadFile = File(...),
+    priority: int = Form(0),
+    x_client_id: Optional[str] = Header(None),
+):
+    """Queue an uploaded audio file for transcription and return its job id at once"""
+    loop = asyncio.get_running_loop()
+    try:
+        # SQLite may wait on another worker's write lock; never on the loop
+        queued = await loop.run_in_executor(None, speech_jobs.store.count, QUEUED)
+        if queued >= SPEECH_JOB_MAX_QUEUED:
+            return JSONResponse(
+                status_code=503,
+                content={"error": "Too many jobs are queued. Please try again later."},
+            )
+
+        file_content, format_type = await read_upload(iter_upload(file))
+
+        # Fairness is per client: an explicit id, or else the caller's address
+        client = x_client_id or (request.client.host if request.client else "unknown")
+        priority = max(0, min(priority, SPEECH_JOB_MAX_PRIORITY))
+
+        job = await loop.run_in_executor(
+            None, speech_jobs.submit, file_content, format_type, client, priority
+        )
+        return JSONResponse(status_code=202, content=job_response(job))
+
+    except UploadError as e:
+        return JSONResponse(status_code=e.status_code, content={"error": str(e)})
+    except Exception as e:
+        return JSONResponse(
+            status_code=500, content={"error": f"Error creating job: {str(e)}"}
+        )
+
+
+@router.get("/jobs/{job_id}")
+async def get_job(job_id: str, wait: float = 0):
+    """Job status, with the result once done; ?wait=N long-polls up to N seconds"""
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + max(0, min(wait, SPEECH_JOB_MAX_WAIT_S))
+
+    job = await loop.run_in_executor(None, speech_jobs.store.get, job_id)
+    while job is not None and job["status"] not in FINISHED:
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+        # Woken at once when this worker finishes the job; the periodic
+        # re-check catches jobs finished by another worker
+        await speech_jobs.wait(job_id, min(remaining, SPEECH_JOB_POLL_S))
+        job = await loop.run_in_executor(None, speech_jobs.store.get, job_id)
+
+    if job is None:
+        return JSONResponse(status_code=404, content={"error": "Job not found"})
+    return job_response(job)
+
+
+@router.websocket("/stream")
+async def stream_audio(
+    websocket: WebSocket, sample_rate: int = 16000, encoding: str = "pcm_s16le"
+):
+    """Transcribe raw mono PCM sent as binary frames; send the text "end" to finish.
+
+    Partial segments are pushed as soon as each window is decoded:
+    {"type": "partial", "text", "start", "end"}, followed by one
+    {"type": "final", "transcription"} message before the server closes.
+    """
+    await websocket.accept()
+
+    try:
+        speech_recognizer = await speech_pool.run(
+            model_registry.get, "speech_recognizer"
+        )
+    except PoolSaturatedError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1013)
+        return
+    except Exception as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1011)
+        return
+
+    if not speech_recognizer.model_loaded:
+        await websocket.send_json(
+            {"type": "error", "error": "Model speech-to-text chưa được tải."}
+        )
+        await websocket.close(code=1011)
+        return
+    if encoding not in STREAM_ENCODINGS or sample_rate <= 0:
+        await websocket.send_json(
+            {
+                "type": "error",
+                "error": f"Unsupported stream. Encodings: {', '.join(STREAM_ENCODINGS)}",
+            }
+        )
+        await websocket.close(code=1003)
+        return
+
+    stream = TranscriptionStream(speech_recognizer, sample_rate, encoding)
+
+    async def flush(final):
+        while stream.ready() or (final and stream.pending() > 0):
+            for segment in await speech_pool.run(stream.step, final):
+                await websocket.send_json({"type": "partial", **segment})
+
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                return
+
+            final = message.get("text") == "end"
+            if message.get("bytes") or final:
+                stream.add_pcm(message.get("bytes") or b"", last=final)
+
+            await flush(final)
+
+            if final:
+                await websocket.send_json(
+                    {"type": "final", "transcription": stream.text}
+                )
+                await websocket.close()
+                return
+
+    except WebSocketDisconnect:
+        pass
+    except PoolSaturatedError as e:
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1013)
+    except Exception as e:
+        print(f"Error streaming audio: {e}")
+        await websocket.send_json({"type": "error", "error": str(e)})
+        await websocket.close(code=1011)
@@ -0,0 +1,153 @@
+"""Pre-fork server: load models once, then fork workers that share them.
+
+Each `uvicorn --workers N` process imports the app and loads its own copy of
+every model, so memory grows linearly with N. Here the parent loads the
+SERVE_PRELOAD models first and then forks; the workers inherit the weights
+copy-on-write and only pay for the pages they actually write to. The parent
+runs torch on one thread until the fork (see runtime.prepare_fork); SQLite
+connections are reopened in each worker. A worker that keeps dying soon after
+it starts is restarted with a doubling delay. Run from the backend directory:
+
+    python -m app.serve --workers 4 --port 8000
+"""
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import time
+
+import uvicorn
+
+from .config import (
+    SERVE_HEALTHY_AFTER_S,
+    SERVE_HOST,
+    SERVE_PORT,
+    SERVE_PRELOAD,
+    SERVE_RESTART_DELAY_S,
+    SERVE_RESTART_MAX_DELAY_S,
+    SERVE_WORKERS,
+)
+from .models.registry import model_registry
+from .utils import runtime
+
+
+def preload(names):
+    """Load models in the parent and keep them resident for the workers"""
+    for name in names:
+        start = time.perf_counter()
+        model_registry.get(name)
+        # A worker unloading a shared model frees nothing (the parent still holds
+        # it) and reloading would create a private copy, so never unload these
+        model_registry.pin(name)
+        print(f"Preloaded {name} in {time.perf_counter() - start:.1f}s")
+
+    # Move everything allocated so far out of the collector's reach: gc passes in
+    # the workers would otherwise write to every object header and un-share pages
+    gc.collect()
+    gc.freeze()
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def run_worker(sock, log_level):
+    from .main import app
+
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    config = uvicorn.Config(app, log_level=log_level, lifespan="on")
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock, log_level):
+    pid = os.fork()
+    if pid == 0:
+        code = 0
+        try:
+            runtime.after_fork()
+            run_worker(sock, log_level)
+        except BaseException as e:
+            print(f"Worker {os.getpid()} crashed: {e}")
+            code = 1
+        finally:
+            os._exit(code)
+    return pid
+
+
+def serve(host, port, workers, preload_models, log_level="info"):
+    # Thread counts are split between the workers; the parent itself stays
+    # single-threaded so no thread pool is running when it forks
+    runtime.share_cpus(workers)
+    runtime.prepare_fork()
+
+    # Import the app before forking so every worker shares the module pages too
+    from .main import app  # noqa: F401
+
+    preload(preload_models)
+    sock = bind_socket(host, port)
+    print(f"Serving on http://{host}:{port} with {workers} workers")
+
+    children = {spawn(sock, log_level): time.monotonic() for _ in range(workers)}
+    stopping = False
+    crashes = 0  # Restarts in a row of workers that died early
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in list(children):
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGTERM, stop)
+    signal.signal(signal.SIGINT, stop)
+
+    while children:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        started = children.pop(pid, None)
+        if started is None or stopping:
+            continue
+
+        # Forking again from the loaded parent restarts a worker in milliseconds,
+        # but one that keeps crashing at startup must not make it fork in a loop
+        if time.monotonic() - started >= SERVE_HEALTHY_AFTER_S:
+            crashes = 0
+        crashes += 1
+        delay = 0.0
+        if crashes > 1:
+            delay = min(
+                SERVE_RESTART_DELAY_S * 2 ** (crashes - 2), SERVE_RESTART_MAX_DELAY_S
+            )
+        print(f"Worker {pid} exited with status {status}, restarting in {delay:.1f}s")
+        deadline = time.monotonic() + delay
+        while not stopping and time.monotonic() < deadline:
+            time.sleep(0.1)  # In steps, so a shutdown signal is not held up
+        if not stopping:
+            children[spawn(sock, log_level)] = time.monotonic()
+
+    sock.close()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--host", default=SERVE_HOST)
+    parser.add_argument("--port", type=int, default=SERVE_PORT)
+    parser.add_argument("--workers", type=int, default=SERVE_WORKERS)
+    parser.add_argument("--preload", nargs="*", default=SERVE_PRELOAD)
+    parser.add_argument("--log-level", default="info")
+    args = parser.parse_args()
+    serve(args.host, args.port, args.workers, args.preload, args.log_level)
@@ -1,11 +1,49 @@
 import base64
-import io
-import os
-import tempfile
-from pydub import AudioSegment
-import librosa
+import itertools
+import struct
+import subprocess
+import threading
+import time
+from dataclasses import dataclass, field
 import numpy as np
-from ..config import MAX_AUDIO_LENGTH, SUPPORTED_FORMATS, MAX_FILE_SIZE
+import soxr
+from ..config import (
+    MAX_AUDIO_LENGTH,
+    SUPPORTED_FORMATS,
+    MAX_FILE_SIZE,
+    FFMPEG_BINARY,
+    BASE64_CHUNK_CHARS,
+)
+from .metrics import count_error, timed
+from .vad import detect_speech_regions
+
+WAVE_FORMAT_PCM = 0x0001
+WAVE_FORMAT_IEEE_FLOAT = 0x0003
+WAVE_FORMAT_EXTENSIBLE = 0xFFFE
+
+# (format code, bits per sample) -> sample dtype for the zero-copy WAV path
+WAV_DTYPES = {
+    (WAVE_FORMAT_PCM, 8): np.uint8,
+    (WAVE_FORMAT_PCM, 16): np.dtype("<i2"),
+    (WAVE_FORMAT_PCM, 32): np.dtype("<i4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 32): np.dtype("<f4"),
+    (WAVE_FORMAT_IEEE_FLOAT, 64): np.dtype("<f8"),
+}
+WAV_HEADER_MAX_BYTES = 1 << 20  # Streamed WAVs without a data chunk by then use ffmpeg
+
+
+@dataclass
+class DecodedAudio:
+    """Audio that has already been decoded, downmixed and resampled once"""
+
+    samples: np.ndarray  # mono float32
+    sample_rate: int = 16000
+    source_format: str = "wav"
+    timings: dict = field(default_factory=dict)  # stage name -> milliseconds
+
+    @property
+    def duration(self):
+        return len(self.samples) / self.sample_rate
 
 
 def validate_audio_file(file_content, filename):
@@ -43,85 +81,360 @@ def detect_format_from_content_type(content_type):
         return "wav"  # Default to WAV
 
 
+def sniff_audio_format(head):
+    """Detect the audio container from a file's first bytes, or None if unknown"""
+    head = bytes(head[:12])
+    if head[:4] == b"RIFF" and head[8:12] == b"WAVE":
+        return "wav"
+    if head[:4] == b"fLaC":
+        return "flac"
+    if head[:4] == b"OggS":
+        return "ogg"
+    if head[:4] == b"\x1a\x45\xdf\xa3":
+        return "webm"
+    if head[4:8] == b"ftyp":
+        return "m4a"
+    if head[:3] == b"ID3":
+        return "mp3"
+    if len(head) >= 2 and head[0] == 0xFF and head[1] & 0xE0 == 0xE0:
+        # Frame sync; layer bits 00 mean an AAC ADTS stream rather than MPEG audio
+        return "aac" if head[1] & 0x06 == 0 else "mp3"
+    return None
+
+
+def run_ffmpeg(audio_data, output_args, max_seconds=None):
+    """Pipe encoded audio through ffmpeg entirely in memory and return its stdout"""
+    command = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error"]
+    command += ["-i", "pipe:0"]
+    if max_seconds is not None:
+        command += ["-t", str(max_seconds)]
+    command += output_args + ["pipe:1"]
+
+    process = subprocess.run(command, input=audio_data, capture_output=True)
+    if process.returncode != 0:
+        raise ValueError(f"ffmpeg could not decode audio: {process.stderr.decode()}")
+    return process.stdout
+
+
+def parse_wav_header(wav_data):
+    """Locate the fmt and data chunks of a RIFF/WAVE buffer without copying it"""
+    if len(wav_data) < 12 or wav_data[:4] != b"RIFF" or wav_data[8:12] != b"WAVE":
+        return None
+
+    fmt = None
+    offset = 12
+    while offset + 8 <= len(wav_data):
+        chunk_id = bytes(wav_data[offset : offset + 4])
+        chunk_size = struct.unpack_from("<I", wav_data, offset + 4)[0]
+        body = offset + 8
+
+        if chunk_id == b"fmt ":
+            if body + max(chunk_size, 16) > len(wav_data):
+                return None  # Cut short, or not all streamed in yet
+            audio_format, channels, sample_rate = struct.unpack_from(
+                "<HHI", wav_data, body
+            )
+            bits_per_sample = struct.unpack_from("<H", wav_data, body + 14)[0]
+            if audio_format == WAVE_FORMAT_EXTENSIBLE and chunk_size >= 26:
+                # The real format code is the first field of the sub-format GUID
+                audio_format = struct.unpack_from("<H", wav_data, body + 24)[0]
+            fmt = (audio_format, channels, sample_rate, bits_per_sample)
+        elif chunk_id == b"data" and fmt is not None:
+            # Streamed WAVs (e.g. from ffmpeg pipes) carry a placeholder size
+            data_size = min(chunk_size, len(wav_data) - body)
+            return fmt + (body, data_size)
+
+        offset = body + chunk_size + (chunk_size & 1)
+
+    return None
+
+
+def wav_frames_to_float32(data, audio_format, channels, bits_per_sample):
+    """Mono float32 samples from whole frames of PCM/float WAV data"""
+    dtype = WAV_DTYPES[(audio_format, bits_per_sample)]
+    samples = np.frombuffer(data, dtype=dtype)
+    if channels > 1:
+        samples = samples.reshape(-1, channels).mean(axis=1, dtype=np.float32)
+
+    # Scale integer PCM to [-1, 1); float32 mono passes through untouched
+    if audio_format == WAVE_FORMAT_PCM:
+        if bits_per_sample == 8:
+            samples = (samples.astype(np.float32) - 128.0) / 128.0
+        else:
+            samples = samples.astype(np.float32) / float(2 ** (bits_per_sample - 1))
+
+    return samples.astype(np.float32, copy=False)
+
+
+def decode_wav_fast(wav_data):
+    """Read PCM/float WAV samples straight from the buffer, or None if unsupported"""
+    header = parse_wav_header(wav_data)
+    if header is None:
+        return None
+
+    audio_format, channels, sample_rate, bits_per_sample, offset, size = header
+    if (audio_format, bits_per_sample) not in WAV_DTYPES or channels == 0:
+        return None
+
+    # A view onto the upload, no copy yet
+    frame_size = channels * bits_per_sample // 8
+    frames = memoryview(wav_data)[offset : offset + size // frame_size * frame_size]
+    samples = wav_frames_to_float32(frames, audio_format, channels, bits_per_sample)
+    return samples, sample_rate
+
+
+def decode_wav_chunks(header, chunks, sample_rate=16000, max_seconds=None):
+    """Decode a WAV whose ``header`` (up to some of its data) has already been read.
+
+    The rest of the data arrives in ``chunks`` and is converted to float32
+    chunk by chunk, so the encoded bytes are never held whole. Returns None
+    for WAVs the in-place path cannot read, without consuming ``chunks``.
+    """
+    parsed = parse_wav_header(header)
+    if parsed is None:
+        return None
+    audio_format, channels, source_rate, bits_per_sample, offset, _ = parsed
+    if (audio_format, bits_per_sample) not in WAV_DTYPES or channels == 0:
+        return None
+
+    frame_size = channels * bits_per_sample // 8
+    # The declared data size, which may run past what has been read so far
+    remaining = struct.unpack_from("<I", header, offset - 4)[0]
+    if max_seconds is not None:
+        remaining = min(remaining, int(max_seconds * source_rate) * frame_size)
+
+    pieces = []
+    pending = bytes(header[offset:])
+    for chunk in itertools.chain([b""], chunks):
+        data = (pending + chunk if pending else chunk)[:remaining]
+        usable = len(data) - len(data) % frame_size
+        if usable:
+            pieces.append(
+                wav_frames_to_float32(
+                    data[:usable], audio_format, channels, bits_per_sample
+                )
+            )
+            remaining -= usable
+        # A frame split between chunks waits for the rest of it
+        pending = data[usable:]
+        if remaining < frame_size:
+            break  # Nothing more is needed; the rest is never read
+
+    samples = np.concatenate(pieces) if pieces else np.zeros(0, dtype=np.float32)
+    if source_rate != sample_rate:
+        samples = soxr.resample(samples, source_rate, sample_rate)
+    return samples
+
+
+def decode_audio(audio_data, format_type=None, sample_rate=16000, max_seconds=None):
+    """Decode audio bytes to a mono float32 array at ``sample_rate`` without touching disk.
+
+    PCM and float WAVs are read in place and only resampled when needed;
+    everything else is decoded, downmixed and resampled in one ffmpeg pass
+    over stdin/stdout pipes.
+    """
+    decoded = decode_wav_fast(audio_data)
+    if decoded is not None:
+        samples, source_rate = decoded
+        if max_seconds is not None:
+            samples = samples[: int(max_seconds * source_rate)]
+        if source_rate != sample_rate:
+            samples = soxr.resample(samples, source_rate, sample_rate)
+        return samples
+
+    pcm = run_ffmpeg(
+        audio_data,
+        ["-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1", "-ar", str(sample_rate)],
+        max_seconds=max_seconds,
+    )
+    return np.frombuffer(pcm, dtype=np.float32)
+
+
+def decode_audio_stream(chunks, sample_rate=16000, max_seconds=None):
+    """Decode an iterable of encoded audio chunks without ever joining them for ffmpeg.
+
+    PCM/float WAV input (sniffed from the first chunk) is converted as its
+    chunks arrive, with only the header buffered; anything else is fed to
+    ffmpeg's stdin as it arrives.
+    """
+    chunks = iter(chunks)
+    first = next(chunks, b"")
+
+    if first[:4] == b"RIFF":
+        header = bytearray(first)
+        while (
+            parse_wav_header(header) is None and len(header) < WAV_HEADER_MAX_BYTES
+        ):
+            chunk = next(chunks, None)
+            if chunk is None:
+                break
+            header += chunk
+        samples = decode_wav_chunks(header, chunks, sample_rate, max_seconds)
+        if samples is not None:
+            return samples
+        first = bytes(header)  # Compressed or unusual WAV: ffmpeg reads it all
+
+    command = [FFMPEG_BINARY, "-nostdin", "-hide_banner", "-loglevel", "error"]
+    command += ["-i", "pipe:0"]
+    if max_seconds is not None:
+        command += ["-t", str(max_seconds)]
+    command += ["-f", "f32le", "-acodec", "pcm_f32le", "-ac", "1"]
+    command += ["-ar", str(sample_rate), "pipe:1"]
+
+    process = subprocess.Popen(
+        command, stdin=subprocess.PIPE, stdout=subprocess.PIPE, stderr=subprocess.PIPE
+    )
+    writer_errors = []
+
+    def feed():
+        try:
+            process.stdin.write(first)
+            for chunk in chunks:
+                process.stdin.write(chunk)
+        except BrokenPipeError:
+            pass  # ffmpeg stops reading once it reaches max_seconds
+        except Exception as e:
+            writer_errors.append(e)
+        finally:
+            try:
+                process.stdin.close()
+            except BrokenPipeError:
+                pass
+
+    # Feed stdin from a thread so a full stdout pipe cannot deadlock us
+    writer = threading.Thread(target=feed, daemon=True)
+    writer.start()
+    pcm = process.stdout.read()
+    stderr = process.stderr.read()
+    writer.join()
+    process.wait()
+
+    if writer_errors:
+        raise writer_errors[0]
+    if process.returncode != 0:
+        raise ValueError(f"ffmpeg could not decode audio: {stderr.decode()}")
+    return np.frombuffer(pcm, dtype=np.float32)
+
+
+PCM_SAMPLE_BYTES = {"pcm_s16le": 2, "pcm_f32le": 4}
+
+
+def pcm_to_float32(pcm_data, encoding="pcm_s16le"):
+    """Convert a raw little-endian PCM frame (mono) to float32 samples in [-1, 1)"""
+    if encoding == "pcm_s16le":
+        return np.frombuffer(pcm_data, dtype="<i2").astype(np.float32) / 32768.0
+    if encoding == "pcm_f32le":
+        return np.frombuffer(pcm_data, dtype="<f4").astype(np.float32, copy=False)
+    raise ValueError(f"Unsupported PCM encoding: {encoding}")
+
+
+def iter_base64_chunks(text, start=0, chunk_chars=BASE64_CHUNK_CHARS, timings=None):
+    """Decode a base64 string slice by slice instead of materializing it as bytes first.
+
+    Time spent in base64 decoding is accumulated into ``timings["base64_decode"]``.
+    """
+    carry = b""
+    elapsed = 0.0
+    for offset in range(start, len(text), chunk_chars):
+        t0 = time.perf_counter()
+        piece = carry + text[offset : offset + chunk_chars].encode("ascii")
+        # Line breaks would shift the 4-character alignment between slices
+        piece = piece.translate(None, b" \t\r\n")
+        usable = len(piece) - len(piece) % 4
+        carry = piece[usable:]
+        decoded = base64.b64decode(piece[:usable])
+        elapsed += time.perf_counter() - t0
+        if timings is not None:
+            timings["base64_decode"] = round(elapsed * 1000, 2)
+        if decoded:
+            yield decoded
+
+    if carry:
+        # Let b64decode raise the usual padding error for truncated input
+        yield base64.b64decode(carry)
+
+
 def convert_to_wav(audio_data, format_type):
-    """Convert audio to WAV format using temporary files for better reliability"""
+    """Convert audio to WAV format in memory"""
     try:
-        # Create a temporary file for the input audio
-        with tempfile.NamedTemporaryFile(
-            suffix=f".{format_type}", delete=False
-        ) as temp_in:
-            temp_in_path = temp_in.name
-            temp_in.write(audio_data)
-            temp_in.flush()
-
-        # Create a temporary file for the output WAV
-        temp_out_path = temp_in_path + ".wav"
-
-        # Convert to WAV using pydub
-        audio = AudioSegment.from_file(temp_in_path, format=format_type)
-        audio.export(temp_out_path, format="wav")
-
-        # Read the converted WAV file
-        with open(temp_out_path, "rb") as wav_file:
-            wav_data = wav_file.read()
-
-        # Clean up temporary files
-        os.unlink(temp_in_path)
-        os.unlink(temp_out_path)
-
-        return wav_data
+        return run_ffmpeg(audio_data, ["-f", "wav"])
     except Exception as e:
         print(f"Error converting audio: {e}")
-        # Try to clean up if files exist
-        try:
-            if os.path.exists(temp_in_path):
-                os.unlink(temp_in_path)
-            if os.path.exists(temp_out_path):
-                os.unlink(temp_out_path)
-        except:
-            pass
         return audio_data  # Return original if conversion fails
 
 
 def process_base64_audio(audio_base64):
-    """Process base64 encoded audio data with better format detection"""
+    """Decode a base64 audio payload (optionally a data URL) to DecodedAudio exactly once"""
+    with timed("process_base64_audio", "speech_recognizer"):
+        return _process_base64_audio(audio_base64)
+
+
+def _process_base64_audio(audio_base64):
     try:
-        # Split to get the actual base64 part
-        if "," in audio_base64:
-            content_type, base64_data = audio_base64.split(",", 1)
-        else:
-            base64_data = audio_base64
-            content_type = ""
+        # Look for a data URL header without copying the payload
+        comma = audio_base64.find(",", 0, 256)
+        content_type = audio_base64[:comma] if comma != -1 else ""
 
         # Determine format from content type if possible
         format_type = detect_format_from_content_type(content_type.lower())
 
-        # Decode base64
-        audio_data = base64.b64decode(base64_data)
-
-        # Convert to WAV if needed
-        if format_type != "wav":
-            audio_data = convert_to_wav(audio_data, format_type)
-            format_type = "wav"
+        timings = {}
+        start = time.perf_counter()
+        samples = decode_audio_stream(
+            iter_base64_chunks(audio_base64, start=comma + 1, timings=timings),
+            max_seconds=MAX_AUDIO_LENGTH,
+        )
+        # ffmpeg decodes while base64 chunks are still being produced
+        total = (time.perf_counter() - start) * 1000
+        timings["audio_decode"] = round(total - timings.get("base64_decode", 0), 2)
 
-        return audio_data, format_type, None
+        return DecodedAudio(samples, 16000, format_type, timings), format_type, None
 
     except Exception as e:
+        count_error("process_base64_audio", "speech_recognizer")
         return None, None, f"Error processing audio: {e}"
 
 
+def load_audio(audio_data, format_type, max_seconds=MAX_AUDIO_LENGTH):
+    """Decode base64 or uploaded audio to DecodedAudio, entirely in memory"""
+    with timed("process_audio_data", "speech_recognizer"):
+        return _load_audio(audio_data, format_type, max_seconds)
+
+
+def _load_audio(audio_data, format_type, max_seconds):
+    try:
+        # Handle base64 data
+        if isinstance(audio_data, str):
+            audio, _, error = process_base64_audio(audio_data)
+            if error:
+                print(error)
+            return audio
+
+        # Handle direct file upload; decoding stops at max_seconds
+        start = time.perf_counter()
+        samples = decode_audio(
+            audio_data, format_type, sample_rate=16000, max_seconds=max_seconds
+        )
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        return DecodedAudio(samples, 16000, format_type, {"audio_decode": elapsed})
+
+    except Exception as e:
+        print(f"Error processing audio: {e}")
+        count_error("process_audio_data", "speech_recognizer")
+        return None
+
+
 def clean_audio_data(audio_array, sample_rate=16000):
     """Clean up audio data by removing silence and normalizing"""
     try:
         # Normalize audio
-        audio_array = librosa.util.normalize(audio_array)
+        peak = np.max(np.abs(audio_array)) if len(audio_array) else 0
+        if peak > 0:
+            audio_array = audio_array / peak
 
         # Remove silence
-        non_silent = librosa.effects.split(
-            audio_array,
-            top_db=30,  # Adjust this value to change silence detection sensitivity
-            frame_length=1024,
-            hop_length=256,
+        non_silent = detect_speech_regions(
+            audio_array, sample_rate, top_db=30, min_silence_s=0, pad_s=0
         )
 
         # If no non-silent segments are found, return the original audio
@@ -129,17 +442,7 @@ def clean_audio_data(audio_array, sample_rate=16000):
             return audio_array
 
         # Concatenate non-silent parts
-        cleaned_audio = []
-        for start, end in non_silent:
-            cleaned_audio.extend(audio_array[start:end])
-
-        cleaned_audio = np.array(cleaned_audio)
-
-        # Ensure we have data
-        if len(cleaned_audio) == 0:
-            return audio_array
-
-        return cleaned_audio
+        return np.concatenate([audio_array[start:end] for start, end in non_silent])
     except Exception as e:
         print(f"Error cleaning audio: {e}")
         return audio_array  # Return the original if processing fails
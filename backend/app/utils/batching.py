@@ -0,0 +1,113 @@
+import asyncio
+from .executors import PoolSaturatedError
+
+
+class MicroBatcher:
+    """Coalesce concurrent single-item calls into one batched model call.
+
+    Callers ``await batcher.submit(item)``. A background task collects queued
+    items until either ``max_batch_size`` items are waiting or ``max_wait_ms``
+    has passed since the first one arrived, then calls ``batch_fn(items)``
+    once and hands each caller the result at its own index.
+
+    Batches run on ``pool`` (an InferencePool) when given, otherwise on the
+    loop's default executor. Once ``max_queue`` items are waiting, submit
+    raises PoolSaturatedError.
+    """
+
+    def __init__(
+        self, batch_fn, max_batch_size=32, max_wait_ms=5.0, pool=None, max_queue=None
+    ):
+        self.batch_fn = batch_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self.pool = pool
+        self.max_queue = max_queue
+        self._queue = None
+        self._loop = None
+        self._worker = None
+
+    def _ensure_worker(self):
+        loop = asyncio.get_running_loop()
+        if self._worker is None or self._worker.done() or self._loop is not loop:
+            self._loop = loop
+            self._queue = asyncio.Queue()
+            self._worker = loop.create_task(self._run())
+
+    @property
+    def queue_depth(self):
+        return self._queue.qsize() if self._queue is not None else 0
+
+    async def submit(self, item):
+        self._ensure_worker()
+        if self.max_queue is not None and self.queue_depth >= self.max_queue:
+            raise PoolSaturatedError(
+                "Too many requests are waiting. Please try again later."
+            )
+        future = self._loop.create_future()
+        self._queue.put_nowait((item, future))
+        return await future
+
+    async def _collect(self):
+        batch = [await self._queue.get()]
+        deadline = self._loop.time() + self.max_wait
+
+        while len(batch) < self.max_batch_size:
+            # Take everything that is already waiting without sleeping
+            if not self._queue.empty():
+                batch.append(self._queue.get_nowait())
+                continue
+
+            timeout = deadline - self._loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self._queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+
+        return batch
+
+    async def _run(self):
+        while True:
+            batch = await self._collect()
+
+            # Callers that went away before the batch closed are dropped here
+            batch = [(item, future) for item, future in batch if not future.done()]
+            if not batch:
+                continue
+
+            items = [item for item, _ in batch]
+            try:
+                # Run inference off the event loop; requests keep queueing
+                # while it runs and form the next batch
+                if self.pool is not None:
+                    results = await self.pool.run(self.batch_fn, items)
+                else:
+                    results = await self._loop.run_in_executor(
+                        None, self.batch_fn, items
+                    )
+            except Exception as e:
+                self._fail(batch, e)
+                continue
+
+            if len(results) != len(batch):
+                # zip() would leave the callers past the end waiting forever
+                self._fail(
+                    batch,
+                    RuntimeError(
+                        f"Batch function returned {len(results)} results "
+                        f"for {len(batch)} items"
+                    ),
+                )
+                continue
+
+            for (_, future), result in zip(batch, results):
+                if not future.done():
+                    future.set_result(result)
+
+    @staticmethod
+    def _fail(batch, error):
+        for _, future in batch:
+            if not future.done():
+                future.set_exception(error)
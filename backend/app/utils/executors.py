@@ -0,0 +1,83 @@
+import asyncio
+import functools
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from ..config import (
+    DECODE_POOL_WORKERS,
+    DECODE_POOL_QUEUE,
+    DIGIT_POOL_WORKERS,
+    DIGIT_POOL_QUEUE,
+    EMOJI_POOL_WORKERS,
+    EMOJI_POOL_QUEUE,
+    SPEECH_POOL_WORKERS,
+    SPEECH_POOL_QUEUE,
+)
+from .runtime import pin_thread
+
+
+class PoolSaturatedError(Exception):
+    """Raised when a model already has as much work queued as it is allowed"""
+
+
+class InferencePool:
+    """Bounded thread pool that keeps blocking model calls off the event loop.
+
+    At most ``max_workers`` calls run at once and at most ``max_queue`` more
+    wait for a thread; anything beyond that is rejected immediately with
+    PoolSaturatedError so the route can answer 503 instead of piling up.
+    """
+
+    def __init__(self, name, max_workers=1, max_queue=8):
+        self.name = name
+        self.max_workers = max_workers
+        self.max_queue = max_queue
+        self.pending = 0  # Running plus waiting calls
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-inference",
+            initializer=pin_thread,
+            initargs=(name,),
+        )
+
+    @property
+    def capacity(self):
+        return self.max_workers + self.max_queue
+
+    def _release(self, _future):
+        with self._lock:
+            self.pending -= 1
+
+    def submit(self, fn, *args, **kwargs):
+        """Schedule fn on the pool and return a concurrent.futures.Future"""
+        with self._lock:
+            if self.pending >= self.capacity:
+                raise PoolSaturatedError(
+                    f"{self.name} model is busy. Please try again later."
+                )
+            self.pending += 1
+
+        # The slot is released when the call really finishes, even if the
+        # awaiting request was cancelled in the meantime
+        future = self._executor.submit(functools.partial(fn, *args, **kwargs))
+        future.add_done_callback(self._release)
+        return future
+
+    async def run(self, fn, *args, **kwargs):
+        return await asyncio.wrap_future(self.submit(fn, *args, **kwargs))
+
+    def stats(self):
+        return {
+            "workers": self.max_workers,
+            "pending": self.pending,
+            "capacity": self.capacity,
+        }
+
+
+# One pool per model so a long transcription never starves the other routes
+digit_pool = InferencePool("digit", DIGIT_POOL_WORKERS, DIGIT_POOL_QUEUE)
+emoji_pool = InferencePool("emoji", EMOJI_POOL_WORKERS, EMOJI_POOL_QUEUE)
+speech_pool = InferencePool("speech", SPEECH_POOL_WORKERS, SPEECH_POOL_QUEUE)
+# Upload decoding (ffmpeg) gets its own, so streamed uploads never wait on the
+# loop's default executor that feeds them
+decode_pool = InferencePool("decode", DECODE_POOL_WORKERS, DECODE_POOL_QUEUE)
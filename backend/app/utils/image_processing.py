@@ -2,75 +2,270 @@ import base64
 from io import BytesIO
 from PIL import Image, ImageEnhance
 import numpy as np
-import tensorflow as tf
-from ..config import THRESHOLD
+from ..config import (
+    THRESHOLD,
+    DIGIT_NOISE_FRACTION,
+    DIGIT_MERGE_OVERLAP,
+    DIGIT_MULTI_MAX_PIXELS,
+    DIGIT_MULTI_MAX_RUNS,
+)
+from .metrics import count_error, timed
+
+
+def decode_canvas(image_base64: str) -> np.ndarray:
+    """Decode a base64 data URL into the 28x28 grayscale canvas (uint8)"""
+    # Decode base64
+    return decode_canvas_bytes(base64.b64decode(image_base64.split(",")[1]))
+
+
+def decode_grayscale(image_data, max_pixels=None) -> Image.Image:
+    """Decode encoded image bytes (PNG, JPEG, ...) into a high-contrast gray image.
+
+    An image over ``max_pixels`` is shrunk (keeping its aspect ratio) to fit.
+    """
+    image = Image.open(BytesIO(image_data)).convert("L")  # Convert to grayscale
+    if max_pixels is not None and image.width * image.height > max_pixels:
+        scale = (max_pixels / (image.width * image.height)) ** 0.5
+        size = (max(1, int(image.width * scale)), max(1, int(image.height * scale)))
+        image = image.resize(size, Image.Resampling.BOX)
+
+    # Enhance contrast for better digit recognition
+    return ImageEnhance.Contrast(image).enhance(3.0)
+
+
+def decode_canvas_bytes(image_data) -> np.ndarray:
+    """Decode encoded image bytes (PNG, JPEG, ...) into the 28x28 canvas (uint8)"""
+    image = decode_grayscale(image_data)
+
+    # Resize to slightly larger than 28x28, then crop to 28x28
+    image = image.resize((32, 32)).crop((2, 2, 30, 30)).resize((28, 28))
+
+    return np.asarray(image)
+
+
+def center_digits(images: np.ndarray) -> np.ndarray:
+    """Scale each drawn digit of an (N, 28, 28) 0/1 stack into a centered 20x20 box.
+
+    The MNIST-style crop, resize and paste is done for the whole stack at
+    once: every output pixel gathers its bilinear source pixels straight
+    from the uncropped canvas. Canvases with almost nothing drawn pass
+    through unchanged.
+    """
+    ink = images < 0.5
+    # Make sure there's something drawn
+    drawn = ink.sum(axis=(1, 2)) > 20
+
+    # Bounding box of the digit, expanded slightly: (N, 2) rows then columns,
+    # with the end exclusive
+    lines = np.stack([ink.any(axis=2), ink.any(axis=1)], axis=1)
+    start = np.maximum(lines.argmax(axis=2) - 2, 0)
+    stop = np.minimum(29 - lines[:, :, ::-1].argmax(axis=2), 27)
+    size = np.maximum(stop - start, 1)
+
+    # Fit in a 20x20 box (MNIST standard), centered on the 28x28 canvas
+    scale = (20.0 / size).min(axis=1, keepdims=True)
+    new_size = np.maximum((size * scale).astype(np.intp), 1)
+    offset = (28 - new_size) // 2
+
+    # Source rows and columns as tf.image.resize(method="bilinear") would
+    # pick them within the crop, with half-pixel centers (N, 2, 28)
+    local = np.arange(28) - offset[:, :, None]
+    inside = (local >= 0) & (local < new_size[:, :, None])
+    positions = (local + 0.5) * (size / new_size)[:, :, None] - 0.5
+    floor = np.floor(positions)
+    last = (size - 1)[:, :, None]
+    lower = np.minimum(np.maximum(floor, 0), last).astype(np.intp)
+    upper = np.minimum(np.maximum(np.ceil(positions), 0), last).astype(np.intp)
+    weights = (positions - floor).astype(np.float32)
+    lower += start[:, :, None]
+    upper += start[:, :, None]
+
+    # All four neighbours of every output pixel in one gather: (N, 2, 28, 2, 28)
+    n = np.arange(len(images))[:, None, None, None, None]
+    ys = np.stack([lower[:, 0], upper[:, 0]], axis=1)[:, :, :, None, None]
+    xs = np.stack([lower[:, 1], upper[:, 1]], axis=1)[:, None, None, :, :]
+    corners = images[n, ys, xs]
+    wy, wx = weights[:, 0, :, None], weights[:, 1, None, :]
+    top = corners[:, 0, :, 0] + (corners[:, 0, :, 1] - corners[:, 0, :, 0]) * wx
+    bottom = corners[:, 1, :, 0] + (corners[:, 1, :, 1] - corners[:, 1, :, 0]) * wx
+    digits = top + (bottom - top) * wy
+
+    inside = inside[:, 0, :, None] & inside[:, 1, None, :]
+    centered = np.where(inside, digits, np.float32(1.0))
+    return np.where(drawn[:, None, None], centered, images)
+
+
+def normalize_canvases(canvases: np.ndarray) -> np.ndarray:
+    """Threshold, center and invert an (N, 28, 28) uint8 stack into (N, 28, 28, 1)"""
+    # Apply thresholding to make it more black and white
+    images = np.where(canvases > THRESHOLD, 1.0, 0.0).astype(np.float32)
+    images = center_digits(images)
+
+    # Invert colors: MNIST uses white digits on black background
+    return (1.0 - images).reshape(-1, 28, 28, 1)
+
+
+def label_components(mask: np.ndarray, max_runs=None):
+    """Label the 8-connected regions of a boolean image; returns (labels, count).
+
+    Works on horizontal runs of pixels, joining runs that touch in adjacent
+    rows, so the Python loops go over runs rather than pixels. Raises
+    ValueError before looping if there are more than ``max_runs`` runs.
+    """
+    height, width = mask.shape
+    padded = np.zeros((height, width + 2), dtype=np.int8)
+    padded[:, 1:-1] = mask
+    edges = np.diff(padded, axis=1)
+    # Row-major order, so the n-th start and the n-th (exclusive) end pair up
+    rows, starts = np.nonzero(edges == 1)
+    ends = np.nonzero(edges == -1)[1]
+    if max_runs is not None and len(starts) > max_runs:
+        raise ValueError("Image has too many separate strokes to be digits")
+    row_runs = np.searchsorted(rows, np.arange(height + 1))
+
+    parent = list(range(len(starts)))
+
+    def find(i):
+        while parent[i] != i:
+            parent[i] = parent[parent[i]]
+            i = parent[i]
+        return i
+
+    for row in range(1, height):
+        i, i_stop = row_runs[row - 1], row_runs[row]
+        j, j_stop = row_runs[row], row_runs[row + 1]
+        while i < i_stop and j < j_stop:
+            # Overlapping or diagonally touching runs belong together
+            if starts[i] <= ends[j] and starts[j] <= ends[i]:
+                parent[find(i)] = find(j)
+            if ends[i] < ends[j]:
+                i += 1
+            else:
+                j += 1
+
+    labels = np.zeros((height, width), dtype=np.int32)
+    numbers = {}
+    for run, (row, start, end) in enumerate(zip(rows, starts, ends)):
+        root = find(run)
+        number = numbers.setdefault(root, len(numbers) + 1)
+        labels[row, start:end] = number
+    return labels, len(numbers)
+
+
+def group_components(labels: np.ndarray, count: int):
+    """Group ink components into digits, left to right; returns [(labels, box)].
+
+    Components smaller than DIGIT_NOISE_FRACTION of the largest are dropped,
+    and components stacked in the same columns (the bar of a "5", the dot
+    of a sloppy "7") join the digit they overlap.
+    """
+    ys, xs = np.nonzero(labels)
+    ids = labels[ys, xs] - 1
+    sizes = np.bincount(ids, minlength=count)
+    x0 = np.full(count, labels.shape[1])
+    y0 = np.full(count, labels.shape[0])
+    x1 = np.zeros(count, dtype=np.intp)
+    y1 = np.zeros(count, dtype=np.intp)
+    np.minimum.at(x0, ids, xs)
+    np.minimum.at(y0, ids, ys)
+    np.maximum.at(x1, ids, xs + 1)
+    np.maximum.at(y1, ids, ys + 1)
+
+    keep = np.flatnonzero(sizes >= DIGIT_NOISE_FRACTION * sizes.max())
+    groups = []
+    for c in keep[np.argsort(x0[keep])]:
+        box = [int(x0[c]), int(y0[c]), int(x1[c]), int(y1[c])]
+        if groups:
+            members, last = groups[-1]
+            overlap = min(last[2], box[2]) - max(last[0], box[0])
+            narrower = min(last[2] - last[0], box[2] - box[0])
+            if overlap >= DIGIT_MERGE_OVERLAP * narrower:
+                members.append(c + 1)
+                last[:] = [
+                    min(last[0], box[0]),
+                    min(last[1], box[1]),
+                    max(last[2], box[2]),
+                    max(last[3], box[3]),
+                ]
+                continue
+        groups.append(([c + 1], box))
+    return groups
+
+
+def segment_digits(gray: np.ndarray):
+    """Split a grayscale canvas into 28x28 digit canvases (uint8), left to right.
+
+    Each digit is cut out without the ink of its neighbours, padded to a
+    square so it keeps its aspect ratio and shrunk the way decode_canvas
+    shrinks a single-digit canvas. Returns (canvases, boxes) with boxes as
+    [x0, y0, x1, y1] in the original image's pixels.
+    """
+    labels, count = label_components(gray <= THRESHOLD, DIGIT_MULTI_MAX_RUNS)
+    if count == 0:
+        return np.zeros((0, 28, 28), dtype=np.uint8), []
+
+    groups = group_components(labels, count)
+    canvases = np.zeros((len(groups), 28, 28), dtype=np.uint8)
+    for i, (members, (x0, y0, x1, y1)) in enumerate(groups):
+        region = labels[y0:y1, x0:x1]
+        digit = np.where(np.isin(region, members), gray[y0:y1, x0:x1], 255)
+
+        # A margin like the one a digit drawn alone has on the canvas
+        side = int(max(y1 - y0, x1 - x0) * 1.4)
+        square = np.full((side, side), 255, dtype=np.uint8)
+        top, left = (side - (y1 - y0)) // 2, (side - (x1 - x0)) // 2
+        square[top : top + y1 - y0, left : left + x1 - x0] = digit
+        canvases[i] = np.asarray(Image.fromarray(square).resize((28, 28)))
+
+    return canvases, [list(box) for _, box in groups]
+
+
+def process_multi_digit(image_data):
+    """Segment encoded image bytes holding several digits into a batch and boxes.
+
+    Returns an (N, 28, 28, 1) float32 batch, preprocessed like process_image,
+    and the [x0, y0, x1, y1] box of each digit. Images over
+    DIGIT_MULTI_MAX_PIXELS are segmented at a smaller size, with boxes
+    scaled back. Raises ValueError for images that cannot be decoded or hold
+    far too many strokes.
+    """
+    with timed("segment_digits", "digit_recognizer"):
+        try:
+            width, height = Image.open(BytesIO(image_data)).size  # Header only
+            gray = np.asarray(decode_grayscale(image_data, DIGIT_MULTI_MAX_PIXELS))
+        except Exception as e:
+            count_error("segment_digits", "digit_recognizer")
+            raise ValueError(f"Could not decode image: {e}")
+        try:
+            canvases, boxes = segment_digits(gray)
+        except ValueError:
+            count_error("segment_digits", "digit_recognizer")
+            raise
+
+        if gray.shape != (height, width):
+            sx, sy = width / gray.shape[1], height / gray.shape[0]
+            boxes = [
+                [round(x0 * sx), round(y0 * sy), round(x1 * sx), round(y1 * sy)]
+                for x0, y0, x1, y1 in boxes
+            ]
+        return normalize_canvases(canvases), boxes
 
 
 def process_image(image_base64: str) -> np.ndarray:
     try:
-        # Decode base64
-        image_data = base64.b64decode(image_base64.split(",")[1])
-        image = Image.open(BytesIO(image_data)).convert("L")  # Convert to grayscale
-
-        # Enhance contrast for better digit recognition
-        image = ImageEnhance.Contrast(image).enhance(3.0)
-
-        # Resize to slightly larger than 28x28, then crop to 28x28
-        image = image.resize((32, 32)).crop((2, 2, 30, 30)).resize((28, 28))
-
-        # Convert to numpy array and normalize
-        image_array = np.array(image)
-
-        # Apply thresholding to make it more black and white
-        image_array = (
-            np.where(image_array > THRESHOLD, 255, 0).astype("float32") / 255.0
-        )
-
-        # Find bounding box of the digit
-        if np.sum(image_array < 0.5) > 20:  # Make sure there's something drawn
-            rows = np.any(image_array < 0.5, axis=1)
-            cols = np.any(image_array < 0.5, axis=0)
-            y_min, y_max = np.where(rows)[0][[0, -1]]
-            x_min, x_max = np.where(cols)[0][[0, -1]]
-
-            # Expand the box slightly
-            y_min = max(0, y_min - 2)
-            y_max = min(27, y_max + 2)
-            x_min = max(0, x_min - 2)
-            x_max = min(27, x_max + 2)
-
-            # Extract and resize the digit
-            digit = image_array[y_min:y_max, x_min:x_max]
-
-            # Calculate scaling to fit in a 20x20 box (MNIST standard)
-            h, w = digit.shape
-            scale = min(20.0 / h, 20.0 / w)
-            new_h, new_w = int(h * scale), int(w * scale)
-
-            # Resize while preserving aspect ratio
-            digit_resized = (
-                tf.image.resize(
-                    digit.reshape(h, w, 1), (new_h, new_w), method="bilinear"
-                )
-                .numpy()
-                .reshape(new_h, new_w)
-            )
-
-            # Create a 28x28 blank canvas and place the digit in the center
-            result = np.ones((28, 28))
-            y_offset = (28 - new_h) // 2
-            x_offset = (28 - new_w) // 2
-            result[y_offset : y_offset + new_h, x_offset : x_offset + new_w] = (
-                digit_resized
-            )
-
-            image_array = result
-
-        # Invert colors: MNIST uses white digits on black background
-        image_array = 1 - image_array
-
-        return image_array.reshape(1, 28, 28, 1)
+        with timed("process_image", "digit_recognizer"):
+            return normalize_canvases(decode_canvas(image_base64)[None])
     except Exception as e:
         print(f"Error in process_image: {e}")
         # Return a fallback empty image if processing fails
         return np.zeros((1, 28, 28, 1)).astype("float32")
+
+
+def process_image_bytes(image_data) -> np.ndarray:
+    """process_image for an already binary image, e.g. a raw or multipart upload"""
+    try:
+        with timed("process_image", "digit_recognizer"):
+            return normalize_canvases(decode_canvas_bytes(image_data)[None])
+    except Exception as e:
+        print(f"Error in process_image_bytes: {e}")
+        return np.zeros((1, 28, 28, 1)).astype("float32")
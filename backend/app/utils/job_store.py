@@ -0,0 +1,188 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+import uuid
+
+QUEUED = "queued"
+RUNNING = "running"
+DONE = "done"
+FAILED = "failed"
+FINISHED = (DONE, FAILED)
+
+COLUMNS = "id, client, priority, status, format, result, error, created, updated"
+
+
+def pid_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+class JobStore:
+    """Transcription jobs in a local SQLite file, so they outlive the worker.
+
+    Every worker process on the host can share one file: jobs are claimed
+    with a conditional UPDATE, so each one runs exactly once, and a job whose
+    worker died is put back in the queue by requeue_orphans().
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self._local = threading.local()
+        self._inherited = []  # Connections opened before a fork
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS jobs ("
+                "id TEXT PRIMARY KEY, client TEXT NOT NULL, "
+                "priority INTEGER NOT NULL, status TEXT NOT NULL, format TEXT, "
+                "audio BLOB, result TEXT, error TEXT, worker INTEGER, "
+                "created REAL NOT NULL, updated REAL NOT NULL)"
+            )
+            conn.execute(
+                "CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, priority)"
+            )
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, nor used by a
+        # process forked after they were opened (python -m app.serve workers)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                # Kept, never closed: closing it here could checkpoint and
+                # remove the WAL the parent's connection still relies on
+                self._inherited.append(conn)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    @staticmethod
+    def _row(row):
+        if row is None:
+            return None
+        job = dict(zip(COLUMNS.split(", "), row))
+        job["result"] = json.loads(job["result"]) if job["result"] else None
+        return job
+
+    def create(self, audio, format_type, client, priority=0):
+        job_id = uuid.uuid4().hex
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT INTO jobs (id, client, priority, status, format, audio, "
+                "created, updated) VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                (job_id, client, priority, QUEUED, format_type, audio, now, now),
+            )
+        return self.get(job_id)
+
+    def get(self, job_id):
+        row = (
+            self._connect()
+            .execute(f"SELECT {COLUMNS} FROM jobs WHERE id = ?", (job_id,))
+            .fetchone()
+        )
+        return self._row(row)
+
+    def count(self, status):
+        query = "SELECT COUNT(*) FROM jobs WHERE status = ?"
+        return self._connect().execute(query, (status,)).fetchone()[0]
+
+    def claim(self, limit):
+        """Mark up to ``limit`` queued jobs as running here and return them with audio.
+
+        Higher priority first; within a priority, clients take turns (each
+        client's oldest job, then each client's second oldest, ...).
+        """
+        conn = self._connect()
+        candidates = conn.execute(
+            "SELECT id FROM (SELECT id, priority, created, ROW_NUMBER() OVER "
+            "(PARTITION BY client, priority ORDER BY created) AS turn "
+            "FROM jobs WHERE status = ?) "
+            "ORDER BY priority DESC, turn, created LIMIT ?",
+            (QUEUED, limit),
+        ).fetchall()
+
+        claimed = []
+        for (job_id,) in candidates:
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE jobs SET status = ?, worker = ?, updated = ? "
+                    "WHERE id = ? AND status = ?",
+                    (RUNNING, os.getpid(), time.time(), job_id, QUEUED),
+                )
+            # Another worker may have claimed it in the meantime
+            if cursor.rowcount == 1:
+                row = conn.execute(
+                    f"SELECT {COLUMNS}, audio FROM jobs WHERE id = ?", (job_id,)
+                ).fetchone()
+                job = self._row(row[:-1])
+                job["audio"] = row[-1]
+                claimed.append(job)
+        return claimed
+
+    def _finish(self, job_id, status, result=None, error=None):
+        # The audio is dropped once it can no longer be needed
+        with self._connect() as conn:
+            conn.execute(
+                "UPDATE jobs SET status = ?, result = ?, error = ?, audio = NULL, "
+                "updated = ? WHERE id = ?",
+                (
+                    status,
+                    json.dumps(result) if result is not None else None,
+                    error,
+                    time.time(),
+                    job_id,
+                ),
+            )
+
+    def complete(self, job_id, result):
+        self._finish(job_id, DONE, result=result)
+
+    def fail(self, job_id, error):
+        self._finish(job_id, FAILED, error=error)
+
+    def release(self, job_ids):
+        """Put jobs this worker will not finish back in the queue"""
+        with self._connect() as conn:
+            conn.executemany(
+                "UPDATE jobs SET status = ?, worker = NULL, updated = ? "
+                "WHERE id = ? AND status = ?",
+                [(QUEUED, time.time(), job_id, RUNNING) for job_id in job_ids],
+            )
+
+    def requeue_orphans(self):
+        """Put running jobs whose worker process is gone back in the queue"""
+        conn = self._connect()
+        workers = conn.execute(
+            "SELECT DISTINCT worker FROM jobs WHERE status = ?", (RUNNING,)
+        ).fetchall()
+        requeued = 0
+        for (worker,) in workers:
+            if worker is not None and pid_alive(worker) and worker != os.getpid():
+                continue
+            with conn:
+                requeued += conn.execute(
+                    "UPDATE jobs SET status = ?, worker = NULL, updated = ? "
+                    "WHERE status = ? AND worker IS ?",
+                    (QUEUED, time.time(), RUNNING, worker),
+                ).rowcount
+        return requeued
+
+    def purge(self, ttl):
+        """Delete finished jobs older than ``ttl`` seconds"""
+        with self._connect() as conn:
+            return conn.execute(
+                "DELETE FROM jobs WHERE status IN (?, ?) AND updated < ?",
+                (*FINISHED, time.time() - ttl),
+            ).rowcount
@@ -0,0 +1,143 @@
+import time
+from prometheus_client import REGISTRY, Counter, Histogram, generate_latest
+from prometheus_client.core import GaugeMetricFamily
+from ..config import METRICS_ENABLED, METRICS_BUCKETS, METRICS_PREFIX
+
+
+class Timer:
+    """Context manager recording one stage's duration, and an error if it raises"""
+
+    __slots__ = ("stage", "model", "start")
+
+    def __init__(self, stage, model):
+        self.stage = stage
+        self.model = model
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        stage_seconds.labels(self.stage, self.model).observe(
+            time.perf_counter() - self.start
+        )
+        if exc_type is not None:
+            stage_errors.labels(self.stage, self.model).inc()
+        return False
+
+
+class NullTimer:
+    """Shared do-nothing stand-in for Timer when metrics are off"""
+
+    __slots__ = ()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc, traceback):
+        return False
+
+
+NULL_TIMER = NullTimer()
+
+stage_seconds = Histogram(
+    f"{METRICS_PREFIX}_stage_seconds",
+    "Time spent in each processing stage",
+    ("stage", "model"),
+    buckets=METRICS_BUCKETS,
+)
+stage_errors = Counter(
+    f"{METRICS_PREFIX}_stage_errors",
+    "Processing stages that failed",
+    ("stage", "model"),
+)
+http_requests = Counter(
+    f"{METRICS_PREFIX}_http_requests",
+    "HTTP requests by route and status code",
+    ("method", "route", "status"),
+)
+http_seconds = Histogram(
+    f"{METRICS_PREFIX}_http_request_seconds",
+    "HTTP request latency by route",
+    ("method", "route"),
+    buckets=METRICS_BUCKETS,
+)
+
+
+def timed(stage, model):
+    """Time a block as one stage of a model: `with timed("predict", "digit"): ...`"""
+    if not METRICS_ENABLED:
+        return NULL_TIMER
+    return Timer(stage, model)
+
+
+def observe(stage, model, seconds):
+    """Record a stage timed elsewhere (e.g. DecodedAudio.timings)"""
+    if METRICS_ENABLED:
+        stage_seconds.labels(stage, model).observe(seconds)
+
+
+def count_error(stage, model):
+    """Record a stage failure that was caught and turned into an error response"""
+    if METRICS_ENABLED:
+        stage_errors.labels(stage, model).inc()
+
+
+class GaugeCollector:
+    """Gauges read at scrape time, so queue depths cost nothing between scrapes.
+
+    ``read`` returns (name, help, label names, {label values: value}) tuples.
+    """
+
+    def __init__(self, read):
+        self.read = read
+
+    def describe(self):
+        return []  # Label values are only known at scrape time
+
+    def collect(self):
+        for name, help_text, label_names, values in self.read():
+            family = GaugeMetricFamily(
+                f"{METRICS_PREFIX}_{name}", help_text, labels=label_names
+            )
+            for label_values, value in values.items():
+                family.add_metric(label_values, value)
+            yield family
+
+
+def register_gauges(read):
+    REGISTRY.register(GaugeCollector(read))
+
+
+def render():
+    """Every metric (process metrics included) in the Prometheus text format"""
+    return generate_latest(REGISTRY)
+
+
+class MetricsMiddleware:
+    """ASGI middleware counting HTTP requests and timing them per route template"""
+
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            # Templates, not raw paths, keep the label set bounded
+            route = getattr(scope.get("route"), "path", "unmatched")
+            method = scope["method"]
+            http_seconds.labels(method, route).observe(time.perf_counter() - start)
+            http_requests.labels(method, route, str(status)).inc()
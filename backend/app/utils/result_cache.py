@@ -0,0 +1,176 @@
+import json
+import os
+import sqlite3
+import threading
+import time
+from collections import OrderedDict
+
+# ResultCache.lookup tier -> cache status reported in responses
+CACHE_STATUS = {"memory": "hit-memory", "shared": "hit-disk", None: "miss"}
+
+
+class SQLiteCacheBackend:
+    """Cache tier shared by every worker process on the host through one SQLite file.
+
+    Cleanup keeps at most ``max_size`` entries and, when ``max_bytes`` is set,
+    drops the oldest entries until the stored values fit in that many bytes.
+    """
+
+    def __init__(self, path, max_size=100000, cleanup_every=256, max_bytes=None):
+        self.path = path
+        self.max_size = max_size
+        self.max_bytes = max_bytes
+        self.cleanup_every = cleanup_every
+        self._writes = 0
+        self._local = threading.local()
+        self._inherited = []  # Connections opened before a fork
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+        with self._connect() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS cache "
+                "(key TEXT PRIMARY KEY, value TEXT NOT NULL, expires REAL NOT NULL)"
+            )
+
+    def _connect(self):
+        # sqlite3 connections cannot be shared between threads, nor used by a
+        # process forked after they were opened (python -m app.serve workers)
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            if conn is not None:
+                # Kept, never closed: closing it here could checkpoint and
+                # remove the WAL the parent's connection still relies on
+                self._inherited.append(conn)
+            conn = sqlite3.connect(self.path, timeout=5)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def get(self, key):
+        row = (
+            self._connect()
+            .execute(
+                "SELECT value FROM cache WHERE key = ? AND expires > ?",
+                (key, time.time()),
+            )
+            .fetchone()
+        )
+        return json.loads(row[0]) if row else None
+
+    def set(self, key, value, ttl):
+        with self._connect() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO cache (key, value, expires) VALUES (?, ?, ?)",
+                (key, json.dumps(value), time.time() + ttl),
+            )
+            self._writes += 1
+            if self._writes % self.cleanup_every == 0:
+                self._cleanup(conn)
+
+    def _cleanup(self, conn):
+        conn.execute("DELETE FROM cache WHERE expires <= ?", (time.time(),))
+        conn.execute(
+            "DELETE FROM cache WHERE key IN "
+            "(SELECT key FROM cache ORDER BY expires DESC LIMIT -1 OFFSET ?)",
+            (self.max_size,),
+        )
+        if self.max_bytes is not None:
+            # Running total from the newest entry; everything past the budget goes
+            conn.execute(
+                "DELETE FROM cache WHERE key IN (SELECT key FROM "
+                "(SELECT key, SUM(length(value)) OVER (ORDER BY expires DESC) AS total "
+                "FROM cache) WHERE total > ?)",
+                (self.max_bytes,),
+            )
+
+
+class ResultCache:
+    """Bounded LRU cache whose entries also expire after ``ttl`` seconds.
+
+    An optional shared ``backend`` (e.g. SQLiteCacheBackend) is consulted on
+    local misses and written through on every set, so several uvicorn
+    workers can reuse each other's results.
+    """
+
+    def __init__(self, max_size=1024, ttl=3600, backend=None):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.backend = backend
+        self._entries = OrderedDict()  # key -> (expires_at, value)
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def _store(self, key, value, expires_at):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_size:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    def get(self, key):
+        return self.lookup(key)[0]
+
+    def lookup(self, key):
+        """Return (value, tier) where tier is "memory", "shared" or None on a miss"""
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                expires_at, value = entry
+                if expires_at > now:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return value, "memory"
+                del self._entries[key]
+                self.evictions += 1
+
+        if self.backend is not None:
+            try:
+                value = self.backend.get(key)
+            except Exception as e:
+                print(f"Shared cache read error: {e}")
+                value = None
+            if value is not None:
+                with self._lock:
+                    self._store(key, value, now + self.ttl)
+                    self.hits += 1
+                    self.shared_hits += 1
+                return value, "shared"
+
+        with self._lock:
+            self.misses += 1
+        return None, None
+
+    def set(self, key, value):
+        with self._lock:
+            self._store(key, value, time.monotonic() + self.ttl)
+
+        if self.backend is not None:
+            try:
+                self.backend.set(key, value, self.ttl)
+            except Exception as e:
+                print(f"Shared cache write error: {e}")
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        lookups = self.hits + self.misses
+        return {
+            "size": len(self._entries),
+            "max_size": self.max_size,
+            "ttl": self.ttl,
+            "hits": self.hits,
+            "shared_hits": self.shared_hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "shared_backend": type(self.backend).__name__ if self.backend else None,
+        }
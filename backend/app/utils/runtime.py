@@ -0,0 +1,136 @@
+import os
+import threading
+from ..config import (
+    MODEL_CPU_SETS,
+    TF_INTER_OP_THREADS,
+    TF_INTRA_OP_THREADS,
+    TORCH_INTER_OP_THREADS,
+    TORCH_INTRA_OP_THREADS,
+)
+
+_configured = {}  # framework -> thread counts in effect
+_lock = threading.Lock()
+_processes = 1  # Processes sharing the machine's CPUs, see share_cpus()
+_forking = False  # Set in a parent that loads models before forking workers
+
+
+def available_cpus():
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def share_cpus(processes):
+    """Split the configured thread counts between ``processes`` worker processes.
+
+    Call before any model is imported; python -m app.serve does this for
+    its pre-forked workers.
+    """
+    global _processes
+    _processes = max(1, processes)
+
+
+def _threads(count):
+    # None leaves the framework's default (one thread per core)
+    if _forking:
+        return 1
+    return None if count is None else max(1, count // _processes)
+
+
+def prepare_fork():
+    """Keep torch single-threaded in a parent that will fork workers.
+
+    Work run while preloading (parity checks, warm-up) would otherwise start
+    OpenMP and inter-op thread pools that the forked children inherit
+    without their threads, which can hang their first parallel op.
+    """
+    global _forking
+    _forking = True
+
+
+def after_fork():
+    """In a forked worker: give torch its real intra-op thread count back"""
+    global _forking
+    _forking = False
+    with _lock:
+        if "torch" in _configured:
+            import torch
+
+            intra_op = _threads(TORCH_INTRA_OP_THREADS)
+            torch.set_num_threads(intra_op or os.cpu_count() or 1)
+            _configured["torch"]["intra_op"] = torch.get_num_threads()
+
+
+def configure_tensorflow():
+    """Apply the TF_* thread counts; they only take effect before TF runs any op"""
+    with _lock:
+        if "tensorflow" not in _configured:
+            import tensorflow as tf
+
+            threading_config = tf.config.threading
+            try:
+                intra_op = _threads(TF_INTRA_OP_THREADS)
+                if intra_op is not None:
+                    threading_config.set_intra_op_parallelism_threads(intra_op)
+                inter_op = _threads(TF_INTER_OP_THREADS)
+                if inter_op is not None:
+                    threading_config.set_inter_op_parallelism_threads(inter_op)
+            except RuntimeError as e:
+                print(f"TensorFlow đã khởi tạo, giữ số thread mặc định: {e}")
+
+            # 0 means TensorFlow picks (one thread per core)
+            _configured["tensorflow"] = {
+                "intra_op": threading_config.get_intra_op_parallelism_threads(),
+                "inter_op": threading_config.get_inter_op_parallelism_threads(),
+            }
+        return _configured["tensorflow"]
+
+
+def configure_torch():
+    """Apply the TORCH_* thread counts (inter-op only before torch's first op)"""
+    with _lock:
+        if "torch" not in _configured:
+            import torch
+
+            intra_op = _threads(TORCH_INTRA_OP_THREADS)
+            if intra_op is not None:
+                torch.set_num_threads(intra_op)
+            inter_op = _threads(TORCH_INTER_OP_THREADS)
+            if inter_op is not None:
+                try:
+                    torch.set_num_interop_threads(inter_op)
+                except RuntimeError as e:
+                    print(f"PyTorch đã khởi tạo, giữ số inter-op thread mặc định: {e}")
+
+            _configured["torch"] = {
+                "intra_op": torch.get_num_threads(),
+                "inter_op": torch.get_num_interop_threads(),
+            }
+        return _configured["torch"]
+
+
+def pin_thread(pool_name):
+    """Restrict the calling thread to MODEL_CPU_SETS[pool_name], if one is set.
+
+    Used as the initializer of each inference pool's threads. Linux only;
+    runtime threads a framework starts from a pinned thread inherit its set.
+    """
+    cpus = MODEL_CPU_SETS.get(pool_name)
+    if not cpus or not hasattr(os, "sched_setaffinity"):
+        return
+    allowed = set(cpus) & set(available_cpus())
+    if not allowed:
+        print(f"CPU set {cpus} của {pool_name} không khả dụng, bỏ qua")
+        return
+    # pid 0 is the calling thread, not the whole process
+    os.sched_setaffinity(0, allowed)
+
+
+def stats():
+    return {
+        "cpus": len(available_cpus()),
+        "processes": _processes,
+        # Frameworks show up once a model using them has been loaded
+        "frameworks": dict(_configured),
+        "cpu_sets": {name: cpus for name, cpus in MODEL_CPU_SETS.items() if cpus},
+    }
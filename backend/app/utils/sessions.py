@@ -0,0 +1,86 @@
+import asyncio
+from collections import OrderedDict
+
+
+class SupersededError(Exception):
+    """The session sent a newer request before this one was answered"""
+
+
+class Session:
+    def __init__(self):
+        self.version = 0  # Bumped by every request
+        self.seq = None  # Highest client sequence number seen
+        self.inflight = None  # asyncio.Task submitted for the latest request
+
+
+class SessionDebouncer:
+    """Let only the latest request of each client session reach ``submit``.
+
+    A request waits ``debounce_ms`` first; if the same session sends another
+    one in the meantime it is superseded without running. A request that was
+    already submitted is cancelled when a newer one arrives, which removes it
+    from a MicroBatcher queue before its batch closes. Clients may send a
+    ``seq`` number so requests that arrive out of order are superseded too.
+    """
+
+    def __init__(self, submit, debounce_ms=150, max_sessions=10000):
+        self.submit = submit
+        self.debounce = debounce_ms / 1000.0
+        self.max_sessions = max_sessions
+        self.sessions = OrderedDict()  # session id -> Session, least recent first
+        self.submitted = 0
+        self.superseded = 0
+
+    def _session(self, session_id):
+        session = self.sessions.get(session_id)
+        if session is None:
+            session = self.sessions[session_id] = Session()
+            # Forgetting a session only loses supersession for its next request
+            while len(self.sessions) > self.max_sessions:
+                self.sessions.popitem(last=False)
+        self.sessions.move_to_end(session_id)
+        return session
+
+    def _supersede(self):
+        self.superseded += 1
+        raise SupersededError("Superseded by a newer request from this session")
+
+    async def run(self, session_id, item, seq=None):
+        """``await submit(item)`` unless a newer request supersedes it first"""
+        session = self._session(session_id)
+        if seq is not None:
+            if session.seq is not None and seq <= session.seq:
+                self._supersede()
+            session.seq = seq
+
+        session.version += 1
+        version = session.version
+        if session.inflight is not None:
+            session.inflight.cancel()
+            session.inflight = None
+
+        if self.debounce > 0:
+            await asyncio.sleep(self.debounce)
+        if session.version != version:
+            self._supersede()
+
+        task = asyncio.ensure_future(self.submit(item))
+        session.inflight = task
+        self.submitted += 1
+        try:
+            return await task
+        except asyncio.CancelledError:
+            # Only swallow the cancellation that a newer request caused
+            if task.cancelled() and session.version != version:
+                self._supersede()
+            raise
+        finally:
+            if session.inflight is task:
+                session.inflight = None
+
+    def stats(self):
+        return {
+            "sessions": len(self.sessions),
+            "submitted": self.submitted,
+            "superseded": self.superseded,
+        }
@@ -0,0 +1,99 @@
+import re
+import threading
+from collections import OrderedDict
+
+# Everything after the last run of whitespace: the word being typed
+LAST_WORD = re.compile(r"\S*$")
+
+
+def split_last_word(text):
+    start = LAST_WORD.search(text).start()
+    return text[:start].rstrip(), text[start:]
+
+
+class PrefixTokenCache:
+    """Token ids for typed text, reusing the ids of everything before the last word.
+
+    Tokenizers that split on whitespace before anything else (DistilBERT's
+    WordPiece does) give "how are you" the ids of "how are" followed by those
+    of "you", so while someone types only the word under the cursor is
+    tokenized again. Prefixes are shared by every caller and kept in LRU
+    order. Tokenizers that fail that check on ``sample_texts`` always
+    tokenize the whole text.
+    """
+
+    def __init__(self, tokenizer, max_entries=4096, sample_texts=()):
+        self.tokenizer = tokenizer
+        self.max_entries = max_entries
+        self.max_tokens = (
+            tokenizer.model_max_length - tokenizer.num_special_tokens_to_add()
+        )
+        self._entries = OrderedDict()  # prefix -> token ids, without special tokens
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Fall back to whole-text tokenization if reuse changes any sample's ids
+        self.enabled = True
+        self.enabled = all(
+            self.encode(text) == self._encode_full(text) for text in sample_texts
+        )
+        self._entries.clear()
+        self.hits = 0
+        self.misses = 0
+
+    def _tokenize(self, text):
+        return self.tokenizer(text, add_special_tokens=False)["input_ids"]
+
+    def _encode_full(self, text):
+        return self.tokenizer(text, truncation=True)["input_ids"]
+
+    def _lookup(self, prefix):
+        with self._lock:
+            ids = self._entries.get(prefix)
+            if ids is not None:
+                self._entries.move_to_end(prefix)
+            return ids
+
+    def _store(self, prefix, ids):
+        with self._lock:
+            self._entries[prefix] = ids
+            self._entries.move_to_end(prefix)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def _prefix_ids(self, prefix):
+        if not prefix:
+            return []
+        ids = self._lookup(prefix)
+        if ids is not None:
+            self.hits += 1
+            return ids
+
+        self.misses += 1
+        # Typing usually extends the previous prefix by one word
+        head, word = split_last_word(prefix)
+        head_ids = self._lookup(head) if head else []
+        if head_ids is not None:
+            ids = head_ids + self._tokenize(word)
+        else:
+            ids = self._tokenize(prefix)
+        self._store(prefix, ids)
+        return ids
+
+    def encode(self, text):
+        """Input ids with special tokens, as tokenizer(text, truncation=True) gives"""
+        if not self.enabled:
+            return self._encode_full(text)
+
+        prefix, word = split_last_word(text)
+        ids = self._prefix_ids(prefix) + self._tokenize(word)
+        return self.tokenizer.build_inputs_with_special_tokens(ids[: self.max_tokens])
+
+    def stats(self):
+        return {
+            "enabled": self.enabled,
+            "entries": len(self._entries),
+            "hits": self.hits,
+            "misses": self.misses,
+        }
@@ -0,0 +1,248 @@
+import asyncio
+import concurrent.futures
+import threading
+import time
+from starlette.responses import JSONResponse
+from ..config import (
+    MAX_UPLOAD_AUDIO_LENGTH,
+    MAX_FILE_SIZE,
+    MAX_REQUEST_BYTES,
+    SUPPORTED_FORMATS,
+    UPLOAD_CHUNK_BYTES,
+    UPLOAD_QUEUE_CHUNKS,
+    UPLOAD_STALL_TIMEOUT_S,
+)
+from .audio_processing import DecodedAudio, decode_audio_stream, sniff_audio_format
+from .executors import decode_pool
+from .metrics import timed
+
+SNIFF_BYTES = 12  # Enough for every signature sniff_audio_format knows
+TOO_LARGE = "File quá lớn. Vui lòng tải lên file nhỏ hơn 10MB."
+
+
+class UploadError(Exception):
+    """An upload rejected before (or while) it was read; carries the HTTP status"""
+
+    def __init__(self, status_code, message):
+        super().__init__(message)
+        self.status_code = status_code
+
+
+class RequestTooLarge(Exception):
+    """Raised from receive() once a request body goes over the limit"""
+
+
+class BodyLimitMiddleware:
+    """ASGI middleware answering 413 as soon as a request body goes over ``max_bytes``.
+
+    A Content-Length over the limit is rejected before any of the body is
+    read; otherwise bytes are counted as they arrive, so chunked uploads are
+    cut off too. Whatever the route sends after that is dropped.
+    """
+
+    def __init__(self, app, max_bytes=MAX_REQUEST_BYTES):
+        self.app = app
+        self.max_bytes = max_bytes
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+
+        length = dict(scope["headers"]).get(b"content-length", b"")
+        if length.isdigit() and int(length) > self.max_bytes:
+            return await self.reject(scope, receive, send)
+
+        received = 0
+        started = False
+        rejected = False
+
+        async def limited_receive():
+            nonlocal received, rejected
+            message = await receive()
+            if message["type"] == "http.request":
+                received += len(message.get("body", b""))
+                if received > self.max_bytes:
+                    if not started and not rejected:
+                        rejected = True
+                        await self.reject(scope, receive, send)
+                    raise RequestTooLarge(TOO_LARGE)
+            return message
+
+        async def guarded_send(message):
+            nonlocal started
+            if rejected:
+                return  # The 413 has already gone out
+            if message["type"] == "http.response.start":
+                started = True
+            await send(message)
+
+        try:
+            await self.app(scope, limited_receive, guarded_send)
+        except RequestTooLarge:
+            if not rejected:
+                raise
+
+    async def reject(self, scope, receive, send):
+        response = JSONResponse(status_code=413, content={"error": TOO_LARGE})
+        await response(scope, receive, send)
+
+
+async def iter_upload(file, chunk_size=UPLOAD_CHUNK_BYTES):
+    """Yield an UploadFile's content in chunks instead of reading it whole"""
+    while True:
+        chunk = await file.read(chunk_size)
+        if not chunk:
+            return
+        yield chunk
+
+
+async def read_head(chunks, limit=MAX_FILE_SIZE):
+    """Read enough of an upload to sniff its format; returns (head, format)"""
+    head = bytearray()
+    async for chunk in chunks:
+        head += chunk
+        if len(head) > limit:
+            raise UploadError(413, TOO_LARGE)
+        if len(head) >= SNIFF_BYTES:
+            break
+
+    if not head:
+        raise UploadError(400, "File audio rỗng.")
+    format_type = sniff_audio_format(head)
+    if format_type not in SUPPORTED_FORMATS:
+        raise UploadError(
+            415,
+            "Định dạng không được hỗ trợ. Các định dạng hỗ trợ: "
+            + ", ".join(SUPPORTED_FORMATS),
+        )
+    return bytes(head), format_type
+
+
+async def read_upload(chunks, limit=MAX_FILE_SIZE):
+    """Read a whole upload, checking its format first and its size as it arrives"""
+    chunks = aiter(chunks)
+    head, format_type = await read_head(chunks, limit)
+    content = bytearray(head)
+    async for chunk in chunks:
+        content += chunk
+        if len(content) > limit:
+            raise UploadError(413, TOO_LARGE)
+    return bytes(content), format_type
+
+
+class ChunkStream:
+    """Hands chunks from the event loop to a decoding thread, with backpressure.
+
+    Chunks wait in an asyncio.Queue, so a full queue suspends the request
+    coroutine rather than tying up a thread; the decoder fetches each chunk
+    through the loop, giving up after ``stall_timeout`` seconds without one.
+    An exception passed to abort() is raised in the decoder, and close()
+    (called once the decoder is done, possibly early) makes puts return False.
+    """
+
+    _END = object()
+
+    def __init__(self, max_chunks=UPLOAD_QUEUE_CHUNKS, stall_timeout=None):
+        self._loop = asyncio.get_running_loop()
+        self._queue = asyncio.Queue(max_chunks)
+        self._closed = threading.Event()
+        self.stall_timeout = stall_timeout or UPLOAD_STALL_TIMEOUT_S
+
+    def _drain(self):
+        # Frees a put() waiting on a full queue that nobody reads any more
+        while not self._queue.empty():
+            self._queue.get_nowait()
+
+    async def put(self, chunk):
+        if self._closed.is_set():
+            return False
+        await self._queue.put(chunk)
+        return not self._closed.is_set()
+
+    async def finish(self):
+        await self.put(self._END)
+
+    def abort(self, error):
+        # Called on the loop; make room if needed so the decoder sees the error
+        if self._closed.is_set():
+            return
+        if self._queue.full():
+            self._queue.get_nowait()
+        self._queue.put_nowait(error)
+
+    def close(self):
+        self._closed.set()
+        try:
+            self._loop.call_soon_threadsafe(self._drain)
+        except RuntimeError:
+            pass  # The loop is already closed
+
+    def _get(self):
+        future = asyncio.run_coroutine_threadsafe(self._queue.get(), self._loop)
+        try:
+            return future.result(timeout=self.stall_timeout)
+        except concurrent.futures.TimeoutError:
+            future.cancel()
+            raise TimeoutError(f"No upload data for {self.stall_timeout}s")
+
+    def __iter__(self):
+        while True:
+            item = self._get()
+            if item is self._END:
+                return
+            if isinstance(item, BaseException):
+                raise item
+            yield item
+
+
+def decode_chunks(stream):
+    try:
+        return decode_audio_stream(stream, max_seconds=MAX_UPLOAD_AUDIO_LENGTH)
+    finally:
+        stream.close()
+
+
+async def receive_audio(chunks, limit=MAX_FILE_SIZE):
+    """Decode an upload to DecodedAudio while it is still arriving.
+
+    The format comes from the first bytes, so a wrong file is refused before
+    the rest is read, and the upload is cut off once it goes over ``limit``.
+    Non-WAV audio is piped to ffmpeg chunk by chunk; reading stops early if
+    the decoder has reached MAX_UPLOAD_AUDIO_LENGTH. Decoding runs on decode_pool,
+    so it raises PoolSaturatedError when too many uploads are being decoded,
+    and UploadError for a bad upload.
+    """
+    with timed("receive_audio", "speech_recognizer"):
+        chunks = aiter(chunks)
+        head, format_type = await read_head(chunks, limit)
+
+        stream = ChunkStream()
+        decoding = asyncio.wrap_future(decode_pool.submit(decode_chunks, stream))
+        received = len(head)
+        try:
+            more = await stream.put(head)
+            async for chunk in chunks:
+                if not more:
+                    break
+                received += len(chunk)
+                if received > limit:
+                    raise UploadError(413, TOO_LARGE)
+                more = await stream.put(chunk)
+            await stream.finish()
+        except BaseException as e:
+            stream.abort(e)
+            try:
+                await decoding
+            except BaseException:
+                pass
+            raise
+
+        # Only the decode work left after the last chunk delays the response
+        start = time.perf_counter()
+        try:
+            samples = await decoding
+        except Exception as e:
+            print(f"Error processing audio: {e}")
+            raise UploadError(400, "Không thể xử lý file audio. Vui lòng thử lại.")
+        elapsed = round((time.perf_counter() - start) * 1000, 2)
+        return DecodedAudio(samples, 16000, format_type, {"audio_decode": elapsed})
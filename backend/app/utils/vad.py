@@ -0,0 +1,133 @@
+import numpy as np
+from ..config import (
+    VAD_TOP_DB,
+    VAD_MIN_SILENCE_S,
+    VAD_PAD_S,
+    VAD_GAP_S,
+    VAD_MAX_PACK_S,
+)
+
+
+def detect_speech_regions(
+    samples,
+    sample_rate=16000,
+    top_db=VAD_TOP_DB,
+    frame_length=1024,
+    hop_length=256,
+    min_silence_s=VAD_MIN_SILENCE_S,
+    pad_s=VAD_PAD_S,
+):
+    """Return an (N, 2) array of [start, end) sample indices that contain sound.
+
+    Same criterion as librosa.effects.split (frame RMS within ``top_db`` of
+    the loudest frame), computed with strided NumPy views. Gaps shorter than
+    ``min_silence_s`` are bridged and every region is padded by ``pad_s``.
+    """
+    samples = np.asarray(samples, dtype=np.float32)
+    if len(samples) == 0:
+        return np.zeros((0, 2), dtype=np.int64)
+
+    # Centered frames, like librosa's default
+    padded = np.pad(samples, frame_length // 2)
+    if len(padded) < frame_length:
+        padded = np.pad(padded, (0, frame_length - len(padded)))
+    frames = np.lib.stride_tricks.sliding_window_view(padded, frame_length)[
+        ::hop_length
+    ]
+    power = np.einsum("ij,ij->i", frames, frames) / frame_length
+
+    peak = power.max()
+    if peak <= 0:
+        return np.zeros((0, 2), dtype=np.int64)
+    loud = power > peak * 10 ** (-top_db / 10)
+
+    # Rising and falling edges of the loud mask, as frame indices
+    edges = np.diff(np.concatenate(([False], loud, [False])).astype(np.int8))
+    starts = np.flatnonzero(edges == 1) * hop_length
+    ends = np.flatnonzero(edges == -1) * hop_length
+    ends = np.minimum(ends, len(samples))
+
+    pad = int(pad_s * sample_rate)
+    starts = np.maximum(starts - pad, 0)
+    ends = np.minimum(ends + pad, len(samples))
+
+    # Bridge short pauses (and overlapping padding) so words are not split apart
+    if len(starts) > 1:
+        gaps = starts[1:] - ends[:-1]
+        keep = gaps >= int(min_silence_s * sample_rate)
+        starts = np.concatenate(([starts[0]], starts[1:][keep]))
+        ends = np.concatenate((ends[:-1][keep], [ends[-1]]))
+
+    return np.stack([starts, ends], axis=1).astype(np.int64)
+
+
+class SpeechPack:
+    """Speech regions joined into one model input, mapped back to the original timeline"""
+
+    def __init__(self, samples, packed_starts, original_starts, lengths, sample_rate):
+        self.samples = samples
+        self.packed_starts = np.asarray(packed_starts)
+        self.original_starts = np.asarray(original_starts)
+        self.lengths = np.asarray(lengths)
+        self.sample_rate = sample_rate
+
+    def to_original(self, seconds):
+        """Map a time in the packed audio (seconds) to the original recording"""
+        if seconds is None:
+            return None
+        position = seconds * self.sample_rate
+        i = max(np.searchsorted(self.packed_starts, position, side="right") - 1, 0)
+        # Times inside an inserted gap snap to the end of the previous region
+        offset = min(max(position - self.packed_starts[i], 0), self.lengths[i])
+        return round(float(self.original_starts[i] + offset) / self.sample_rate, 2)
+
+
+def pack_speech_regions(
+    samples, regions, sample_rate=16000, max_pack_s=VAD_MAX_PACK_S, gap_s=VAD_GAP_S
+):
+    """Greedily pack speech regions into inputs of at most ``max_pack_s`` seconds.
+
+    Whisper always encodes a fixed 30 s window, so skipping silence only
+    saves encoder work if the remaining speech fills fewer windows.
+    Regions are separated by ``gap_s`` of silence so words do not run
+    together.
+    """
+    max_len = int(max_pack_s * sample_rate)
+    gap = np.zeros(int(gap_s * sample_rate), dtype=np.float32)
+
+    packs = []
+    pieces, packed_starts, original_starts, lengths = [], [], [], []
+    position = 0
+
+    def close():
+        packs.append(
+            SpeechPack(
+                np.concatenate(pieces),
+                packed_starts,
+                original_starts,
+                lengths,
+                sample_rate,
+            )
+        )
+
+    for start, end in regions:
+        # Regions longer than one window are split at window boundaries
+        for piece_start in range(int(start), int(end), max_len):
+            piece = samples[piece_start : min(piece_start + max_len, int(end))]
+            needed = len(piece) + (len(gap) if pieces else 0)
+            if pieces and position + needed > max_len:
+                close()
+                pieces, packed_starts, original_starts, lengths = [], [], [], []
+                position = 0
+            if pieces:
+                pieces.append(gap)
+                position += len(gap)
+            pieces.append(piece)
+            packed_starts.append(position)
+            original_starts.append(piece_start)
+            lengths.append(len(piece))
+            position += len(piece)
+
+    if pieces:
+        close()
+    return packs
@@ -0,0 +1 @@
+# Make this directory a Python package
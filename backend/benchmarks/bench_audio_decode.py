@@ -0,0 +1,140 @@
+"""Per-request decode time and peak RSS for ~10 MB uploads in every supported format.
+
+Compares the previous pydub + temp file + librosa path with decode_audio.
+Each measurement runs in a fresh process so peak RSS is not shared between
+runs. Requires ffmpeg on PATH. From the backend directory:
+
+    python -m benchmarks.bench_audio_decode --size-mb 10 --repeat 3
+"""
+
+import argparse
+import io
+import multiprocessing
+import resource
+import subprocess
+import time
+
+import numpy as np
+
+from app.config import FFMPEG_BINARY, SUPPORTED_FORMATS
+
+
+def make_signal(seconds, sample_rate=44100, seed=0):
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    tone = 0.3 * np.sin(2 * np.pi * 220 * t) * (1 + np.sin(2 * np.pi * 0.5 * t))
+    stereo = np.stack([tone, tone], axis=1) + 0.02 * rng.standard_normal((len(t), 2))
+    return (np.clip(stereo, -1, 1) * 32767).astype("<i2")
+
+
+def encode(pcm, format_type, sample_rate=44100):
+    command = [
+        FFMPEG_BINARY, "-nostdin", "-loglevel", "error",
+        "-f", "s16le", "-ar", str(sample_rate), "-ac", "2", "-i", "pipe:0",
+        "-f", format_type, "pipe:1",
+    ]  # fmt: skip
+    return subprocess.run(
+        command, input=pcm.tobytes(), capture_output=True, check=True
+    ).stdout
+
+
+def make_file(format_type, size_bytes):
+    """Encode a short probe, then scale its duration to land near size_bytes"""
+    probe_seconds = 10
+    probe = encode(make_signal(probe_seconds), format_type)
+    bytes_per_second = len(probe) / probe_seconds
+    return encode(make_signal(size_bytes / bytes_per_second), format_type)
+
+
+def legacy_decode(audio_bytes, format_type):
+    """The pre-decode_audio pipeline: temp file -> pydub -> WAV BytesIO -> librosa"""
+    import os
+    import tempfile
+
+    import librosa
+    from pydub import AudioSegment
+
+    with tempfile.NamedTemporaryFile(delete=False, suffix=f".{format_type}") as f:
+        f.write(audio_bytes)
+        temp_path = f.name
+    segment = AudioSegment.from_file(temp_path, format=format_type)
+    wav_io = io.BytesIO()
+    segment.export(wav_io, format="wav")
+    wav_io.seek(0)
+    audio_array, _ = librosa.load(wav_io, sr=16000, mono=True)
+    os.unlink(temp_path)
+    return audio_array
+
+
+def new_decode(audio_bytes, format_type):
+    from app.utils.audio_processing import decode_audio
+
+    return decode_audio(audio_bytes, format_type)
+
+
+def measure(mode, audio_bytes, format_type, results):
+    decode = legacy_decode if mode == "legacy" else new_decode
+
+    # Imports are not part of the per-request cost
+    if mode == "legacy":
+        import librosa  # noqa: F401
+        import pydub  # noqa: F401
+    else:
+        import app.utils.audio_processing  # noqa: F401
+    baseline_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+
+    start = time.perf_counter()
+    decode(audio_bytes, format_type)
+    elapsed = time.perf_counter() - start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    results.put(
+        {
+            "seconds": elapsed,
+            "peak_rss_mb": peak_kb / 1024,
+            "rss_growth_mb": (peak_kb - baseline_kb) / 1024,
+            "child_peak_rss_mb": resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss
+            / 1024,
+        }
+    )
+
+
+def run_isolated(mode, audio_bytes, format_type):
+    context = multiprocessing.get_context("spawn")
+    results = context.Queue()
+    process = context.Process(
+        target=measure, args=(mode, audio_bytes, format_type, results)
+    )
+    process.start()
+    result = results.get()
+    process.join()
+    return result
+
+
+def main(args):
+    print(
+        f"{'format':<6} {'size MB':>8} {'mode':<7} {'decode ms':>10} "
+        f"{'peak RSS MB':>12} {'RSS growth MB':>14} {'ffmpeg RSS MB':>14}"
+    )
+    for format_type in args.formats:
+        audio_bytes = make_file(format_type, args.size_mb * 1024 * 1024)
+        for mode in ("legacy", "new"):
+            runs = [
+                run_isolated(mode, audio_bytes, format_type)
+                for _ in range(args.repeat)
+            ]
+            print(
+                f"{format_type:<6} {len(audio_bytes) / 2**20:>8.1f} {mode:<7} "
+                f"{1000 * np.median([r['seconds'] for r in runs]):>10.1f} "
+                f"{max(r['peak_rss_mb'] for r in runs):>12.1f} "
+                f"{max(r['rss_growth_mb'] for r in runs):>14.1f} "
+                f"{max(r['child_peak_rss_mb'] for r in runs):>14.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--size-mb", type=float, default=10)
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--formats", nargs="+", default=SUPPORTED_FORMATS)
+    main(parser.parse_args())
@@ -0,0 +1,141 @@
+"""Latency, throughput and resident memory of every inference backend per model.
+
+Each (model, backend) pair is loaded in a fresh process so RSS numbers are
+not polluted by earlier models. From the backend directory:
+
+    python -m benchmarks.bench_backends --models digit emoji speech --repeat 50
+"""
+
+import argparse
+import multiprocessing
+import queue
+import time
+
+import numpy as np
+import psutil
+
+from app.models.backends import DIGIT_BACKENDS, TORCH_BACKENDS
+
+TEXTS = [
+    "lol",
+    "thanks so much for the help!",
+    "I can't believe you did that, I'm furious",
+    "what does this even mean?",
+    "we won the championship!!!",
+    "ok",
+    "I miss my grandmother every day",
+    "that's disgusting",
+]
+
+
+def build(model, backend):
+    """Return (effective backend, single-call fn, batch fn, items per batch call)"""
+    if model == "digit":
+        from app.models.digit_recognizer import DigitRecognizer
+
+        recognizer = DigitRecognizer(backend=backend)
+        images = np.random.default_rng(0).random((64, 28, 28, 1), dtype="float32")
+        return (
+            recognizer.backend,
+            lambda: recognizer.predict(images[:1]),
+            lambda: recognizer.predict_batch(images),
+            len(images),
+        )
+
+    if model == "emoji":
+        from app.models.emoji_predictor import EmojiPredictor
+
+        # Call the pipeline directly so the result cache does not hide the model
+        classifier = EmojiPredictor(backend=backend)
+        pipe = classifier.emoji_classifier
+        return (
+            classifier.backend,
+            lambda: pipe(TEXTS[1]),
+            lambda: pipe(TEXTS * 4, batch_size=16),
+            len(TEXTS) * 4,
+        )
+
+    from app.models.speech_recognizer import SpeechRecognizer, parity_audio
+
+    recognizer = SpeechRecognizer(backend=backend)
+    audio = parity_audio(seconds=5)
+    return (
+        recognizer.backend,
+        lambda: recognizer.pipe(audio),
+        lambda: recognizer.pipe([audio] * 8),
+        8,
+    )
+
+
+def measure(model, backend, repeat, results):
+    process = psutil.Process()
+    rss_before = process.memory_info().rss
+
+    start = time.perf_counter()
+    effective, single, batch, batch_items = build(model, backend)
+    load_seconds = time.perf_counter() - start
+    rss_loaded = process.memory_info().rss
+
+    single()  # Warm-up
+    latencies = []
+    for _ in range(repeat):
+        t0 = time.perf_counter()
+        single()
+        latencies.append(time.perf_counter() - t0)
+
+    batch()
+    batch_runs = max(repeat // 10, 3)
+    t0 = time.perf_counter()
+    for _ in range(batch_runs):
+        batch()
+    throughput = batch_runs * batch_items / (time.perf_counter() - t0)
+
+    latencies_ms = np.array(latencies) * 1000
+    results.put(
+        {
+            "effective": effective,
+            "load_s": load_seconds,
+            "p50_ms": float(np.percentile(latencies_ms, 50)),
+            "p99_ms": float(np.percentile(latencies_ms, 99)),
+            "throughput": throughput,
+            "model_rss_mb": (rss_loaded - rss_before) / 2**20,
+            "peak_rss_mb": process.memory_info().rss / 2**20,
+        }
+    )
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{'model':<7} {'backend':<11} {'used':<11} {'load s':>7} {'p50 ms':>9} "
+        f"{'p99 ms':>9} {'items/s':>9} {'model MB':>9} {'RSS MB':>8}"
+    )
+    for model in args.models:
+        backends = DIGIT_BACKENDS if model == "digit" else TORCH_BACKENDS
+        for backend in backends:
+            results = context.Queue()
+            process = context.Process(
+                target=measure, args=(model, backend, args.repeat, results)
+            )
+            process.start()
+            try:
+                r = results.get(timeout=args.timeout)
+            except queue.Empty:
+                process.terminate()
+                print(f"{model:<7} {backend:<11} failed (exit code {process.exitcode})")
+                continue
+            finally:
+                process.join()
+            print(
+                f"{model:<7} {backend:<11} {r['effective']:<11} {r['load_s']:>7.1f} "
+                f"{r['p50_ms']:>9.2f} {r['p99_ms']:>9.2f} {r['throughput']:>9.1f} "
+                f"{r['model_rss_mb']:>9.0f} {r['peak_rss_mb']:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--models", nargs="+", default=["digit", "emoji", "speech"])
+    parser.add_argument("--repeat", type=int, default=50)
+    parser.add_argument("--timeout", type=float, default=1800)
+    main(parser.parse_args())
@@ -0,0 +1,84 @@
+"""Cold-start time of each hub model: Hugging Face cache vs the local artifact store.
+
+Every (model, source) pair loads in a fresh process. "hub" resolves the hub
+id the way the app did before the store existed (the HF cache, downloading
+on a miss, pickled .bin weights for models without safetensors); "store"
+loads the prefetched snapshot. Run the prefetch first, then from the backend
+directory:
+
+    python -m app.models.artifacts prefetch
+    python -m benchmarks.bench_cold_start --models emoji_predictor speech_recognizer
+"""
+
+import argparse
+import multiprocessing
+import queue
+import tempfile
+import time
+
+import psutil
+
+SOURCES = ["hub", "store"]
+
+
+def load(name, source, results):
+    start = time.perf_counter()
+    from app.models.artifacts import model_store
+    from app.models.registry import model_registry
+
+    if source == "hub":
+        # An empty, online store hands every model its hub id
+        model_store.directory = tempfile.mkdtemp()
+        model_store.offline = False
+    imported = time.perf_counter()
+
+    try:
+        model_registry.get(name)
+    except Exception as e:
+        results.put({"error": str(e)})
+        return
+    loaded = time.perf_counter()
+    results.put(
+        {
+            "import_s": imported - start,
+            "load_s": loaded - imported,
+            "rss_mb": psutil.Process().memory_info().rss / 2**20,
+        }
+    )
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    print(f"{'model':<24} {'source':<6} {'import s':>9} {'load s':>8} {'RSS MB':>8}")
+    for name in args.models:
+        for source in args.sources:
+            results = context.Queue()
+            process = context.Process(target=load, args=(name, source, results))
+            process.start()
+            try:
+                r = results.get(timeout=args.timeout)
+            except queue.Empty:
+                process.terminate()
+                print(f"{name:<24} {source:<6} failed (exit code {process.exitcode})")
+                continue
+            finally:
+                process.join()
+            if "error" in r:
+                print(f"{name:<24} {source:<6} failed: {r['error']}")
+                continue
+            print(
+                f"{name:<24} {source:<6} {r['import_s']:>9.2f} {r['load_s']:>8.2f} "
+                f"{r['rss_mb']:>8.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument(
+        "--models",
+        nargs="+",
+        default=["emoji_predictor", "speech_recognizer", "speech_recognizer_fast"],
+    )
+    parser.add_argument("--sources", nargs="+", choices=SOURCES, default=SOURCES)
+    parser.add_argument("--timeout", type=float, default=1800)
+    main(parser.parse_args())
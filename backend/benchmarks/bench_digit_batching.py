@@ -0,0 +1,88 @@
+"""Compare batch-of-one /predict inference against the MicroBatcher path.
+
+Run from the backend directory:
+
+    python -m benchmarks.bench_digit_batching --requests 2000 --concurrency 1 8 32 128
+"""
+
+import argparse
+import asyncio
+import time
+
+import numpy as np
+
+from app.config import DIGIT_BATCH_MAX_SIZE, DIGIT_BATCH_MAX_WAIT_MS
+from app.models.registry import model_registry
+from app.utils.batching import MicroBatcher
+
+
+def make_images(count, seed=0):
+    """Random stroke-like (1, 28, 28, 1) inputs, already in process_image's output range"""
+    rng = np.random.default_rng(seed)
+    images = np.zeros((count, 28, 28), dtype="float32")
+    for image in images:
+        rows = rng.integers(4, 24, size=2)
+        cols = rng.integers(4, 24, size=2)
+        image[min(rows) : max(rows) + 1, cols[0] : cols[0] + 3] = 1.0
+        image[rows[0] : rows[0] + 3, min(cols) : max(cols) + 1] = 1.0
+    return [image.reshape(1, 28, 28, 1) for image in images]
+
+
+async def run_level(predict, images, concurrency):
+    latencies = []
+    queue = list(images)
+
+    async def client():
+        while queue:
+            image = queue.pop()
+            start = time.perf_counter()
+            await predict(image)
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(client() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+    }
+
+
+async def main(args):
+    images = make_images(args.requests)
+    digit_recognizer = model_registry.get("digit_recognizer")
+
+    # The current route calls predict synchronously inside the handler
+    async def direct(image):
+        return digit_recognizer.predict(image)
+
+    batcher = MicroBatcher(
+        digit_recognizer.predict_batch,
+        max_batch_size=args.max_batch_size,
+        max_wait_ms=args.max_wait_ms,
+    )
+
+    # Warm up both paths so graph tracing is not measured
+    await run_level(direct, images[:32], 1)
+    await run_level(batcher.submit, images[:256], 32)
+
+    print(f"{'mode':<8} {'conc':>5} {'req/s':>10} {'p50 ms':>9} {'p99 ms':>9}")
+    for concurrency in args.concurrency:
+        for mode, predict in (("direct", direct), ("batched", batcher.submit)):
+            stats = await run_level(predict, images, concurrency)
+            print(
+                f"{mode:<8} {concurrency:>5} {stats['throughput']:>10.1f} "
+                f"{stats['p50_ms']:>9.2f} {stats['p99_ms']:>9.2f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 8, 32, 128])
+    parser.add_argument("--max-batch-size", type=int, default=DIGIT_BATCH_MAX_SIZE)
+    parser.add_argument("--max-wait-ms", type=float, default=DIGIT_BATCH_MAX_WAIT_MS)
+    asyncio.run(main(parser.parse_args()))
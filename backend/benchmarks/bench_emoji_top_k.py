@@ -0,0 +1,87 @@
+"""Ranked emotions via the pipeline's list of dicts vs one vectorized pass.
+
+The baseline asks the text-classification pipeline for every label
+(top_k=None) and sorts and maps each text's list of dicts in Python;
+predict_distribution runs the same forward passes and ranks the whole batch
+with NumPy. The result cache is disabled. From the backend directory:
+
+    python -m benchmarks.bench_emoji_top_k --texts 256 --top-k 5
+"""
+
+import argparse
+import time
+
+import numpy as np
+
+from app.config import EMOJI_BATCH_SIZE
+from app.models.emoji_predictor import EmojiPredictor
+from app.utils.result_cache import ResultCache
+from benchmarks.synthetic import make_texts
+
+
+def pipeline_top_k(predictor, texts, top_k):
+    outputs = predictor.emoji_classifier(
+        texts, top_k=None, batch_size=EMOJI_BATCH_SIZE
+    )
+    results = []
+    for output in outputs:
+        ranked = sorted(output, key=lambda item: item["score"], reverse=True)[:top_k]
+        results.append(
+            [
+                {
+                    "emotion": item["label"],
+                    "emoji": predictor.emoji_map.get(item["label"], "❓"),
+                    "confidence": round(item["score"] * 100, 2),
+                }
+                for item in ranked
+            ]
+        )
+    return results
+
+
+def measure(fn, repeat):
+    fn()  # Warm-up
+    latencies = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        fn()
+        latencies.append(time.perf_counter() - start)
+    return np.array(latencies) * 1000
+
+
+def main(args):
+    predictor = EmojiPredictor()
+    predictor.cache = ResultCache(max_size=0, ttl=0)
+    texts = make_texts(args.texts)
+
+    # Both paths must rank the same emotions first
+    reference = pipeline_top_k(predictor, texts, args.top_k)
+    ranked = predictor.predict_distribution(texts, args.top_k)
+    agree = np.mean(
+        [
+            row[0]["emotion"] == emotions[0]
+            for row, emotions in zip(reference, ranked["emotions"])
+        ]
+    )
+    print(f"top-1 agreement: {agree:.1%}")
+
+    print(f"{'path':<22} {'p50 ms':>9} {'p95 ms':>9} {'texts/s':>9}")
+    paths = {
+        "pipeline + dicts": lambda: pipeline_top_k(predictor, texts, args.top_k),
+        "vectorized": lambda: predictor.predict_distribution(texts, args.top_k),
+    }
+    for name, fn in paths.items():
+        latencies = measure(fn, args.repeat)
+        p50 = np.percentile(latencies, 50)
+        print(
+            f"{name:<22} {p50:>9.1f} {np.percentile(latencies, 95):>9.1f} "
+            f"{len(texts) / p50 * 1000:>9.0f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--texts", type=int, default=256)
+    parser.add_argument("--top-k", type=int, default=5)
+    parser.add_argument("--repeat", type=int, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,103 @@
+"""Per-image cost of digit preprocessing.
+
+Times the previous Pillow + tf.image.resize implementation against the
+NumPy-only process_image, and the thresholding and centering of one canvas
+at a time against a whole stack (as /predict-multi does). Needs tensorflow
+for the legacy reference; tests/test_image_processing.py checks that the
+outputs match. From the backend directory:
+
+    python -m benchmarks.bench_image_processing --images 500
+"""
+
+import argparse
+import base64
+import time
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageEnhance
+
+from app.config import THRESHOLD
+from app.utils.image_processing import (
+    decode_canvas,
+    normalize_canvases,
+    process_image,
+)
+from benchmarks.synthetic import make_canvases
+
+
+def legacy_process_image(image_base64):
+    """process_image as it was before the NumPy port (TensorFlow resize)"""
+    import tensorflow as tf
+
+    image_data = base64.b64decode(image_base64.split(",")[1])
+    image = Image.open(BytesIO(image_data)).convert("L")
+    image = ImageEnhance.Contrast(image).enhance(3.0)
+    image = image.resize((32, 32)).crop((2, 2, 30, 30)).resize((28, 28))
+    image_array = np.array(image)
+    image_array = np.where(image_array > THRESHOLD, 255, 0).astype("float32") / 255.0
+
+    if np.sum(image_array < 0.5) > 20:
+        rows = np.any(image_array < 0.5, axis=1)
+        cols = np.any(image_array < 0.5, axis=0)
+        y_min, y_max = np.where(rows)[0][[0, -1]]
+        x_min, x_max = np.where(cols)[0][[0, -1]]
+        y_min = max(0, y_min - 2)
+        y_max = min(27, y_max + 2)
+        x_min = max(0, x_min - 2)
+        x_max = min(27, x_max + 2)
+        digit = image_array[y_min:y_max, x_min:x_max]
+        h, w = digit.shape
+        scale = min(20.0 / h, 20.0 / w)
+        new_h, new_w = int(h * scale), int(w * scale)
+        digit_resized = (
+            tf.image.resize(digit.reshape(h, w, 1), (new_h, new_w), method="bilinear")
+            .numpy()
+            .reshape(new_h, new_w)
+        )
+        result = np.ones((28, 28))
+        y_offset = (28 - new_h) // 2
+        x_offset = (28 - new_w) // 2
+        result[y_offset : y_offset + new_h, x_offset : x_offset + new_w] = digit_resized
+        image_array = result
+
+    image_array = 1 - image_array
+    return image_array.reshape(1, 28, 28, 1)
+
+
+def per_image_us(fn, items, repeat):
+    start = time.perf_counter()
+    for _ in range(repeat):
+        fn(items)
+    return (time.perf_counter() - start) / (repeat * len(items)) * 1e6
+
+
+def main(args):
+    canvases = make_canvases(args.images)
+    decoded = np.stack([decode_canvas(c) for c in canvases])
+
+    timings = {
+        "legacy (TF resize)": per_image_us(
+            lambda items: [legacy_process_image(c) for c in items],
+            canvases,
+            args.repeat,
+        ),
+        "process_image": per_image_us(
+            lambda items: [process_image(c) for c in items], canvases, args.repeat
+        ),
+        "normalize one": per_image_us(
+            lambda items: [normalize_canvases(c[None]) for c in items],
+            decoded,
+            args.repeat,
+        ),
+        "normalize stack": per_image_us(normalize_canvases, decoded, args.repeat),
+    }
+    for name, microseconds in timings.items():
+        print(f"{name:<20} {microseconds:>9.1f} us/image")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--images", type=int, default=500)
+    parser.add_argument("--repeat", type=int, default=3)
+    main(parser.parse_args())
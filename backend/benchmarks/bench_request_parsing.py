@@ -0,0 +1,160 @@
+"""Request parsing cost of JSON/base64 vs raw vs multipart inputs.
+
+Mounts the same input handling as /predict, /predict/raw, /predict/upload,
+/speech/transcribe, /speech/transcribe/raw (both as a whole body and
+streamed into the decoder) and /speech/upload-audio on a model-free app, so
+only body parsing and decoding (to a canvas or to PCM) is measured. Time and traced peak allocations are taken server side, around
+the whole ASGI call. WAV audio keeps ffmpeg out of the numbers. From the
+backend directory:
+
+    python -m benchmarks.bench_request_parsing --audio-seconds 30 --repeat 20
+"""
+
+import argparse
+import asyncio
+import base64
+import time
+import tracemalloc
+
+import httpx
+import numpy as np
+from fastapi import FastAPI, File, Request, UploadFile
+from pydantic import BaseModel
+
+from app.utils.audio_processing import decode_audio, process_base64_audio
+from app.utils.image_processing import process_image, process_image_bytes
+from app.utils.uploads import receive_audio
+from benchmarks.synthetic import make_canvases, make_wav, to_data_url
+
+
+class ImageData(BaseModel):
+    image: str
+
+
+class AudioData(BaseModel):
+    audio: str
+
+
+def build_app():
+    app = FastAPI()
+
+    @app.post("/image/json")
+    async def image_json(data: ImageData):
+        process_image(data.image)
+
+    @app.post("/image/raw")
+    async def image_raw(request: Request):
+        process_image_bytes(await request.body())
+
+    @app.post("/image/multipart")
+    async def image_multipart(file: UploadFile = File(...)):
+        process_image_bytes(await file.read())
+
+    @app.post("/audio/json")
+    async def audio_json(data: AudioData):
+        process_base64_audio(data.audio)
+
+    @app.post("/audio/raw")
+    async def audio_raw(request: Request):
+        decode_audio(await request.body())
+
+    @app.post("/audio/stream")
+    async def audio_stream(request: Request):
+        await receive_audio(request.stream())
+
+    @app.post("/audio/multipart")
+    async def audio_multipart(file: UploadFile = File(...)):
+        decode_audio(await file.read())
+
+    return app
+
+
+class Measure:
+    """ASGI wrapper recording server-side seconds and traced peak bytes per call"""
+
+    def __init__(self, app, trace_memory):
+        self.app = app
+        self.trace_memory = trace_memory
+        self.seconds = []
+        self.peaks = []
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            return await self.app(scope, receive, send)
+        if self.trace_memory:
+            tracemalloc.reset_peak()
+            before = tracemalloc.get_traced_memory()[0]
+        start = time.perf_counter()
+        await self.app(scope, receive, send)
+        self.seconds.append(time.perf_counter() - start)
+        if self.trace_memory:
+            self.peaks.append(tracemalloc.get_traced_memory()[1] - before)
+
+
+def requests_for(kind, payload, content_type):
+    """client.post keyword arguments for each transport"""
+    if kind == "image":
+        data_url = "data:image/png;base64," + base64.b64encode(payload).decode()
+        json_body = {"image": data_url}
+    else:
+        json_body = {"audio": to_data_url(payload, "wav")}
+    raw = {"content": payload, "headers": {"content-type": content_type}}
+    transports = {
+        "json": {"json": json_body},
+        "raw": raw,
+        "multipart": {"files": {"file": (f"input.{kind}", payload, content_type)}},
+    }
+    if kind == "audio":
+        # Decoded while it is received, as /speech/transcribe/raw does
+        transports["stream"] = raw
+    return transports
+
+
+async def run(measure, path, kwargs, repeat):
+    transport = httpx.ASGITransport(app=measure)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as c:
+        for _ in range(repeat):
+            response = await c.post(path, **kwargs)
+            response.raise_for_status()
+
+
+def main(args):
+    app = build_app()
+    canvas = base64.b64decode(make_canvases(2)[1].split(",")[1])
+    inputs = {
+        "image": (canvas, "image/png"),
+        "audio": (make_wav(args.audio_seconds), "audio/wav"),
+    }
+
+    print(
+        f"{'input':<6} {'transport':<10} {'body KB':>9} {'p50 ms':>8} {'p95 ms':>8} "
+        f"{'peak MB':>8}"
+    )
+    for kind, (payload, content_type) in inputs.items():
+        for transport, kwargs in requests_for(kind, payload, content_type).items():
+            path = f"/{kind}/{transport}"
+            body = httpx.Request("POST", "http://bench" + path, **kwargs).read()
+
+            timing = Measure(app, trace_memory=False)
+            asyncio.run(run(timing, path, kwargs, args.repeat))
+
+            # Tracing slows allocations down, so memory gets a separate pass
+            memory = Measure(app, trace_memory=True)
+            tracemalloc.start()
+            asyncio.run(run(memory, path, kwargs, 3))
+            tracemalloc.stop()
+
+            seconds = np.array(timing.seconds[1:]) * 1000  # Skip the first call
+            print(
+                f"{kind:<6} {transport:<10} {len(body) / 1024:>9.0f} "
+                f"{np.percentile(seconds, 50):>8.2f} "
+                f"{np.percentile(seconds, 95):>8.2f} "
+                f"{max(memory.peaks) / 2**20:>8.1f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--audio-seconds", type=float, default=30)
+    parser.add_argument("--repeat", type=int, default=20)
+    main(parser.parse_args())
@@ -0,0 +1,128 @@
+"""Mixed-traffic latency under different TensorFlow/PyTorch thread settings.
+
+Each setting runs in a fresh process, since neither framework can change its
+thread pools once it has started. /predict, /predict-emoji and
+/speech/transcribe are driven at the same time, in-process, so the digit
+CNN, DistilBERT and Whisper compete for the CPUs like they do in production.
+From the backend directory:
+
+    python -m benchmarks.bench_runtime_threads
+    python -m benchmarks.bench_runtime_threads --settings default tuned
+"""
+
+import argparse
+import asyncio
+import multiprocessing
+import os
+import queue
+
+import psutil
+
+from benchmarks.suite import build_requests, make_client, run_scenario
+from benchmarks.synthetic import make_audio
+
+SCENARIOS = ["digit", "emoji", "transcribe"]
+THREAD_SETTINGS = [
+    "TF_INTRA_OP_THREADS",
+    "TF_INTER_OP_THREADS",
+    "TORCH_INTRA_OP_THREADS",
+    "TORCH_INTER_OP_THREADS",
+]
+SETTINGS = ["default", "single", "tuned", "pinned"]
+
+
+def split_cpus(cpus):
+    """One CPU for the digit pool, the rest shared by emoji and speech"""
+    if len(cpus) < 3:
+        return {"digit": None, "emoji": None, "speech": None}
+    rest = cpus[1:]
+    half = len(rest) // 2
+    return {"digit": cpus[:1], "emoji": rest[:half], "speech": rest[half:]}
+
+
+def overrides(setting):
+    """app.config values for a setting; "tuned" is the shipped config"""
+    if setting == "default":
+        return {name: None for name in THREAD_SETTINGS}
+    if setting == "single":
+        return {name: 1 for name in THREAD_SETTINGS}
+    if setting == "pinned":
+        return {"MODEL_CPU_SETS": split_cpus(sorted(os.sched_getaffinity(0)))}
+    return {}
+
+
+async def mixed(args, audio):
+    counts = {
+        "digit": args.requests,
+        "emoji": args.requests,
+        "transcribe": args.speech_requests,
+    }
+    pid = psutil.Process().pid
+    async with make_client(None, args.timeout) as client:
+        requests = {s: build_requests(s, counts[s], audio) for s in SCENARIOS}
+        # Load every model before timing anything
+        for scenario in SCENARIOS:
+            await run_scenario(client, scenario, requests[scenario][:2], 1, pid)
+        results = await asyncio.gather(
+            *(
+                run_scenario(client, s, requests[s], args.concurrency, pid)
+                for s in SCENARIOS
+            )
+        )
+    return dict(zip(SCENARIOS, results))
+
+
+def run_setting(setting, args, results):
+    import app.config
+
+    # Must happen before app.utils.runtime reads them
+    for name, value in overrides(setting).items():
+        setattr(app.config, name, value)
+    from app.utils import runtime
+
+    try:
+        scenarios = asyncio.run(mixed(args, make_audio(args.audio_seconds)))
+    except Exception as e:
+        results.put({"error": str(e)})
+        return
+    results.put({"scenarios": scenarios, "runtime": runtime.stats()})
+
+
+def main(args):
+    context = multiprocessing.get_context("spawn")
+    print(
+        f"{'setting':<8} {'route':<11} {'req/s':>7} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>6}"
+    )
+    for setting in args.settings:
+        results = context.Queue()
+        process = context.Process(target=run_setting, args=(setting, args, results))
+        process.start()
+        try:
+            r = results.get(timeout=args.timeout * 10)
+        except queue.Empty:
+            process.terminate()
+            print(f"{setting:<8} failed (exit code {process.exitcode})")
+            continue
+        finally:
+            process.join()
+        if "error" in r:
+            print(f"{setting:<8} failed: {r['error']}")
+            continue
+        for scenario, s in r["scenarios"].items():
+            print(
+                f"{setting:<8} {scenario:<11} {s['throughput']:>7.1f} "
+                f"{s['p50_ms']:>8.1f} {s['p99_ms']:>8.1f} {s['errors']:>6}"
+            )
+        print(f"{'':<8} threads: {r['runtime']['frameworks']}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--settings", nargs="+", choices=SETTINGS, default=SETTINGS)
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--speech-requests", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--audio-seconds", type=float, default=5)
+    parser.add_argument("--timeout", type=float, default=120)
+    main(parser.parse_args())
@@ -0,0 +1,121 @@
+"""Latency against word error rate for every speech decoding profile.
+
+Uses a directory of clips with same-named .txt references (--data), or by
+default the small LibriSpeech sample on the Hugging Face hub (needs the
+`datasets` package). Each clip goes through the same helper as
+/speech/transcribe with the transcript cache disabled. From the backend
+directory:
+
+    python -m benchmarks.bench_speech_profiles --profiles fast balanced accurate auto
+"""
+
+import argparse
+import os
+import re
+import time
+
+import numpy as np
+
+from app.config import SPEECH_PROFILES
+from app.models.registry import model_registry
+from app.routes.speech import transcribe
+from app.utils.audio_processing import DecodedAudio, load_audio
+from app.utils.result_cache import ResultCache
+
+
+def normalize(text):
+    return re.sub(r"[^\w\s']", " ", text.lower()).split()
+
+
+def word_errors(reference, hypothesis):
+    """Word-level Levenshtein distance (substitutions + insertions + deletions)"""
+    previous = list(range(len(hypothesis) + 1))
+    for i, ref_word in enumerate(reference, 1):
+        current = [i]
+        for j, hyp_word in enumerate(hypothesis, 1):
+            current.append(
+                min(
+                    previous[j] + 1,
+                    current[j - 1] + 1,
+                    previous[j - 1] + (ref_word != hyp_word),
+                )
+            )
+        previous = current
+    return previous[-1]
+
+
+def load_clips(data_dir, limit):
+    """[(DecodedAudio, reference text)]"""
+    clips = []
+    if data_dir:
+        for name in sorted(os.listdir(data_dir)):
+            stem, extension = os.path.splitext(name)
+            reference = os.path.join(data_dir, stem + ".txt")
+            if extension == ".txt" or not os.path.exists(reference):
+                continue
+            with open(os.path.join(data_dir, name), "rb") as f:
+                audio = load_audio(f.read(), extension[1:].lower())
+            with open(reference) as f:
+                clips.append((audio, f.read().strip()))
+    else:
+        from datasets import load_dataset
+
+        dataset = load_dataset(
+            "hf-internal-testing/librispeech_asr_dummy", "clean", split="validation"
+        )
+        for item in dataset:
+            # The sample is already 16 kHz mono
+            samples = np.asarray(item["audio"]["array"], dtype=np.float32)
+            clips.append((DecodedAudio(samples, 16000, "flac"), item["text"]))
+    return clips[:limit]
+
+
+def main(args):
+    clips = load_clips(args.data, args.limit)
+    print(f"{len(clips)} clips, {sum(a.duration for a, _ in clips):.0f}s of audio")
+
+    # Load every model up front and bypass the transcript cache
+    for name in {profile["model"] for profile in SPEECH_PROFILES.values()}:
+        model_registry.get(name).cache = ResultCache(max_size=0, ttl=0)
+
+    print(
+        f"{'profile':<10} {'p50 ms':>8} {'p95 ms':>8} {'RTF':>6} {'WER %':>7} "
+        f"{'fast share':>10}"
+    )
+    for profile in args.profiles:
+        # Warm-up so graph/kernel setup is not measured
+        transcribe(clips[0][0], profile=profile, language=args.language)
+
+        latencies, errors, words, fast = [], 0, 0, 0
+        for audio, reference in clips:
+            start = time.perf_counter()
+            result = transcribe(audio, profile=profile, language=args.language)
+            latencies.append(time.perf_counter() - start)
+            if "error" in result:
+                print(f"{profile}: {result['error']}")
+                continue
+
+            reference_words = normalize(reference)
+            errors += word_errors(reference_words, normalize(result["transcription"]))
+            words += len(reference_words)
+            fast += result.get("profile") == "fast"
+
+        latencies = np.array(latencies)
+        duration = sum(audio.duration for audio, _ in clips)
+        print(
+            f"{profile:<10} {np.percentile(latencies, 50) * 1000:>8.0f} "
+            f"{np.percentile(latencies, 95) * 1000:>8.0f} "
+            f"{latencies.sum() / duration:>6.3f} {errors / max(words, 1) * 100:>7.2f} "
+            f"{fast / len(clips):>10.0%}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--data", help="Directory of audio clips with .txt references")
+    parser.add_argument("--limit", type=int, default=73)
+    parser.add_argument(
+        "--profiles", nargs="+", default=[*SPEECH_PROFILES, "auto"], metavar="PROFILE"
+    )
+    parser.add_argument("--language", default="en")
+    main(parser.parse_args())
@@ -0,0 +1,132 @@
+"""Per-worker memory and throughput of pre-fork serving vs. plain uvicorn workers.
+
+For each worker count, starts the server in a subprocess, drives /predict and
+/predict-emoji from many concurrent clients, then reads RSS, USS (private) and
+PSS (proportional share) of every worker. With `app.serve` the preloaded
+weights are shared, so USS stays small while RSS looks like a full copy.
+Linux only (PSS/USS). From the backend directory:
+
+    python -m benchmarks.bench_workers --workers 1 2 4 --modes prefork uvicorn
+"""
+
+import argparse
+import asyncio
+import subprocess
+import sys
+import time
+
+import httpx
+import numpy as np
+import psutil
+
+from benchmarks.synthetic import make_canvases
+
+COMMANDS = {
+    "prefork": [sys.executable, "-m", "app.serve", "--workers", "{workers}",
+                "--port", "{port}", "--log-level", "warning"],
+    "uvicorn": [sys.executable, "-m", "uvicorn", "app.main:app", "--workers",
+                "{workers}", "--port", "{port}", "--log-level", "warning"],
+}  # fmt: skip
+
+
+def start_server(mode, workers, port, timeout):
+    command = [part.format(workers=workers, port=port) for part in COMMANDS[mode]]
+    server = subprocess.Popen(command)
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise RuntimeError(f"{mode} server exited with code {server.returncode}")
+        try:
+            httpx.get(f"http://127.0.0.1:{port}/", timeout=1)
+            return server
+        except httpx.HTTPError:
+            time.sleep(0.5)
+    server.terminate()
+    raise RuntimeError(f"{mode} server did not start within {timeout}s")
+
+
+def worker_memory(server):
+    """(rss, uss, pss) in MB for every worker process of the server"""
+    rows = []
+    for child in psutil.Process(server.pid).children(recursive=True):
+        try:
+            info = child.memory_full_info()
+        except psutil.Error:
+            continue
+        rows.append((info.rss / 2**20, info.uss / 2**20, info.pss / 2**20))
+    return rows
+
+
+async def drive(url, requests, concurrency, canvases):
+    latencies, errors = [], 0
+    counter = iter(range(requests))
+
+    async def client(http):
+        nonlocal errors
+        for i in counter:
+            start = time.perf_counter()
+            if i % 2:
+                # A unique text each time so the result cache does not answer it
+                request = http.post("/predict-emoji", json={"text": f"great day {i}"})
+            else:
+                request = http.post(
+                    "/predict", json={"image": canvases[i % len(canvases)]}
+                )
+            response = await request
+            if response.status_code != 200 or "error" in response.json():
+                errors += 1
+            latencies.append(time.perf_counter() - start)
+
+    limits = httpx.Limits(max_connections=concurrency)
+    async with httpx.AsyncClient(base_url=url, timeout=120, limits=limits) as http:
+        start = time.perf_counter()
+        await asyncio.gather(*(client(http) for _ in range(concurrency)))
+        elapsed = time.perf_counter() - start
+
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "throughput": len(latencies) / elapsed,
+        "p50_ms": float(np.percentile(latencies_ms, 50)),
+        "p99_ms": float(np.percentile(latencies_ms, 99)),
+        "errors": errors,
+    }
+
+
+def main(args):
+    canvases = make_canvases(32)
+    url = f"http://127.0.0.1:{args.port}"
+    print(
+        f"{'mode':<8} {'workers':>7} {'req/s':>8} {'p50 ms':>8} {'p99 ms':>8} "
+        f"{'errors':>6} {'RSS/w MB':>9} {'USS/w MB':>9} {'PSS total MB':>13}"
+    )
+    for mode in args.modes:
+        for workers in args.workers:
+            server = start_server(mode, workers, args.port, args.startup_timeout)
+            try:
+                # The warm-up round also makes every lazily loading worker load
+                asyncio.run(drive(url, args.requests // 4, args.concurrency, canvases))
+                stats = asyncio.run(
+                    drive(url, args.requests, args.concurrency, canvases)
+                )
+                memory = np.array(worker_memory(server))
+            finally:
+                server.terminate()
+                server.wait()
+            rss, uss = memory[:, :2].mean(axis=0)
+            print(
+                f"{mode:<8} {workers:>7} {stats['throughput']:>8.1f} "
+                f"{stats['p50_ms']:>8.1f} {stats['p99_ms']:>8.1f} "
+                f"{stats['errors']:>6} {rss:>9.0f} {uss:>9.0f} "
+                f"{memory[:, 2].sum():>13.0f}"
+            )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--workers", type=int, nargs="+", default=[1, 2, 4])
+    parser.add_argument("--modes", nargs="+", default=["prefork", "uvicorn"])
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--startup-timeout", type=float, default=600)
+    main(parser.parse_args())
@@ -0,0 +1,90 @@
+"""Check that /predict-emoji latency stays flat while /speech/upload-audio is busy.
+
+Start the API first (uvicorn app.main:app --port 8000), then from the backend
+directory:
+
+    python -m benchmarks.load_emoji_during_speech --url http://localhost:8000
+"""
+
+import argparse
+import asyncio
+import time
+
+import httpx
+import numpy as np
+
+from benchmarks.synthetic import make_wav
+
+TEXTS = ["lol", "thanks!", "ok", "I can't believe this happened", "so proud of you"]
+
+
+async def emoji_probe(client, requests, interval):
+    latencies, rejected = [], 0
+    for i in range(requests):
+        start = time.perf_counter()
+        response = await client.post(
+            "/predict-emoji", json={"text": TEXTS[i % len(TEXTS)]}
+        )
+        if response.status_code == 503:
+            rejected += 1
+        else:
+            latencies.append(time.perf_counter() - start)
+        await asyncio.sleep(interval)
+    return np.array(latencies) * 1000, rejected
+
+
+async def speech_load(client, wav_bytes, stop, counters):
+    while not stop.is_set():
+        response = await client.post(
+            "/speech/upload-audio",
+            files={"file": ("load.wav", wav_bytes, "audio/wav")},
+        )
+        counters[response.status_code] = counters.get(response.status_code, 0) + 1
+
+
+def report(label, latencies, rejected):
+    print(
+        f"{label:<22} n={len(latencies):<5} p50={np.percentile(latencies, 50):8.2f} ms "
+        f"p99={np.percentile(latencies, 99):8.2f} ms rejected={rejected}"
+    )
+
+
+async def main(args):
+    timeout = httpx.Timeout(args.timeout)
+    async with httpx.AsyncClient(base_url=args.url, timeout=timeout) as client:
+        # Warm up the emoji model
+        await emoji_probe(client, 5, 0)
+
+        idle, idle_rejected = await emoji_probe(client, args.requests, args.interval)
+        report("emoji (idle)", idle, idle_rejected)
+
+        wav_bytes = make_wav(args.audio_seconds)
+        stop = asyncio.Event()
+        counters = {}
+        loaders = [
+            asyncio.create_task(speech_load(client, wav_bytes, stop, counters))
+            for _ in range(args.speech_clients)
+        ]
+        # Give the speech uploads time to reach the model
+        await asyncio.sleep(1.0)
+
+        busy, busy_rejected = await emoji_probe(client, args.requests, args.interval)
+        report("emoji (speech busy)", busy, busy_rejected)
+
+        stop.set()
+        await asyncio.gather(*loaders)
+        print(f"speech responses by status: {counters}")
+        print(
+            f"p50 ratio busy/idle: {np.percentile(busy, 50) / np.percentile(idle, 50):.2f}"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", default="http://localhost:8000")
+    parser.add_argument("--requests", type=int, default=200)
+    parser.add_argument("--interval", type=float, default=0.02)
+    parser.add_argument("--speech-clients", type=int, default=4)
+    parser.add_argument("--audio-seconds", type=float, default=25)
+    parser.add_argument("--timeout", type=float, default=300)
+    asyncio.run(main(parser.parse_args()))
@@ -0,0 +1,269 @@
+"""Load-test every inference route and compare the results with a baseline.
+
+Drives /predict, /predict-emoji, /speech/transcribe and /speech/upload-audio
+with synthetic inputs (see benchmarks.synthetic), either in-process through
+httpx's ASGI transport or over HTTP against a running server, and reports
+throughput, latency percentiles, CPU time and peak RSS per scenario. From the
+backend directory:
+
+    python -m benchmarks.suite --out results.json
+    python -m benchmarks.suite --url http://localhost:8000 --server-pid 1234 \\
+        --baseline results.json --out new.json
+
+With --baseline, exits non-zero when a scenario's throughput or p50/p99
+latency regresses by more than --threshold percent.
+"""
+
+import argparse
+import asyncio
+import json
+import platform
+import subprocess
+import sys
+import threading
+import time
+
+import httpx
+import numpy as np
+import psutil
+
+from benchmarks.synthetic import (
+    make_audio,
+    make_canvases,
+    make_texts,
+    to_data_url,
+)
+
+SCENARIOS = ["digit", "emoji", "transcribe", "upload"]
+
+
+class MemorySampler(threading.Thread):
+    """Track the peak RSS of a process by polling it in the background"""
+
+    def __init__(self, pid, interval=0.05):
+        super().__init__(daemon=True)
+        self.process = psutil.Process(pid)
+        self.interval = interval
+        self.peak = self.process.memory_info().rss
+        self._stop_event = threading.Event()
+
+    def run(self):
+        while not self._stop_event.wait(self.interval):
+            try:
+                self.peak = max(self.peak, self.process.memory_info().rss)
+            except psutil.Error:
+                return
+
+    def stop(self):
+        self._stop_event.set()
+        self.join()
+        return self.peak
+
+
+def build_requests(scenario, count, audio):
+    """Keyword arguments for client.post, one dict per request"""
+    if scenario == "digit":
+        return [{"json": {"image": image}} for image in make_canvases(count)]
+    if scenario == "emoji":
+        return [{"json": {"text": text}} for text in make_texts(count)]
+
+    formats = list(audio)
+    requests = []
+    for i in range(count):
+        format_type = formats[i % len(formats)]
+        if scenario == "transcribe":
+            data_url = to_data_url(audio[format_type], format_type)
+            requests.append({"json": {"audio": data_url, "format": format_type}})
+        else:
+            upload = (
+                f"bench.{format_type}",
+                audio[format_type],
+                f"audio/{format_type}",
+            )
+            requests.append({"files": {"file": upload}})
+    return requests
+
+
+PATHS = {
+    "digit": "/predict",
+    "emoji": "/predict-emoji",
+    "transcribe": "/speech/transcribe",
+    "upload": "/speech/upload-audio",
+}
+
+
+async def run_scenario(client, scenario, requests, concurrency, pid):
+    latencies, errors = [], 0
+    pending = iter(requests)
+
+    async def worker():
+        nonlocal errors
+        for kwargs in pending:
+            start = time.perf_counter()
+            response = await client.post(PATHS[scenario], **kwargs)
+            latencies.append(time.perf_counter() - start)
+            if response.status_code != 200 or "error" in response.json():
+                errors += 1
+
+    process = psutil.Process(pid)
+    sampler = MemorySampler(pid)
+    sampler.start()
+    cpu_before = process.cpu_times()
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    elapsed = time.perf_counter() - start
+    cpu_after = process.cpu_times()
+    peak_rss = sampler.stop()
+
+    cpu_seconds = (cpu_after.user - cpu_before.user) + (
+        cpu_after.system - cpu_before.system
+    )
+    latencies_ms = np.array(latencies) * 1000
+    return {
+        "requests": len(latencies),
+        "errors": errors,
+        "concurrency": concurrency,
+        "seconds": round(elapsed, 3),
+        "throughput": round(len(latencies) / elapsed, 2),
+        "p50_ms": round(float(np.percentile(latencies_ms, 50)), 2),
+        "p90_ms": round(float(np.percentile(latencies_ms, 90)), 2),
+        "p99_ms": round(float(np.percentile(latencies_ms, 99)), 2),
+        "max_ms": round(float(latencies_ms.max()), 2),
+        "cpu_seconds": round(cpu_seconds, 3),
+        "cpu_percent": round(cpu_seconds / elapsed * 100, 1),
+        "peak_rss_mb": round(peak_rss / 2**20, 1),
+    }
+
+
+def make_client(url, timeout):
+    if url:
+        return httpx.AsyncClient(base_url=url, timeout=timeout)
+
+    from app.main import app
+
+    transport = httpx.ASGITransport(app=app)
+    return httpx.AsyncClient(
+        transport=transport, base_url="http://bench", timeout=timeout
+    )
+
+
+def git_revision():
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True
+        ).stdout.strip()
+    except OSError:
+        return None
+
+
+async def run(args):
+    # Speech requests are slow, so they get their own (smaller) request count
+    counts = {
+        "digit": args.requests,
+        "emoji": args.requests,
+        "transcribe": args.speech_requests,
+        "upload": args.speech_requests,
+    }
+    audio = make_audio(args.audio_seconds)
+    pid = args.server_pid or psutil.Process().pid
+
+    results = {}
+    async with make_client(args.url, args.timeout) as client:
+        for scenario in args.scenarios:
+            requests = build_requests(scenario, counts[scenario], audio)
+            # The first requests load the model; keep that out of the numbers
+            await run_scenario(client, scenario, requests[: args.warmup], 1, pid)
+            results[scenario] = await run_scenario(
+                client, scenario, requests, args.concurrency, pid
+            )
+            print(format_row(scenario, results[scenario]))
+
+    return {
+        "meta": {
+            "revision": git_revision(),
+            "mode": "http" if args.url else "in-process",
+            "url": args.url,
+            # CPU and RSS are the server's only with --server-pid (or in-process)
+            "measured_pid": pid,
+            "python": sys.version.split()[0],
+            "machine": platform.machine(),
+            "cpu_count": psutil.cpu_count(),
+            "timestamp": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "audio_seconds": args.audio_seconds,
+            "audio_formats": list(audio),
+        },
+        "results": results,
+    }
+
+
+def format_row(scenario, r):
+    return (
+        f"{scenario:<11} {r['requests']:>6} {r['errors']:>6} {r['throughput']:>9.1f} "
+        f"{r['p50_ms']:>9.1f} {r['p90_ms']:>9.1f} {r['p99_ms']:>9.1f} "
+        f"{r['cpu_percent']:>6.0f} {r['peak_rss_mb']:>8.0f}"
+    )
+
+
+def compare(baseline, current, threshold):
+    """Print relative changes and return the scenarios that regressed"""
+    regressions = []
+    print(f"\n{'scenario':<11} {'req/s':>9} {'p50':>9} {'p99':>9}  (vs baseline)")
+    for scenario, new in current["results"].items():
+        old = baseline["results"].get(scenario)
+        if old is None:
+            continue
+        changes = {
+            "throughput": (new["throughput"] / old["throughput"] - 1) * 100,
+            "p50_ms": (new["p50_ms"] / old["p50_ms"] - 1) * 100,
+            "p99_ms": (new["p99_ms"] / old["p99_ms"] - 1) * 100,
+        }
+        print(
+            f"{scenario:<11} {changes['throughput']:>+8.1f}% "
+            f"{changes['p50_ms']:>+8.1f}% {changes['p99_ms']:>+8.1f}%"
+        )
+        # Lower throughput or higher latency is worse
+        if (
+            -changes["throughput"] > threshold
+            or changes["p50_ms"] > threshold
+            or changes["p99_ms"] > threshold
+        ):
+            regressions.append(scenario)
+    return regressions
+
+
+def main(args):
+    print(
+        f"{'scenario':<11} {'reqs':>6} {'errors':>6} {'req/s':>9} {'p50 ms':>9} "
+        f"{'p90 ms':>9} {'p99 ms':>9} {'cpu %':>6} {'peak MB':>8}"
+    )
+    report = asyncio.run(run(args))
+
+    if args.out:
+        with open(args.out, "w") as f:
+            json.dump(report, f, indent=2)
+        print(f"\nWrote {args.out}")
+
+    if args.baseline:
+        with open(args.baseline) as f:
+            baseline = json.load(f)
+        regressions = compare(baseline, report, args.threshold)
+        if regressions:
+            print(f"Regressed by more than {args.threshold}%: {', '.join(regressions)}")
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--url", help="Benchmark a running server, not in-process")
+    parser.add_argument("--server-pid", type=int, help="Server process for CPU/RSS")
+    parser.add_argument("--scenarios", nargs="+", choices=SCENARIOS, default=SCENARIOS)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--speech-requests", type=int, default=16)
+    parser.add_argument("--concurrency", type=int, default=8)
+    parser.add_argument("--warmup", type=int, default=2)
+    parser.add_argument("--audio-seconds", type=float, default=10)
+    parser.add_argument("--timeout", type=float, default=300)
+    parser.add_argument("--out", help="Write the results to this JSON file")
+    parser.add_argument("--baseline", help="JSON results to compare against")
+    parser.add_argument("--threshold", type=float, default=10)
+    main(parser.parse_args())
@@ -0,0 +1,87 @@
+"""Deterministic synthetic inputs for every inference route."""
+
+import base64
+import io
+import wave
+from io import BytesIO
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from app.config import SUPPORTED_FORMATS
+from app.utils.audio_processing import run_ffmpeg
+
+WORDS = (
+    "i love this so much thanks for the help cannot believe you did that "
+    "what does this even mean we won the championship ok miss my family "
+    "that is disgusting so proud of you worried about tomorrow great day lol"
+).split()
+
+FFMPEG_FORMAT_ARGS = {
+    "mp3": ["-f", "mp3"],
+    "ogg": ["-c:a", "libvorbis", "-f", "ogg"],
+    "flac": ["-f", "flac"],
+}
+
+
+def make_canvases(count, seed=0):
+    """280x280 white canvases with random black strokes, as the frontend sends them"""
+    rng = np.random.default_rng(seed)
+    canvases = []
+    for i in range(count):
+        image = Image.new("L", (280, 280), 255)
+        draw = ImageDraw.Draw(image)
+        # Include a few blank and tiny drawings to cover the edge cases
+        strokes = 0 if i % 50 == 0 else rng.integers(1, 5)
+        for _ in range(strokes):
+            points = [tuple(p) for p in rng.integers(40, 240, size=(4, 2))]
+            draw.line(points, fill=0, width=int(rng.integers(6, 20)))
+        buffer = BytesIO()
+        image.save(buffer, format="PNG")
+        canvases.append(
+            "data:image/png;base64," + base64.b64encode(buffer.getvalue()).decode()
+        )
+    return canvases
+
+
+def make_texts(count, seed=0, min_words=1, max_words=30):
+    """Short chat-like texts of varied length; mostly unique so caches miss"""
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(min_words, max_words + 1, size=count)
+    return [" ".join(rng.choice(WORDS, size=length)) for length in lengths]
+
+
+def make_wav(seconds, sample_rate=16000, seed=0):
+    """Noise-modulated tone, long enough to keep Whisper busy"""
+    rng = np.random.default_rng(seed)
+    t = np.arange(int(seconds * sample_rate)) / sample_rate
+    signal = 0.3 * np.sin(2 * np.pi * 220 * t) + 0.05 * rng.standard_normal(len(t))
+    pcm = (np.clip(signal, -1, 1) * 32767).astype("<i2")
+
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(sample_rate)
+        wav.writeframes(pcm.tobytes())
+    return buffer.getvalue()
+
+
+def make_audio(seconds, formats=SUPPORTED_FORMATS, sample_rate=16000, seed=0):
+    """{format: encoded bytes} for each format ffmpeg can encode here"""
+    wav_bytes = make_wav(seconds, sample_rate, seed)
+    audio = {}
+    for format_type in formats:
+        if format_type == "wav":
+            audio["wav"] = wav_bytes
+            continue
+        try:
+            audio[format_type] = run_ffmpeg(wav_bytes, FFMPEG_FORMAT_ARGS[format_type])
+        except (OSError, ValueError, KeyError) as e:
+            print(f"Skipping {format_type} audio: {e}")
+    return audio
+
+
+def to_data_url(audio_bytes, format_type):
+    encoded = base64.b64encode(audio_bytes).decode()
+    return f"data:audio/{format_type};base64,{encoded}"
@@ -0,0 +1,67 @@
+import base64
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils.audio_processing import (
+    decode_audio,
+    decode_audio_stream,
+    iter_base64_chunks,
+)
+
+PAYLOAD = bytes(range(256)) * 41 + b"tail"
+
+
+def make_wav(seconds, rate, channels):
+    t = np.arange(int(seconds * rate)) / rate
+    tone = (np.sin(2 * np.pi * 440 * t) * 20000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(channels)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(np.repeat(tone, channels).tobytes())
+    return buffer.getvalue()
+
+
+@pytest.mark.parametrize("chunk_chars", [4, 5, 7, 64, 1 << 20])
+def test_iter_base64_chunks_matches_b64decode(chunk_chars):
+    text = base64.b64encode(PAYLOAD).decode()
+    chunks = list(iter_base64_chunks(text, chunk_chars=chunk_chars))
+    assert b"".join(chunks) == PAYLOAD
+    assert all(chunks)
+
+
+def test_iter_base64_chunks_skips_data_url_header_and_line_breaks():
+    encoded = base64.encodebytes(PAYLOAD).decode()  # Wrapped every 76 characters
+    text = "data:audio/wav;base64," + encoded
+    timings = {}
+    chunks = iter_base64_chunks(
+        text, start=text.index(",") + 1, chunk_chars=50, timings=timings
+    )
+    assert b"".join(chunks) == PAYLOAD
+    assert "base64_decode" in timings
+
+
+def test_iter_base64_chunks_raises_on_truncated_input():
+    text = base64.b64encode(PAYLOAD).decode()[:-1]
+    with pytest.raises(ValueError):
+        b"".join(iter_base64_chunks(text, chunk_chars=16))
+
+
+@pytest.mark.parametrize("rate, channels", [(16000, 1), (44100, 2)])
+@pytest.mark.parametrize("chunk_chars", [8, 1003, 1 << 20])
+@pytest.mark.parametrize("max_seconds", [None, 0.5])
+def test_streamed_base64_wav_matches_whole_decode(
+    rate, channels, chunk_chars, max_seconds
+):
+    wav = make_wav(1.2, rate, channels)
+    text = base64.b64encode(wav).decode()
+    chunks = iter_base64_chunks(text, chunk_chars=chunk_chars)
+
+    samples = decode_audio_stream(chunks, max_seconds=max_seconds)
+
+    expected = decode_audio(wav, "wav", max_seconds=max_seconds)
+    np.testing.assert_allclose(samples, expected, atol=1e-6)
@@ -0,0 +1,76 @@
+import asyncio
+
+import pytest
+
+from app.utils.batching import MicroBatcher
+from app.utils.executors import PoolSaturatedError
+
+
+def test_concurrent_calls_share_one_batch_in_order():
+    batches = []
+
+    def double(items):
+        batches.append(list(items))
+        return [item * 2 for item in items]
+
+    async def main():
+        batcher = MicroBatcher(double, max_batch_size=8, max_wait_ms=20)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(5)))
+
+    assert asyncio.run(main()) == [0, 2, 4, 6, 8]
+    assert batches == [[0, 1, 2, 3, 4]]
+
+
+def test_batches_close_at_max_batch_size():
+    batches = []
+
+    def identity(items):
+        batches.append(len(items))
+        return items
+
+    async def main():
+        batcher = MicroBatcher(identity, max_batch_size=3, max_wait_ms=50)
+        return await asyncio.gather(*(batcher.submit(i) for i in range(7)))
+
+    assert asyncio.run(main()) == list(range(7))
+    assert batches == [3, 3, 1]
+
+
+def test_a_failing_batch_fails_every_caller_in_it():
+    def broken(items):
+        raise RuntimeError("model error")
+
+    async def main():
+        batcher = MicroBatcher(broken, max_wait_ms=5)
+        return await asyncio.gather(
+            batcher.submit(1), batcher.submit(2), return_exceptions=True
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
+
+
+def test_submit_rejects_once_max_queue_items_wait():
+    async def main():
+        batcher = MicroBatcher(lambda items: items, max_wait_ms=50, max_queue=2)
+        waiting = [asyncio.ensure_future(batcher.submit(i)) for i in range(2)]
+        await asyncio.sleep(0)
+        with pytest.raises(PoolSaturatedError):
+            await batcher.submit(3)
+        return await asyncio.gather(*waiting)
+
+    assert asyncio.run(main()) == [0, 1]
+
+
+def test_too_few_results_fail_every_caller_instead_of_hanging():
+    async def main():
+        batcher = MicroBatcher(lambda items: items[:1], max_wait_ms=5)
+        return await asyncio.wait_for(
+            asyncio.gather(
+                batcher.submit(1), batcher.submit(2), return_exceptions=True
+            ),
+            timeout=1,
+        )
+
+    results = asyncio.run(main())
+    assert all(isinstance(result, RuntimeError) for result in results)
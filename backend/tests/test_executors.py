@@ -0,0 +1,27 @@
+import asyncio
+
+import pytest
+
+from app.utils.executors import InferencePool, PoolSaturatedError
+
+
+def test_inference_pool_rejects_beyond_capacity():
+    pool = InferencePool("test", max_workers=1, max_queue=1)
+
+    async def main():
+        gate = asyncio.Event()
+        loop = asyncio.get_running_loop()
+
+        def block():
+            asyncio.run_coroutine_threadsafe(gate.wait(), loop).result()
+            return "done"
+
+        running = [asyncio.ensure_future(pool.run(block)) for _ in range(2)]
+        await asyncio.sleep(0.05)
+        with pytest.raises(PoolSaturatedError):
+            pool.submit(block)
+        gate.set()
+        return await asyncio.gather(*running)
+
+    assert asyncio.run(main()) == ["done", "done"]
+    assert pool.stats()["pending"] == 0
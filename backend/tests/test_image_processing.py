@@ -0,0 +1,65 @@
+import numpy as np
+import pytest
+from PIL import Image
+
+from app.utils.image_processing import center_digits, process_image
+from benchmarks.bench_image_processing import legacy_process_image
+from benchmarks.synthetic import make_canvases
+
+
+def pil_center(image):
+    """center_digit as it was per image, with PIL doing the (enlarging) resize"""
+    rows = np.any(image < 0.5, axis=1)
+    cols = np.any(image < 0.5, axis=0)
+    y_min, y_max = np.where(rows)[0][[0, -1]]
+    x_min, x_max = np.where(cols)[0][[0, -1]]
+    y_min, y_max = max(0, y_min - 2), min(27, y_max + 2)
+    x_min, x_max = max(0, x_min - 2), min(27, x_max + 2)
+    digit = image[y_min:y_max, x_min:x_max]
+
+    h, w = digit.shape
+    scale = min(20.0 / h, 20.0 / w)
+    new_h, new_w = int(h * scale), int(w * scale)
+    resized = Image.fromarray(digit, mode="F").resize(
+        (new_w, new_h), Image.Resampling.BILINEAR
+    )
+    result = np.ones((28, 28), dtype=np.float32)
+    y_offset, x_offset = (28 - new_h) // 2, (28 - new_w) // 2
+    result[y_offset : y_offset + new_h, x_offset : x_offset + new_w] = resized
+    return result
+
+
+def small_digits(count, seed=0):
+    # Digits under 20 pixels are enlarged, where PIL's bilinear is TF's
+    rng = np.random.default_rng(seed)
+    images = np.ones((count, 28, 28), dtype=np.float32)
+    for image in images:
+        h, w = rng.integers(6, 15, size=2)
+        y, x = rng.integers(2, 28 - 2 - max(h, w), size=2)
+        image[y : y + h, x : x + w] = rng.random((h, w)) > 0.6
+        image[y, x : x + w] = 0.0  # Enough ink to count as drawn
+    return images
+
+
+def test_center_digits_matches_the_per_image_version():
+    images = small_digits(40)
+    np.testing.assert_allclose(
+        center_digits(images), [pil_center(image) for image in images], atol=1e-5
+    )
+
+
+def test_center_digits_leaves_near_blank_canvases_alone():
+    images = np.ones((3, 28, 28), dtype=np.float32)
+    images[1, 5, 5:20] = 0.0  # 15 pixels: too little to be a digit
+    images[2] = small_digits(1)[0]
+    centered = center_digits(images)
+    np.testing.assert_array_equal(centered[:2], images[:2])
+    np.testing.assert_array_equal(centered[2], center_digits(images[2:])[0])
+
+
+def test_process_image_matches_the_tensorflow_implementation():
+    pytest.importorskip("tensorflow")
+    for canvas in make_canvases(60):
+        np.testing.assert_allclose(
+            process_image(canvas), legacy_process_image(canvas), atol=1e-5
+        )
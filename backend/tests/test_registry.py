@@ -0,0 +1,34 @@
+import pytest
+
+from app.models.registry import FAILED, READY, LazyModel
+
+
+class FlakyModel(LazyModel):
+    def __init__(self, failures, retry_cooldown):
+        super().__init__("flaky", ".flaky:Flaky", retry_cooldown=retry_cooldown)
+        self.failures = failures
+        self.attempts = 0
+
+    def _construct(self):
+        self.attempts += 1
+        if self.attempts <= self.failures:
+            raise OSError("weights missing")
+        return object()
+
+
+def test_a_failed_load_fails_fast_until_the_cooldown_ends(monkeypatch):
+    import app.models.registry as registry
+
+    now = [100.0]
+    monkeypatch.setattr(registry.time, "monotonic", lambda: now[0])
+    model = FlakyModel(failures=1, retry_cooldown=30)
+
+    with pytest.raises(OSError):
+        model.get()
+    with pytest.raises(RuntimeError, match="weights missing"):
+        model.get()
+    assert (model.attempts, model.state) == (1, FAILED)
+
+    now[0] += 31
+    assert model.get() is not None
+    assert (model.attempts, model.state) == (2, READY)
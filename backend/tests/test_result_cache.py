@@ -0,0 +1,34 @@
+import time
+
+from app.utils.result_cache import ResultCache, SQLiteCacheBackend
+
+
+def test_lru_eviction_and_hit_counts():
+    cache = ResultCache(max_size=2, ttl=60)
+    cache.set("a", 1)
+    cache.set("b", 2)
+    assert cache.get("a") == 1  # "b" is now the least recently used
+    cache.set("c", 3)
+
+    assert cache.get("b") is None
+    assert cache.lookup("c") == (3, "memory")
+    stats = cache.stats()
+    assert (stats["hits"], stats["misses"], stats["evictions"]) == (2, 1, 1)
+
+
+def test_entries_expire_after_ttl():
+    cache = ResultCache(ttl=0.01)
+    cache.set("a", 1)
+    time.sleep(0.02)
+    assert cache.get("a") is None
+
+
+def test_shared_backend_serves_other_workers_results(tmp_path):
+    path = str(tmp_path / "cache.sqlite3")
+    writer = ResultCache(backend=SQLiteCacheBackend(path))
+    reader = ResultCache(backend=SQLiteCacheBackend(path))
+
+    writer.set("key", {"emotion": "joy"})
+    assert reader.lookup("key") == ({"emotion": "joy"}, "shared")
+    # Promoted to the reader's memory tier
+    assert reader.lookup("key") == ({"emotion": "joy"}, "memory")
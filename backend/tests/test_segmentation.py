@@ -0,0 +1,99 @@
+from collections import deque
+from io import BytesIO
+
+import numpy as np
+import pytest
+from PIL import Image, ImageDraw
+
+from app.utils.image_processing import (
+    label_components,
+    process_multi_digit,
+    segment_digits,
+)
+
+
+def bfs_components(mask):
+    """Reference 8-connected labelling, pixel by pixel"""
+    labels = np.zeros(mask.shape, dtype=np.int32)
+    count = 0
+    for y, x in zip(*np.nonzero(mask)):
+        if labels[y, x]:
+            continue
+        count += 1
+        labels[y, x] = count
+        queue = deque([(y, x)])
+        while queue:
+            cy, cx = queue.popleft()
+            for ny in range(cy - 1, cy + 2):
+                for nx in range(cx - 1, cx + 2):
+                    inside = 0 <= ny < mask.shape[0] and 0 <= nx < mask.shape[1]
+                    if inside and mask[ny, nx] and not labels[ny, nx]:
+                        labels[ny, nx] = count
+                        queue.append((ny, nx))
+    return labels, count
+
+
+def same_partition(a, b):
+    # Label numbers may differ; the regions they describe must not
+    pairs = set(zip(a.ravel(), b.ravel()))
+    return len(pairs) == len({p[0] for p in pairs}) == len({p[1] for p in pairs})
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_label_components_matches_bfs(seed):
+    mask = np.random.default_rng(seed).random((40, 50)) < 0.3
+    labels, count = label_components(mask)
+    expected, expected_count = bfs_components(mask)
+    assert count == expected_count
+    assert same_partition(labels, expected)
+
+
+def test_label_components_joins_diagonal_neighbours():
+    mask = np.eye(6, dtype=bool)
+    mask[0, 5] = True
+    labels, count = label_components(mask)
+    assert count == 2
+    assert len(set(labels[np.eye(6, dtype=bool)])) == 1
+
+
+def test_label_components_rejects_too_many_runs():
+    checkerboard = np.indices((50, 50)).sum(axis=0) % 2 == 0
+    with pytest.raises(ValueError):
+        label_components(checkerboard, max_runs=100)
+
+
+def draw_canvas(width=300, height=100):
+    image = Image.new("L", (width, height), 255)
+    draw = ImageDraw.Draw(image)
+    draw.rectangle([20, 20, 40, 80], fill=0)  # A "1"
+    draw.ellipse([120, 20, 170, 80], outline=0, width=6)  # A "0"
+    draw.rectangle([230, 20, 270, 26], fill=0)  # The bar of a "5"...
+    draw.rectangle([230, 35, 270, 80], fill=0)  # ...joins the blob below it
+    draw.point((290, 5), fill=0)  # Noise
+    return image
+
+
+def test_segment_digits_splits_left_to_right():
+    canvases, boxes = segment_digits(np.asarray(draw_canvas()))
+    assert canvases.shape == (3, 28, 28)
+    assert [box[0] for box in boxes] == [20, 120, 230]
+    assert boxes[2][1] == 20 and boxes[2][3] == 81
+
+
+def test_process_multi_digit_scales_boxes_of_shrunk_images(monkeypatch):
+    import app.utils.image_processing as image_processing
+
+    monkeypatch.setattr(image_processing, "DIGIT_MULTI_MAX_PIXELS", 300 * 100 // 4)
+    image = draw_canvas()
+    encoded = BytesIO()
+    image.save(encoded, "PNG")
+
+    batch, boxes = process_multi_digit(encoded.getvalue())
+    assert batch.shape == (3, 28, 28, 1)
+    # Boxes are in the uploaded image's pixels, give or take the shrink factor
+    assert abs(boxes[1][0] - 120) <= 2 and abs(boxes[1][2] - 171) <= 2
+
+
+def test_process_multi_digit_rejects_undecodable_bytes():
+    with pytest.raises(ValueError):
+        process_multi_digit(b"not an image")
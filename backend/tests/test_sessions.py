@@ -0,0 +1,90 @@
+import asyncio
+
+import pytest
+
+from app.utils.sessions import SessionDebouncer, SupersededError
+
+
+def run(coroutine):
+    return asyncio.run(coroutine)
+
+
+def test_only_the_latest_request_of_a_session_runs():
+    submitted = []
+
+    async def submit(item):
+        submitted.append(item)
+        return item.upper()
+
+    async def main():
+        debouncer = SessionDebouncer(submit, debounce_ms=20)
+        tasks = []
+        for text in ["h", "he", "hel"]:
+            tasks.append(asyncio.ensure_future(debouncer.run("s1", text)))
+            await asyncio.sleep(0.005)
+        return await asyncio.gather(*tasks, return_exceptions=True), debouncer
+
+    results, debouncer = run(main())
+    assert submitted == ["hel"]
+    assert isinstance(results[0], SupersededError)
+    assert isinstance(results[1], SupersededError)
+    assert results[2] == "HEL"
+    assert debouncer.stats()["superseded"] == 2
+
+
+def test_sessions_do_not_supersede_each_other():
+    async def submit(item):
+        return item
+
+    async def main():
+        debouncer = SessionDebouncer(submit, debounce_ms=10)
+        return await asyncio.gather(debouncer.run("a", 1), debouncer.run("b", 2))
+
+    assert run(main()) == [1, 2]
+
+
+def test_out_of_order_sequence_numbers_are_superseded():
+    async def submit(item):
+        return item
+
+    async def main():
+        debouncer = SessionDebouncer(submit, debounce_ms=0)
+        assert await debouncer.run("s", "newer", seq=5) == "newer"
+        with pytest.raises(SupersededError):
+            await debouncer.run("s", "older", seq=4)
+
+    run(main())
+
+
+def test_a_newer_request_cancels_one_already_submitted():
+    async def main():
+        running = asyncio.Event()
+
+        async def submit(item):
+            if item == "slow":
+                running.set()
+                await asyncio.sleep(10)
+            return item
+
+        debouncer = SessionDebouncer(submit, debounce_ms=0)
+        first = asyncio.ensure_future(debouncer.run("s", "slow"))
+        await running.wait()
+        second = await debouncer.run("s", "fast")
+        with pytest.raises(SupersededError):
+            await first
+        return second
+
+    assert run(main()) == "fast"
+
+
+def test_least_recent_sessions_are_forgotten():
+    async def submit(item):
+        return item
+
+    async def main():
+        debouncer = SessionDebouncer(submit, debounce_ms=0, max_sessions=2)
+        for session_id in ["a", "b", "c"]:
+            await debouncer.run(session_id, session_id)
+        return list(debouncer.sessions)
+
+    assert run(main()) == ["b", "c"]
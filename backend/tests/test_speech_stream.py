@@ -0,0 +1,69 @@
+import numpy as np
+import pytest
+
+from app.models.speech_stream import TranscriptionStream
+from app.utils.audio_processing import pcm_to_float32
+
+
+def test_pcm_to_float32_scales_s16le():
+    pcm = np.array([-32768, -16384, 0, 16384, 32767], dtype="<i2").tobytes()
+    samples = pcm_to_float32(pcm, "pcm_s16le")
+    assert samples.dtype == np.float32
+    np.testing.assert_allclose(samples, [-1.0, -0.5, 0.0, 0.5, 32767 / 32768])
+
+
+def test_pcm_to_float32_passes_f32le_through():
+    values = np.array([-1.0, 0.25, 0.999], dtype="<f4")
+    np.testing.assert_array_equal(pcm_to_float32(values.tobytes(), "pcm_f32le"), values)
+
+
+def test_pcm_to_float32_rejects_unknown_encodings():
+    with pytest.raises(ValueError):
+        pcm_to_float32(b"\0\0", "pcm_u8")
+
+
+@pytest.mark.parametrize(
+    "encoding, dtype", [("pcm_s16le", "<i2"), ("pcm_f32le", "<f4")]
+)
+def test_stream_reassembles_samples_split_across_frames(encoding, dtype):
+    values = np.linspace(-0.9, 0.9, 1000)
+    if dtype == "<i2":
+        values = values * 32767
+    pcm = values.astype(dtype).tobytes()
+
+    stream = TranscriptionStream(None, 16000, encoding)
+    cuts = [0, 1, 3, 4, 777, 1001, 1999, len(pcm)]
+    for start, end in zip(cuts, cuts[1:]):
+        stream.add_pcm(pcm[start:end], last=end == len(pcm))
+
+    np.testing.assert_array_equal(stream.buffer, pcm_to_float32(pcm, encoding))
+    assert stream.received == 1000
+
+
+class LongSegmentRecognizer:
+    """One segment per window, ending inside the window's trailing overlap.
+
+    Its text names each whole second it covers, so lost or repeated audio
+    shows up in the transcript.
+    """
+
+    def __init__(self):
+        self.stream = None
+
+    def transcribe_window(self, window):
+        offset = self.stream.cursor / 16000
+        end = max(len(window) / 16000 - 0.5, 0.1)
+        seconds = range(int(np.ceil(offset)), int(np.ceil(offset + end)))
+        return [{"text": "".join(f" s{t}" for t in seconds), "start": 0.0, "end": end}]
+
+
+def test_segments_running_into_the_overlap_are_not_lost():
+    recognizer = LongSegmentRecognizer()
+    stream = TranscriptionStream(recognizer, window_s=8, overlap_s=2)
+    recognizer.stream = stream
+    stream.add_pcm(np.zeros(25 * 16000, dtype="<i2").tobytes(), last=True)
+
+    while stream.ready() or stream.pending() > 0:
+        stream.step(final=True)
+
+    assert stream.text.split() == [f"s{t}" for t in range(25)]
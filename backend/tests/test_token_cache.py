@@ -0,0 +1,89 @@
+import pytest
+
+from app.utils.token_cache import PrefixTokenCache, split_last_word
+
+CLS, SEP = 101, 102
+
+
+class WordTokenizer:
+    """Whitespace-then-vocabulary tokenizer with BERT-style special tokens"""
+
+    model_max_length = 8
+
+    def __init__(self):
+        self.vocab = {}
+        self.calls = 0
+
+    def num_special_tokens_to_add(self):
+        return 2
+
+    def build_inputs_with_special_tokens(self, ids):
+        return [CLS] + ids + [SEP]
+
+    def _ids(self, text):
+        # Long words split into two pieces, like WordPiece continuations
+        ids = []
+        for word in text.split():
+            pieces = [word[:4], "##" + word[4:]] if len(word) > 4 else [word]
+            ids += [self.vocab.setdefault(piece, len(self.vocab)) for piece in pieces]
+        return ids
+
+    def __call__(self, text, add_special_tokens=True, truncation=False):
+        self.calls += 1
+        ids = self._ids(text)
+        if add_special_tokens:
+            if truncation:
+                ids = ids[: self.model_max_length - 2]
+            ids = self.build_inputs_with_special_tokens(ids)
+        return {"input_ids": ids}
+
+
+class PairTokenizer(WordTokenizer):
+    """Merges each word with the next one, so prefixes cannot be reused"""
+
+    def _ids(self, text):
+        words = text.split()
+        pairs = [" ".join(words[i : i + 2]) for i in range(0, len(words), 2)]
+        return [self.vocab.setdefault(pair, len(self.vocab)) for pair in pairs]
+
+
+def test_split_last_word():
+    assert split_last_word("how are yo") == ("how are", "yo")
+    assert split_last_word("how are ") == ("how are", "")
+    assert split_last_word("word") == ("", "word")
+
+
+def test_encode_matches_full_tokenization_while_typing():
+    tokenizer = WordTokenizer()
+    cache = PrefixTokenCache(tokenizer, sample_texts=["so happy today"])
+    assert cache.enabled
+
+    sentence = "what a wonderful day"
+    for end in range(1, len(sentence) + 1):
+        text = sentence[:end]
+        assert cache.encode(text) == tokenizer(text, truncation=True)["input_ids"]
+    assert cache.hits > 0
+
+
+def test_encode_truncates_like_the_tokenizer():
+    tokenizer = WordTokenizer()
+    cache = PrefixTokenCache(tokenizer)
+    text = "one two three four five six seven eight"
+    assert cache.encode(text) == tokenizer(text, truncation=True)["input_ids"]
+    assert len(cache.encode(text)) == tokenizer.model_max_length
+
+
+def test_prefixes_are_evicted_least_recently_used_first():
+    cache = PrefixTokenCache(WordTokenizer(), max_entries=2)
+    for text in ["a b", "c d", "a b", "e f"]:
+        cache.encode(text)
+    assert list(cache._entries) == ["a", "e"]
+    assert cache.stats()["entries"] == 2
+
+
+@pytest.mark.parametrize("texts", [["one two"], ["a b c d"]])
+def test_tokenizers_that_merge_across_words_disable_the_cache(texts):
+    tokenizer = PairTokenizer()
+    cache = PrefixTokenCache(tokenizer, sample_texts=texts)
+    assert not cache.enabled
+    assert cache.encode("x y z") == tokenizer("x y z", truncation=True)["input_ids"]
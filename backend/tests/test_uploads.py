@@ -0,0 +1,97 @@
+import asyncio
+import io
+import wave
+
+import numpy as np
+import pytest
+
+from app.utils.audio_processing import sniff_audio_format
+from app.utils.uploads import ChunkStream, UploadError, read_upload, receive_audio
+
+
+def make_wav(seconds=1.0, rate=16000):
+    samples = (np.sin(np.arange(int(seconds * rate)) / 10) * 8000).astype("<i2")
+    buffer = io.BytesIO()
+    with wave.open(buffer, "wb") as wav:
+        wav.setnchannels(1)
+        wav.setsampwidth(2)
+        wav.setframerate(rate)
+        wav.writeframes(samples.tobytes())
+    return buffer.getvalue()
+
+
+async def chunked(data, size=4096):
+    for start in range(0, len(data), size):
+        yield data[start : start + size]
+        await asyncio.sleep(0)
+
+
+def test_receive_audio_decodes_wav_while_it_arrives():
+    audio = asyncio.run(receive_audio(chunked(make_wav(2.0))))
+    assert audio.source_format == "wav"
+    assert len(audio.samples) == 32000
+
+
+def test_receive_audio_rejects_unknown_formats_from_the_first_bytes():
+    with pytest.raises(UploadError) as error:
+        asyncio.run(receive_audio(chunked(b"hello world, not audio" * 10)))
+    assert error.value.status_code == 415
+
+
+def test_receive_audio_stops_reading_past_the_limit():
+    with pytest.raises(UploadError) as error:
+        asyncio.run(receive_audio(chunked(make_wav(2.0)), limit=10000))
+    assert error.value.status_code == 413
+
+
+def test_concurrent_uploads_beyond_the_default_executor_do_not_deadlock():
+    from concurrent.futures import ThreadPoolExecutor
+
+    async def main():
+        asyncio.get_running_loop().set_default_executor(ThreadPoolExecutor(1))
+        return await asyncio.wait_for(
+            asyncio.gather(
+                *(receive_audio(chunked(make_wav(), 1024)) for _ in range(6))
+            ),
+            timeout=10,
+        )
+
+    assert all(len(audio.samples) == 16000 for audio in asyncio.run(main()))
+
+
+def test_read_upload_returns_bytes_and_sniffed_format():
+    data = make_wav()
+    content, format_type = asyncio.run(read_upload(chunked(data)))
+    assert (content, format_type) == (data, "wav")
+
+
+def test_chunk_stream_puts_fail_once_the_decoder_closes():
+    async def main():
+        stream = ChunkStream(max_chunks=1)
+        assert await stream.put(b"a")
+        blocked = asyncio.ensure_future(stream.put(b"b"))
+        await asyncio.sleep(0)
+        stream.close()  # As the decoder does when it stops early
+        return await asyncio.wait_for(blocked, 1), await stream.put(b"c")
+
+    assert asyncio.run(main()) == (False, False)
+
+
+@pytest.mark.parametrize(
+    "head, expected",
+    [
+        (b"RIFF\x24\x00\x00\x00WAVEfmt ", "wav"),
+        (b"fLaC\x00\x00\x00\x22", "flac"),
+        (b"OggS\x00\x02\x00\x00", "ogg"),
+        (b"\x1a\x45\xdf\xa3\x9f\x42\x86\x81", "webm"),
+        (b"\x00\x00\x00\x20ftypM4A ", "m4a"),
+        (b"ID3\x04\x00\x00\x00\x00", "mp3"),
+        (b"\xff\xfb\x90\x64", "mp3"),
+        (b"\xff\xf1\x50\x80", "aac"),
+        (b"RIFF\x24\x00\x00\x00AVI ", None),
+        (b"hello world!", None),
+        (b"", None),
+    ],
+)
+def test_sniff_audio_format(head, expected):
+    assert sniff_audio_format(head) == expected